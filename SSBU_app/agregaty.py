@@ -0,0 +1,108 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from utils import stlpce_genotypov, typuj_dataset, pocty_genotypov, hardy_weinberg_batch, hardy_weinberg_exact, \
+    spocitaj_vzory_genotypov, analyzuj_vzory_genotypov, pocet_vzorov, pocty_diagnoz_podla_roka, \
+    vyskyt_diagnoz_z_poctov
+
+# Predvolený počet riadkov CSV načítaných naraz pri postupnom spracovaní
+velkost_chunku = 100_000
+
+
+class AgregatyDatasetu:
+    """
+    Agregáty datasetu pacientov, ktoré sa dajú dopĺňať po častiach: počty genotypov pre každý
+    lokus, počty vzorov genotypov (pre analyze_genotype_distribution) a počty diagnóz podľa roka
+    (pre analyzuj_diagnozy). Pamäť závisí od počtu rôznych rokov a kódov, nie od počtu riadkov.
+    """
+
+    def __init__(self, stlpce=stlpce_genotypov, stlpec_mkch="diagnoza MKCH-10", stlpec_datum="validovany vysledok"):
+        self.stlpce = list(stlpce)
+        self.stlpec_mkch = stlpec_mkch
+        self.stlpec_datum = stlpec_datum
+        self.pocet_riadkov = 0
+        self.pocty_genotypov = np.zeros((len(self.stlpce), 3), dtype=np.int64)
+        self.pocty_vzorov = np.zeros(pocet_vzorov, dtype=np.int64)
+        self.pocty_diagnoz = None
+
+    def pridaj(self, chunk):
+        """
+        Pripočíta k agregátom ďalšiu časť datasetu.
+
+        Args:
+            chunk (pd.DataFrame): Typovaná časť datasetu (pozri typuj_dataset).
+        """
+        self.pocet_riadkov += len(chunk)
+        self.pocty_genotypov += pocty_genotypov(chunk, self.stlpce)[0][0]
+        self.pocty_vzorov += spocitaj_vzory_genotypov(chunk)
+        pocty = pocty_diagnoz_podla_roka(chunk, self.stlpec_mkch, self.stlpec_datum)
+        if self.pocty_diagnoz is None:
+            self.pocty_diagnoz = pocty
+        else:
+            self.pocty_diagnoz = self.pocty_diagnoz.add(pocty, fill_value=0).astype(np.int64)
+
+    def s_pridanymi(self, chunk):
+        """
+        Vráti nové agregáty rozšírené o ďalšiu časť datasetu; pôvodné agregáty sa nemenia.
+
+        Args:
+            chunk (pd.DataFrame): Typovaná časť datasetu (pozri typuj_dataset).
+
+        Returns:
+            AgregatyDatasetu: Rozšírené agregáty.
+        """
+        nove = copy.copy(self)
+        nove.pocty_genotypov = self.pocty_genotypov.copy()
+        nove.pocty_vzorov = self.pocty_vzorov.copy()
+        nove.pridaj(chunk)
+        return nove
+
+    def hardy_weinberg(self):
+        """
+        Vyhodnotí Hardy-Weinbergovu rovnováhu zo sčítaných počtov genotypov.
+
+        Returns:
+            dict: Výsledok hardy_weinberg_batch pre lokusy (prvá os) doplnený o 'p_value_exact'.
+        """
+        vysledok = {k: v[0] for k, v in hardy_weinberg_batch(self.pocty_genotypov[None]).items()}
+        vysledok["p_value_exact"] = hardy_weinberg_exact(self.pocty_genotypov)
+        return vysledok
+
+    def distribucia_genotypov(self):
+        """
+        Returns:
+            dict: Rovnaký výsledok ako analyze_genotype_distribution.
+        """
+        return analyzuj_vzory_genotypov(self.pocty_vzorov)
+
+    def vyskyt_diagnoz(self, mkch10_data, mkch10_index=None):
+        """
+        Returns:
+            dict: Rovnaký výsledok ako analyzuj_diagnozy.
+        """
+        pocty = self.pocty_diagnoz
+        if pocty is None:
+            pocty = pd.Series([], index=pd.MultiIndex.from_tuples([], names=["Rok_vyšetrenia", self.stlpec_mkch]),
+                              dtype=np.int64)
+        return vyskyt_diagnoz_z_poctov(pocty, self.pocet_riadkov, mkch10_data, mkch10_index)
+
+
+def nacitaj_agregaty(cesta_k_suboru, velkost=velkost_chunku, stlpce=stlpce_genotypov):
+    """
+    Prečíta CSV export (oddeľovač ';') po častiach a vytvorí z neho agregáty bez načítania
+    celého súboru do pamäte.
+
+    Args:
+        cesta_k_suboru (str | Path): Cesta k CSV súboru.
+        velkost (int): Počet riadkov v jednej časti.
+        stlpce (list): Stĺpce s genotypmi.
+
+    Returns:
+        AgregatyDatasetu: Agregáty celého súboru.
+    """
+    agregaty = AgregatyDatasetu(stlpce)
+    for chunk in pd.read_csv(cesta_k_suboru, sep=";", header=0, chunksize=velkost, low_memory=False):
+        agregaty.pridaj(typuj_dataset(chunk))
+    return agregaty
@@ -1,20 +1,240 @@
+import asyncio
+import contextlib
+import functools
+import html
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from shiny import App, render, ui, reactive
-from shiny.ui import tags
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Mount, Route
+import numpy as np
 import pandas as pd
-from shared import df, mkch10_file_path, nazvy_harkov_mkch10
+from shared import df, mkch10_file_path, nazvy_harkov_mkch10, stlpce_genotypov, skupiny_diagnoz, \
+    predvolena_skupina_diagnoz, priecinok_prichadzajucich, zaklad_datasetu
 from app_ui import app_ui
-from utils import check_hardy_weinberg, analyze_genotype_distribution, analyzuj_diagnozy, prirad_kapitolu_mkch10, \
-    nacitaj_mkch10_ciselnik, chi_square_test
-from plotnine import ggplot, aes, geom_bar, facet_wrap, geom_boxplot, geom_point, theme_minimal, labs, position_dodge, scale_fill_manual
-from scipy.stats import chi2_contingency
-import io
 import base64
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-import matplotlib.pyplot as plt
-from utils import check_hardy_weinberg, analyze_genotype_distribution, analyzuj_diagnozy, prirad_kapitolu_mkch10, nacitaj_mkch10_ciselnik, format_p_value
+from grafy import vykresli_grafy, priprav_data_grafov, popisy_grafov
+from demografia import vyrez_pre_filtre
+from asociacie import chi_kvadrat_testy
+from mriezka import pocet_stran
+from dataset import DatasetPacientov
+from laboratorium import obdobia_spracovania
+from metriky import merana, meraj, prometheus_text, statistiky_merani, uspesnost_cache
+from exporty import formaty_exportu, po_davkach
+from report import hardy_weinberg_tabulka
+from vyhladavanie import IndexMKCH10
+from zobrazenie_mkch10 import ZobrazenieMKCH10, velkost_strany_mkch10
+from utils import nacitaj_mkch10_ciselnik, format_p_value, vytvor_index_mkch10, hardy_weinberg_podla_strat, \
+    odvodene_stlpce
 
 mkch10_data = nacitaj_mkch10_ciselnik(str(mkch10_file_path), nazvy_harkov_mkch10)
+mkch10_index = vytvor_index_mkch10(mkch10_data)
+# Dataset s priebežne pripájanými výsledkami; relácie pracujú s jeho aktuálnou snímkou
+dataset = DatasetPacientov(df, stlpce_genotypov, skupiny_diagnoz, nazvy_harkov_mkch10, zaklad_datasetu)
+dataset.nacitaj_spracovane(priecinok_prichadzajucich)
+# Prvý hárok sa do vyhľadávania nezahŕňa
+index_vyhladavania = IndexMKCH10(mkch10_data, vynechat=[nazvy_harkov_mkch10[0]])
+zobrazenie_mkch10 = ZobrazenieMKCH10(mkch10_data)
+mapovanie_pohlavia = {"Žena": "F", "Muž": "M"}
+# Režimy grafov: "klient" posiela iba agregované počty a kvartily (SVG kreslí prehliadač, app_ui.js_grafy),
+# "png" vykreslí grafy na serveri cez plotnine
+rezimy_grafov = {"klient": "V prehliadači", "png": "Obrázky PNG"}
+popisy_formatov = {"csv": "CSV", "parquet": "Parquet"}
+# Tabuľky analýz, ktoré sa dajú stiahnuť zo stránky: stránka -> {kľúč tabuľky: popis}
+tabulky_exportu = {
+    "Hardy-Weinberg": {"hardy_weinberg": "Hardy-Weinbergova rovnováha",
+                       "hardy_weinberg_skupiny": "Hardy-Weinbergova rovnováha podľa skupín"},
+    "Genotypy a predispozície": {"genotype_percentages": "Percentuálne zastúpenie genotypov",
+                                 "risk_percentages": "Predispozícia k hereditárnej hemochromatóze",
+                                 "predisposition_table": "Počet pacientov podľa predispozície"},
+    "Analýza diagnóz": {"vyskyt_diagnoz": "Výskyt diagnóz", "chybne_kody": "Chybné kódy"},
+    "Čas spracovania vzoriek": {"casy_percentily": "Percentily času spracovania",
+                                "casy_rozdelenie": "Rozdelenie času spracovania"},
+}
+# Ako dlho (v sekundách) musia byť filtre nezmenené, kým sa prepočítajú výstupy
+oneskorenie_filtrov = 0.5
+oneskorenie_vyhladavania = 0.3
+# Ako často (v sekundách) server kontroluje nové výsledky a relácie verziu datasetu
+interval_kontroly_dat = 2
+# Vlákna pre dlhé výpočty výstupov; slučka udalostí Shiny medzitým obsluhuje ostatné relácie
+vlakna_analyz = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="analyza")
+
+
+async def na_pozadi(uloha, zrusenie=None):
+    """
+    Spustí funkciu bez argumentov vo vlákne vlakna_analyz a počká na jej výsledok bez blokovania
+    slučky udalostí. Pri zrušení čakajúcej úlohy (ExtendedTask.cancel) sa nezačatý výpočet
+    zahodí a rozbehnutému sa nastaví udalosť zrusenie.
+
+    Args:
+        uloha (callable): Výpočet, napr. functools.partial(generuj_grafy, ...).
+        zrusenie (threading.Event, voliteľné): Udalosť, ktorú výpočet priebežne kontroluje.
+
+    Returns:
+        Výsledok výpočtu.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(vlakna_analyz, uloha)
+    except asyncio.CancelledError:
+        if zrusenie is not None:
+            zrusenie.set()
+        raise
+
+
+async def kontroluj_prichadzajuce():
+    """
+    Každých interval_kontroly_dat sekúnd pripojí nové súbory z priečinka prichádzajúcich výsledkov
+    vo vlákne vlakna_analyz. Beží v každom pracovnom procese: súbory pripojí iba proces so zámkom
+    priečinka, ostatné prevezmú zverejnenú snímku. Relácie iba sledujú verziu datasetu.
+    """
+    while True:
+        try:
+            await na_pozadi(functools.partial(dataset.skontroluj_priecinok, priecinok_prichadzajucich))
+        except Exception:
+            logging.exception("Kontrola priečinka prichádzajúcich výsledkov zlyhala.")
+        await asyncio.sleep(interval_kontroly_dat)
+
+
+@contextlib.asynccontextmanager
+async def beh_servera(app):
+    kontrola = asyncio.create_task(kontroluj_prichadzajuce())
+    try:
+        yield
+    finally:
+        kontrola.cancel()
+
+
+def vysledok_ulohy(uloha, text):
+    """
+    Vráti výsledok ExtendedTask pre výstup, alebo zástupný obsah, kým sa výsledok počíta.
+
+    Args:
+        uloha (ExtendedTask): Úloha výstupu.
+        text (str): Text zástupného obsahu.
+    """
+    # zrušená úloha má vo fronte novšie vyvolanie, výstup sa preto nevyprázdni
+    if uloha.status() in ("initial", "running", "cancelled"):
+        return ui.div(ui.tags.p(text), class_="zastupny-obsah")
+    return uloha.result()
+
+
+def davky_exportu(vypocet, format_exportu):
+    """
+    Generátor dávok stiahnutého súboru (exporty.po_davkach), ktorý dáta vypočíta až pri prvej dávke.
+
+    Args:
+        vypocet (callable): Vráti pd.DataFrame alebo dvojicu (pd.DataFrame, pozície riadkov).
+        format_exportu (str): Kľúč formaty_exportu.
+    """
+    vysledok = vypocet()
+    df, pozicie = vysledok if isinstance(vysledok, tuple) else (vysledok, None)
+    yield from po_davkach(df, format_exportu, pozicie)
+
+
+async def davky_na_pozadi(davky):
+    """
+    Asynchrónny generátor pre render.download_button: každú dávku vytvorí vo vlákne vlakna_analyz,
+    slučka udalostí medzitým obsluhuje ostatné relácie. Prerušené sťahovanie ďalšie dávky nepočíta.
+
+    Args:
+        davky (iterator): Generátor bajtov, napr. z davky_exportu.
+    """
+    koniec = object()
+    while (davka := await na_pozadi(functools.partial(next, davky, koniec))) is not koniec:
+        yield davka
+
+
+def ovladanie_exportu(id_tlacidla, popis, tabulky=None):
+    """
+    Ovládanie sťahovania na stránke: voliteľný výber tabuľky, formát súboru a tlačidlo.
+
+    Args:
+        id_tlacidla (str): Id výstupu render.download_button.
+        popis (str): Text tlačidla.
+        tabulky (dict, voliteľné): Kľúč tabuľky -> popis pre výber "export_tabulka".
+    """
+    return ui.div(
+        *([ui.input_select("export_tabulka", "Tabuľka:", choices=tabulky)] if tabulky else []),
+        ui.input_radio_buttons("export_format", "Formát:", choices=popisy_formatov, inline=True),
+        ui.download_button(id_tlacidla, popis, class_="action-button-sm"),
+        class_="ovladanie-exportu"
+    )
+
+
+def debounce(oneskorenie):
+    """
+    Dekorátor, ktorý z funkcie čítajúcej vstupy vytvorí reactive.calc prepočítaný až vtedy,
+    keď sa vstupy počas `oneskorenie` sekúnd nezmenili. Medzihodnoty (napr. pri písaní čísla)
+    sa nikdy nepošlú ďalej, takže závislé výpočty pre ne ani nezačnú.
+
+    Args:
+        oneskorenie (float): Čas ustálenia vstupov v sekundách.
+
+    Returns:
+        callable: Dekorátor funkcie bez argumentov.
+    """
+    def dekorator(funkcia):
+        termin = reactive.Value(None)
+        spustac = reactive.Value(0)
+
+        @reactive.calc
+        def aktualne():
+            return funkcia()
+
+        @reactive.effect(priority=102)
+        def sleduj_vstupy():
+            try:
+                aktualne()
+            except Exception:
+                # chyby aj chýbajúce vstupy sa prejavia až pri čítaní výslednej hodnoty
+                pass
+            finally:
+                termin.set(time.monotonic() + oneskorenie)
+
+        @reactive.effect(priority=101)
+        def casovac():
+            koniec = termin()
+            if koniec is None:
+                return
+            zostava = koniec - time.monotonic()
+            if zostava <= 0:
+                with reactive.isolate():
+                    termin.set(None)
+                    spustac.set(spustac() + 1)
+            else:
+                reactive.invalidate_later(zostava)
+
+        @reactive.calc
+        @reactive.event(spustac)
+        def ustalene():
+            with reactive.isolate():
+                return aktualne()
+
+        return ustalene
+
+    return dekorator
+
+
+def maska_demografie(df, vek_od=None, vek_do=None, pohlavie=None):
+    """
+    Maska riadkov vybraných filtrami veku a pohlavia (stránka "Genotypy, demografia a diagnózy").
+
+    Returns:
+        pd.Series: Booleovská maska nad riadkami df.
+    """
+    maska = pd.Series(True, index=df.index)
+    if vek_od is not None:
+        maska &= df['vek'] >= vek_od
+    if vek_do is not None:
+        maska &= df['vek'] <= vek_do
+    pohlavie_filter = mapovanie_pohlavia.get(pohlavie)
+    if pohlavie_filter:
+        maska &= df['pohlavie'] == pohlavie_filter
+    return maska
 
 
 def server(input, output, session):
@@ -22,62 +242,49 @@ def server(input, output, session):
     current_sheet_index = reactive.Value(0)
     filtered_mkch10_data = reactive.Value(None)
     search_performed = reactive.Value(False)
-    filtered_data = reactive.Value(df)
-    diagnozy = sorted(df["diagnoza MKCH-10"].dropna().unique())
-    diagnozy.insert(0, "Všetky")
+    data_strana = reactive.Value(0)
+    mkch10_strana = reactive.Value(0)
 
-    def priprav_data_pre_grafy(df, vek_od=None, vek_do=None, pohlavie=None, diagnoza=None):
-        data = df.copy()
-        print(f"[DEBUG] Pôvodný počet riadkov: {len(data)}")
+    # pripájanie beží na pozadí (kontroluj_prichadzajuce), relácia iba porovná číslo verzie
+    @reactive.poll(lambda: dataset.verzia, interval_kontroly_dat)
+    def snimka():
+        return dataset.snimka()
 
-        if vek_od is not None:
-            data = data[data['vek'] >= vek_od]
-            print(f"[DEBUG] Po filtrovaní vek_od ({vek_od}): {len(data)} riadkov")
-
-        if vek_do is not None:
-            data = data[data['vek'] <= vek_do]
-            print(f"[DEBUG] Po filtrovaní vek_do ({vek_do}): {len(data)} riadkov")
-
-        mapovanie = {
-            "Žena": "F",
-            "Muž": "M",
-            "Všetky": None
-        }
-        pohlavie_filter = mapovanie.get(pohlavie, None)
-
-        if pohlavie_filter:
-            data = data[data['pohlavie'] == pohlavie_filter]
-            print(f"[DEBUG] Po filtrovaní pohlavie ({pohlavie}): {len(data)} riadkov")
-
-        if diagnoza and diagnoza.strip() != "":
-            data["diagnoza_ano_nie"] = data["diagnoza MKCH-10"].apply(
-                lambda x: "Áno" if diagnoza in str(x) else "Nie"
-            )
-            print(f"[DEBUG] Pridaný stĺpec diagnoza_ano_nie pre diagnózu '{diagnoza}'")
-        else:
-            data["diagnoza_ano_nie"] = "Všetci"
-            print("[DEBUG] Diagnóza nie je špecifikovaná, nastavené na 'Všetci'")
-
-        print(f"[DEBUG] Celkový počet riadkov po filtrovaní: {len(data)}")
-        return data
-
-    def generuj_grafy(df, pohlavie=None, diagnoza=None, vek_od=None, vek_do=None):
+    @reactive.Effect
+    def _aktualizuj_volby_diagnoz():
+        # po pripojení nových výsledkov sa doplnia voľby diagnóz bez prekreslenia stránky
+        moznosti = snimka().moznosti_diagnoz
+        with reactive.isolate():
+            if input.page() == "Genotypy, demografia a diagnózy":
+                ui.update_select("diagnoza", choices=moznosti, selected=input.diagnoza())
+
+    @merana("uloha")
+    def generuj_grafy(snimka_dat, pohlavie=None, diagnoza=None, vek_od=None, vek_do=None, rezim="klient",
+                      zrusenie=None):
+        # beží vo vlákne vlakna_analyz – nesmie čítať reaktívne hodnoty, snímku dostane ako argument;
+        # filtrovanie riadkov aj výrez kocky sa robia až tu, nie na slučke udalostí
         grafy_html = []
         mutacie = ["HFE G845A (C282Y) [HFE]", "HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]"]
 
-        df_copy = priprav_data_pre_grafy(df, vek_od=vek_od, vek_do=vek_do, pohlavie=pohlavie, diagnoza=diagnoza)
-
         if diagnoza and diagnoza.strip() != "" and diagnoza != "Všetky":
-            df_copy["diagnoza_ano_nie"] = df_copy["diagnoza MKCH-10"].apply(
-                lambda x: "Áno" if diagnoza in str(x) else "Nie"
-            )
             fill_col = "diagnoza_ano_nie"
             fill_legend = f"Diagnóza {diagnoza}"
         else:
-            df_copy["diagnoza_ano_nie"] = "Všetci"
             fill_col = None
             fill_legend = None
 
+        def priprav_data():
+            df = snimka_dat.df
+            # vyfiltrované riadky (vek, pohlavie) treba iba pre boxplot veku,
+            # stĺpcové grafy sa skladajú z výrezu predpočítanej kocky počtov
+            filtrovane = df.loc[maska_demografie(df, vek_od, vek_do, pohlavie), mutacie + ["vek"]]
+            pocty, kocka = vyrez_pre_filtre(snimka_dat.kocka, df, vek_od, vek_do, mapovanie_pohlavia.get(pohlavie))
+            maska_diagnoz = None
+            if fill_col:
+                zhodne_kody = set(snimka_dat.index_diagnoz.kody_pre(diagnoza))
+                maska_diagnoz = kocka.maska_diagnoz(lambda x: x in zhodne_kody)
+            return priprav_data_grafov(filtrovane, pocty, kocka, mutacie, maska_diagnoz)
+
         title_filters = []
         if pohlavie and pohlavie != "Všetky":
             title_filters.append(f"Pohlavie: {pohlavie}")
@@ -93,160 +300,124 @@ def server(input, output, session):
 
         filter_popis = ", ".join(title_filters) if title_filters else "Všetky dáta"
 
-        def graf_na_html(plot_obj):
-            fig = plot_obj.draw()
-            buf = io.BytesIO()
-            canvas = FigureCanvas(fig)
-            canvas.print_png(buf)
-            data = base64.b64encode(buf.getvalue()).decode("utf-8")
-            plt.close(fig)
+        typy = ["distribucia", "vek", "pohlavie"] + (["diagnoza"] if fill_col else [])
+        if rezim == "png":
+            # dáta určuje verzia snímky a filtre, grafy z cache sa preto nemusia pripravovať znova
+            filtre = (snimka_dat.verzia, pohlavie, diagnoza, vek_od, vek_do)
+            obrazky = vykresli_grafy([(m, t) for m in mutacie for t in typy], filtre, priprav_data, fill_legend,
+                                     zrusenie)
+        else:
+            # namiesto PNG sa pošle JSON popis grafu, SVG z neho nakreslí prehliadač
+            obrazky = popisy_grafov(priprav_data(), fill_legend)
+
+        def graf_na_html(obrazok):
+            if rezim != "png":
+                # JSON v atribúte s apostrofmi, úvodzovky v ňom netreba escapovať
+                atribut = html.escape(obrazok, quote=False).replace("'", "&#x27;")
+                return f"<div class='graf-klient' data-graf='{atribut}'></div>"
+            data = base64.b64encode(obrazok).decode("utf-8")
             return f'<img src="data:image/png;base64,{data}" class:"graf-obrazok" />'
 
         for mutacia in mutacie:
             sekcia_html = f'<div class="mutacia-sekcia" >'
             sekcia_html += f"<h2>{mutacia}</h2>"
             sekcia_html += f"<p>Filtre: {filter_popis}</p>"
-
-            # 1. distribúcia genotypov – bez fill podla diagnozy; len čistý count
-            p1 = ggplot(df_copy, aes(x=mutacia)) + geom_bar() \
-                 + labs(title=f"{mutacia} – Distribúcia genotypov", x="Genotyp", y="Počet pacientov") \
-                 + theme_minimal()
-            sekcia_html += graf_na_html(p1)
-
-            # 2. vek
-            p2 = (ggplot(df_copy, aes(x=mutacia, y="vek"))
-                  + geom_boxplot()
-                  + labs(title=f"{mutacia} – Vek podľa genotypu", x="Genotyp", y="Vek")
-                  + theme_minimal())
-            sekcia_html += graf_na_html(p2)
-
-            # 3. podla pohlavia
-            p3 = (ggplot(df_copy, aes(x=mutacia, fill="pohlavie"))
-                  + geom_bar(position=position_dodge())
-                  + labs(title=f"{mutacia} – Genotypy podľa pohlavia", x="Genotyp", y="Počet pacientov",
-                         fill="Pohlavie")
-                  + theme_minimal())
-            sekcia_html += graf_na_html(p3)
-
-            # 4. podla diagnozy – len ak je diagnoza zvolena
-            if fill_col:
-                p4 = (ggplot(df_copy, aes(x=mutacia, fill=fill_col))
-                      + geom_bar(position=position_dodge())
-                      + labs(title=f"{mutacia} – Genotypy podľa diagnózy", x="Genotyp", y="Počet pacientov",
-                             fill=fill_legend)
-                      + theme_minimal())
-                sekcia_html += graf_na_html(p4)
+            # 1. distribúcia genotypov, 2. vek, 3. podla pohlavia, 4. podla diagnozy – len ak je diagnoza zvolena
+            for typ in typy:
+                sekcia_html += graf_na_html(obrazky[(mutacia, typ)])
             sekcia_html += '</div>'
             grafy_html.append(sekcia_html)
 
         final_html = '<div class="graf-kontajner" >' + ''.join(grafy_html) + '</div>'
         return ui.HTML(final_html)
 
-    from scipy.stats import chi2_contingency
-    import pandas as pd
-    from shiny import ui  # Ak používaš Shiny pre Python
-
-    def vykonaj_chi_kvadrat_testy(df, diagnoza=None, vek_od=None, vek_do=None, pohlavie = None):
+    @merana("uloha")
+    def vykonaj_chi_kvadrat_testy(snimka_dat, diagnoza=None, vek_od=None, vek_do=None, pohlavie = None):
         """
         Vykoná Chí-kvadrát testy na zistenie asociácie medzi HFE mutáciami
-        a pohlavím/diagnózou/vekom, používajúc priamo scipy.stats.chi2_contingency.
+        a pohlavím/diagnózou/vekom (pozri asociacie.chi_kvadrat_testy).
 
         Args:
-            df (pd.DataFrame): DataFrame s dátami pacientov.
-            diagnoza (str, voliteľné): Konkrétna diagnóza na testovanie.
+            snimka_dat (SnimkaDat): Snímka dát (výrez kocky pre vek a pohlavie sa vytvorí z nej).
+            diagnoza (str, voliteľné): Diagnóza, kategória, rozsah kódov alebo názov skupiny diagnóz na testovanie.
             vek_od (int, voliteľné): Minimálny vek pre filtrovanie.
             vek_do (int, voliteľné): Maximálny vek pre filtrovanie.
 
         Returns:
             ui.TagList: HTML obsah s výsledkami testov.
         """
-        vysledky = []
-        mutacie = ["HFE G845A (C282Y) [HFE]", "HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]"]
-        pecen_kody = ['K76.0', 'K75.9']
-
-        # Vekový filter
+        pocty, kocka = vyrez_pre_filtre(snimka_dat.kocka, snimka_dat.df, vek_od, vek_do, mapovanie_pohlavia.get(pohlavie))
+        if not diagnoza or diagnoza.strip() == "" or diagnoza == "Všetky":
+            # Bez zvolenej diagnózy sa testuje predvolená skupina (pečeňové diagnózy)
+            diagnoza = predvolena_skupina_diagnoz
+        testy = chi_kvadrat_testy(kocka, pocty, snimka_dat.index_diagnoz, diagnoza,
+                                  testovat_pohlavie=mapovanie_pohlavia.get(pohlavie) is None)
+
+        podmienky = []
         if vek_od is not None:
-            df = df[df["vek"] >= vek_od]
+            podmienky.append(f"vek ≥ {vek_od}")
         if vek_do is not None:
-            df = df[df["vek"] <= vek_do]
-
-        pohlavie_filtruje_sa = False
-        if pohlavie and pohlavie != "Všetky":
-            mapovanie = {"Muž": "M", "Žena": "F"}
-            pohlavie_hodnota = mapovanie.get(pohlavie)
-            if pohlavie_hodnota:
-                df = df[df["pohlavie"] == pohlavie_hodnota]
-                pohlavie_filtruje_sa = True
-
-        # Maska pre pečeňové diagnózy
-        pecen_maska = df["diagnoza MKCH-10"].apply(lambda x: any(kod in str(x) for kod in pecen_kody))
-
-        for mutacia in mutacie:
-            popis = f"{mutacia}"
-            podmienky = []
-            if vek_od is not None:
-                podmienky.append(f"vek ≥ {vek_od}")
-            if vek_do is not None:
-                podmienky.append(f"vek ≤ {vek_do}")
-            if podmienky:
-                popis += " (" + ", ".join(podmienky) + ")"
-
-            # Chí-kvadrát: mutácia × pohlavie
-            if not pohlavie_filtruje_sa:
-                ct_pohlavie = pd.crosstab(df[mutacia], df["pohlavie"])
-                if ct_pohlavie.shape[0] > 1 and ct_pohlavie.shape[1] > 1:
-                    chi2, p, dof, _ = chi2_contingency(ct_pohlavie)
-                    vysledky.append(f"{popis} × pohlavie: χ² = {chi2:.2f}, p = {p:.3f}, df = {dof}")
-                else:
-                    vysledky.append(f"{popis} × pohlavie: Nedostatok dát pre test.")
-
-            # Chí-kvadrát: mutácia × diagnóza
-            if diagnoza and diagnoza.strip() != "" and diagnoza != "Všetky":
-                diagnoza_maska = df["diagnoza MKCH-10"].apply(lambda x: diagnoza in str(x))
-                ct_diagnoza = pd.crosstab(df[mutacia], diagnoza_maska)
-                diagnoza_nazov = f"diagnóza '{diagnoza}'"
-            else:
-                ct_diagnoza = pd.crosstab(df[mutacia], pecen_maska)
-                diagnoza_nazov = "pečeňová diagnóza ('K76.0', 'K75.9')"
+            podmienky.append(f"vek ≤ {vek_do}")
+        vek_popis = " (" + ", ".join(podmienky) + ")" if podmienky else ""
 
-            if ct_diagnoza.shape[0] > 1 and ct_diagnoza.shape[1] > 1:
-                chi2, p, dof, _ = chi2_contingency(ct_diagnoza)
-                vysledky.append(f"{popis} × {diagnoza_nazov}: χ² = {chi2:.2f}, p = {p:.3f}, df = {dof}")
+        vysledky = []
+        for test in testy.itertuples(index=False):
+            popis = f"{test[0]}{vek_popis} × {test[1]}"
+            if pd.isna(test[2]):
+                vysledky.append(f"{popis}: Nedostatok dát pre test.")
             else:
-                vysledky.append(f"{popis} × {diagnoza_nazov}: Nedostatok dát pre test.")
-
+                vysledky.append(f"{popis}: χ² = {test[2]:.2f}, p = {test[3]:.3f}, df = {test[4]}")
         return ui.tags.div(*(ui.tags.p(v) for v in vysledky))
 
-    @reactive.Effect
-    def aktualizuj_vystupy():
-        vek_od = input.vek_od()
-        vek_do = input.vek_do()
-        pohlavie = input.pohlavie()
-        diagnoza = input.diagnoza()
-
-        print(f"Rozmery df pred filtrovaním: {df.shape}")  # Debug
-        filtrovane_data = priprav_data_pre_grafy(df, vek_od, vek_do, pohlavie, diagnoza)
-        print(f"Rozmery filtrovaných dát: {filtrovane_data.shape}")  # Debug
-        filtered_data.set(filtrovane_data)
+    # Filtre sa prevezmú až keď sa vstupy na chvíľu ustália – písanie veku tak spustí
+    # jeden prepočet namiesto jedného pre každý stlačený kláves
+    @debounce(oneskorenie_filtrov)
+    def filtre():
+        return input.vek_od(), input.vek_do(), input.pohlavie(), input.diagnoza()
+
+    # Grafy a testy sa počítajú na pozadí, aby jedna relácia neblokovala ostatné; úloha dostane snímku
+    # a hodnoty filtrov, maska riadkov, výrez kocky aj dáta grafov sa vytvoria až vo vlákne
+    @reactive.extended_task
+    async def uloha_grafov(*args):
+        zrusenie = threading.Event()
+        return await na_pozadi(functools.partial(generuj_grafy, *args, zrusenie=zrusenie), zrusenie)
+
+    @reactive.extended_task
+    async def uloha_chi_kvadrat(*args):
+        return await na_pozadi(functools.partial(vykonaj_chi_kvadrat_testy, *args))
+
+    @reactive.effect
+    def _spusti_ulohu_grafov():
+        if input.page() != "Genotypy, demografia a diagnózy":
+            return
+        vek_od, vek_do, pohlavie, diagnoza = filtre()
+        # novší vstup zruší rozbehnutý výpočet, ďalší sa spustí hneď po jeho ukončení
+        uloha_grafov.cancel()
+        uloha_grafov(snimka(), pohlavie, diagnoza, vek_od, vek_do, input.rezim_grafov())
+
+    @reactive.effect
+    def _spusti_ulohu_chi_kvadrat():
+        if input.page() != "Genotypy, demografia a diagnózy":
+            return
+        vek_od, vek_do, pohlavie, diagnoza = filtre()
+        uloha_chi_kvadrat.cancel()
+        uloha_chi_kvadrat(snimka(), diagnoza, vek_od, vek_do, pohlavie)
 
     @output
     @render.ui
+    @merana("vystup")
     def grafy_vystup():
-        data = filtered_data.get()
-        return generuj_grafy(data,
-                             pohlavie=input.pohlavie(),
-                             diagnoza=input.diagnoza(),
-                             vek_od=input.vek_od(),
-                             vek_do=input.vek_do())
+        return vysledok_ulohy(uloha_grafov, "Grafy sa vykresľujú…")
 
     @output
     @render.ui
+    @merana("vystup")
     def chi_kvadrat_vystup():
-        data = filtered_data.get()
-        return vykonaj_chi_kvadrat_testy(data, diagnoza=input.diagnoza(), vek_od=input.vek_od(), vek_do=input.vek_do(), pohlavie=input.pohlavie())
+        return vysledok_ulohy(uloha_chi_kvadrat, "Testy sa počítajú…")
 
     @output
     @render.ui
+    @merana("vystup")
     def page_ui():
         if input.page() == "Úvod":
             return ui.TagList(
@@ -262,7 +433,9 @@ def server(input, output, session):
                 ui.p("   - Hľadá súvislosti: Skúma, či existuje spojitosť medzi génmi a chorobami, hlavne pečeňovými."),
                 ui.p("   - Vytvára grafy: Zobrazuje dáta o génoch, veku, pohlaví a chorobách v prehľadných grafoch."),
                 ui.p("   - Analyzuje diagnózy: Roztrieďuje diagnózy podľa MKCH-10 a sleduje, ako sa menili v čase."),
-                ui.p("   - Overuje kódy: Kontroluje, či sú MKCH-10 kódy diagnóz správne a aktuálne.")
+                ui.p("   - Overuje kódy: Kontroluje, či sú MKCH-10 kódy diagnóz správne a aktuálne."),
+                ui.p("   - Sleduje laboratórium: Čas od prijatia vzorky po validovaný výsledok podľa rokov a mesiacov."),
+                ui.p("   - Exportuje dáta: Vybraných pacientov aj tabuľky analýz stiahnete ako CSV alebo Parquet.")
             )
         elif input.page() == "Hardy-Weinberg":
             return ui.TagList(
@@ -277,11 +450,15 @@ def server(input, output, session):
                 ui.output_table("chi2_test_table"),
                 ui.h3("Výsledky testu Hardy-Weinbergovej rovnováhy"),
                 ui.output_table("hw_hypothesis_table"),
-                ui.output_table("hw_results_table")
+                ui.output_table("hw_results_table"),
+                ui.h3("Hardy-Weinbergova rovnováha podľa skupín"),
+                ui.input_select("hw_strata", "Rozdeliť podľa:", choices=["Rok", "Pohlavie", "Veková skupina"], selected="Rok"),
+                ui.output_table("hw_strata_table"),
+                ovladanie_exportu("stiahni_tabulku", "Stiahnuť tabuľku", tabulky_exportu["Hardy-Weinberg"])
             )
         elif input.page() == "Genotypy a predispozície":
-            results = analyze_genotype_distribution(df)
-            total_patients = len(df)
+            results = snimka().distribucia_genotypov()
+            total_patients = snimka().pocet_riadkov
             c282y_heterozygot_percent = results["genotype_percentages"].loc[
                 results["genotype_percentages"]["Mutácia"] == "C282Y", "Heterozygot (%)"].iloc[0] if not results[
                 "genotype_percentages"].empty and ("C282Y" in results["genotype_percentages"][
@@ -298,7 +475,10 @@ def server(input, output, session):
                 results["risk_percentages"]["Kategória"] == "C282Y/S65C zložený heterozygot", "Percento (%)"].iloc[
                 0] if not results["risk_percentages"].empty and (
                     "C282Y/S65C zložený heterozygot" in results["risk_percentages"]["Kategória"].values) else "N/A"
-            h63d_s65c_compound_heterozygot_percent = "0.0"  # V dátach sa nevyskytuje
+            h63d_s65c_compound_heterozygot_percent = results["risk_percentages"].loc[
+                results["risk_percentages"]["Kategória"] == "H63D/S65C zložený heterozygot", "Percento (%)"].iloc[
+                0] if not results["risk_percentages"].empty and (
+                    "H63D/S65C zložený heterozygot" in results["risk_percentages"]["Kategória"].values) else "N/A"
 
             return ui.TagList(
                 ui.h2("Genotypy a predispozície k hemochromatóze"),
@@ -308,14 +488,15 @@ def server(input, output, session):
                 ui.h3("Predispozícia k hereditárnej hemochromatóze"),
                 ui.output_table("hemochromatosis_risk_table"),
                 ui.h3("Počet pacientov podľa predispozície"),
-                ui.output_table("predisposition_summary_table")
+                ui.output_table("predisposition_summary_table"),
+                ovladanie_exportu("stiahni_tabulku", "Stiahnuť tabuľku", tabulky_exportu["Genotypy a predispozície"])
             )
         elif input.page() == "Analýza diagnóz":
-            vyskyt = analyzuj_diagnozy(df, "diagnoza MKCH-10", "validovany vysledok", mkch10_data)
             return ui.TagList(
                 ui.h2("Analýza diagnóz podľa MKCH-10"),
                 ui.output_ui("analyza_diagnoz_ui"),  # s podfarbenim ale html
                 # ui.output_table("vyskyt_diagnoz_table") #bez podfarbenia ale v shiny style
+                ovladanie_exportu("stiahni_tabulku", "Stiahnuť tabuľku", tabulky_exportu["Analýza diagnóz"])
             )
         elif input.page() == "MKCH-10":
             if not mkch10_data:
@@ -338,158 +519,206 @@ def server(input, output, session):
                     ui.div(ui.output_text("mkch10_rows_count"), style="text-align: right;"),
                     class_="horizontal-layout justify-content-space-between align-items-start"
                 ),
-                ui.output_ui("mkch10_navigation"),
+                tlacidla_harkov(),
+                ui.div(
+                    ui.input_action_button("mkch10_predosla", "Predošlá", class_="action-button-sm"),
+                    ui.output_text("mkch10_strana_text", inline=True),
+                    ui.input_action_button("mkch10_dalsia", "Ďalšia", class_="action-button-sm"),
+                    class_="horizontal-buttons"
+                ),
                 ui.output_ui("mkch10_current_table")
             )
 
         elif input.page() == "Genotypy, demografia a diagnózy":
+            # nové dáta stránku neprekresľujú (vstupy by sa vynulovali), voľby sa iba aktualizujú
+            with reactive.isolate():
+                moznosti_diagnoz = snimka().moznosti_diagnoz
             return ui.TagList(
                 ui.h2("Vzťah genotypov, demografie a diagnóz"),
 
                 ui.input_numeric("vek_od", "Vek od:", value=0, min=0, max=120),
                 ui.input_numeric("vek_do", "Vek do:", value=100, min=0, max=120),
                 ui.input_select("pohlavie", "Pohlavie:", choices=["Všetky", "Muž", "Žena"], selected="Všetky"),
-                ui.input_select("diagnoza", "Diagnóza (MKCH-10 kód):", choices=diagnozy, selected="Všetky"),
+                ui.input_select("diagnoza", "Diagnóza (MKCH-10 kód):", choices=moznosti_diagnoz, selected="Všetky"),
+                ui.input_radio_buttons("rezim_grafov", "Grafy:", choices=rezimy_grafov, selected="klient", inline=True),
+                ovladanie_exportu("stiahni_pacientov", "Stiahnuť vybraných pacientov"),
 
                 ui.output_ui("grafy_vystup"),
                 ui.output_ui("chi_kvadrat_vystup")
             )
+        elif input.page() == "Čas spracovania vzoriek":
+            with reactive.isolate():
+                prvy_rok, posledny_rok = snimka().casy_spracovania().roky()
+            return ui.TagList(
+                ui.h2("Čas spracovania vzoriek"),
+                ui.p("Čas od prijatia vzorky po validovaný výsledok v dňoch, obdobie je podľa dátumu validácie."),
+                ui.div(
+                    ui.input_select("spracovanie_obdobie", "Obdobie:", choices=obdobia_spracovania, selected="Rok"),
+                    ui.input_slider("spracovanie_roky", "Roky:", min=prvy_rok or 0, max=posledny_rok or 0,
+                                    value=(prvy_rok or 0, posledny_rok or 0), step=1, sep=""),
+                    class_="horizontal-layout align-items-start"
+                ),
+                ui.output_text("spracovanie_suhrn"),
+                ui.h3("Percentily času spracovania"),
+                ui.output_table("spracovanie_percentily_table"),
+                ui.h3("Rozdelenie času spracovania (% vzoriek)"),
+                ui.output_table("spracovanie_rozdelenie_table"),
+                ovladanie_exportu("stiahni_tabulku", "Stiahnuť tabuľku", tabulky_exportu["Čas spracovania vzoriek"])
+            )
+        with reactive.isolate():
+            stlpce_mriezky = snimka().mriezka.stlpce
         return ui.TagList(
             ui.h2("Očistený dataset"),
-            ui.output_table("data_table")
+            ui.div(
+                ui.input_select("data_triedit_podla", "Zoradiť podľa:",
+                                choices={"": "Pôvodné poradie", **{str(i): s for i, s in enumerate(stlpce_mriezky)}}),
+                ui.input_radio_buttons("data_smer", "Smer:", choices={"vzostupne": "Vzostupne", "zostupne": "Zostupne"},
+                                       inline=True),
+                ui.input_select("data_velkost_strany", "Riadkov na stranu:", choices=["25", "50", "100", "250"],
+                                selected="50"),
+                class_="horizontal-layout align-items-start"
+            ),
+            ui.p("Filtre stĺpcov: text sa hľadá ako podreťazec, číselné stĺpce prijímajú aj 50, 20-60, >50 alebo <=30."),
+            ui.div(
+                *(ui.input_text(f"data_filter_{i}", stlpec, width="160px") for i, stlpec in enumerate(stlpce_mriezky)),
+                class_="horizontal-buttons flex-wrap align-items-end"
+            ),
+            ui.div(
+                ui.input_action_button("data_predosla", "Predošlá", class_="action-button-sm"),
+                ui.output_text("data_strana_text", inline=True),
+                ui.input_action_button("data_dalsia", "Ďalšia", class_="action-button-sm"),
+                class_="horizontal-buttons"
+            ),
+            ui.output_table("data_table"),
+            ovladanie_exportu("stiahni_data", "Stiahnuť vyfiltrované riadky")
         )
 
-    @reactive.Effect
-    @reactive.event(input.mkch10_hladaj_button)
-    def _perform_search():
-        hladany_vyraz = input.mkch10_hladaj()
+    def vyhladaj_v_mkch10(hladany_vyraz):
         if mkch10_data:
-            temp_filtered_data = {}
-            sheet_names_list = list(mkch10_data.keys())
-            for sheet_name, df in mkch10_data.items():
-                if sheet_name == nazvy_harkov_mkch10[0]:
-                    continue
-
-                kod_col = 'Kód diagnózy' if 'Kód diagnózy' in df.columns else 'Kód' if 'Kód' in df.columns else None
-                nazov_col = 'Nazov' if 'Nazov' in df.columns else 'Názov' if 'Názov' in df.columns else None
-
-                if kod_col and nazov_col:
-                    filtered_df = df[
-                        df[kod_col].str.contains(hladany_vyraz, case=False, na=False) |
-                        df[nazov_col].str.contains(hladany_vyraz, case=False, na=False)
-                        ].fillna('')
-                    if not filtered_df.empty:
-                        temp_filtered_data[sheet_name] = filtered_df
-                else:
-                    logging.warning(f"V hárku '{sheet_name}' sa nenašli stĺpce pre kód alebo názov.")
-
-            filtered_mkch10_data.set(temp_filtered_data)
+            # hárok -> pozície nájdených riadkov, hárky zoradené podľa najlepšej zhody
+            vysledky = dict(index_vyhladavania.hladaj(hladany_vyraz))
+            filtered_mkch10_data.set(vysledky)
             search_performed.set(True)
-            current_sheet_index.set(0)
+            if vysledky:
+                current_sheet_index.set(sheet_names().index(next(iter(vysledky))))
         else:
             filtered_mkch10_data.set(None)
             search_performed.set(False)
 
-    @output
-    @render.ui
-    def mkch10_current_table():
-        current_index = current_sheet_index()
-        rendered_table = ui.div("Žiadne výsledky vyhľadávania.")
-
-        if search_performed.get() and filtered_mkch10_data.get():
-            filtered_data = list(filtered_mkch10_data().values())
-            filtered_sheet_names = list(filtered_mkch10_data().keys())
-
-            if filtered_data:
-                if current_index < len(filtered_data):
-                    data_to_render = filtered_data[current_index]
-                    current_sheet_name = filtered_sheet_names[current_index]
-
-                    def format_row(row):
-                        podfarbit = False
-                        kod_col_name = 'Kód' if 'Kód' in data_to_render.columns else 'Kód diagnózy' if 'Kód diagnózy' in data_to_render.columns else None
-                        if kod_col_name and '-' in str(row[kod_col_name]):
-                            podfarbit = True
-                        cells = [tags.td("" if pd.isna(value) else str(value)) for value in row.values]
-                        return tags.tr(style="background-color: #F0F0F0;" if podfarbit else "", *cells)
-
-                    table_header = tags.thead(
-                        tags.tr(*[tags.th(col, style="background-color: #F0F8FF;") for col in data_to_render.columns]))
-                    table_body = tags.tbody(*[format_row(row) for index, row in data_to_render.iterrows()])
-                    rendered_table = ui.TagList(
-                        ui.div(f"Výsledky z hárku: {current_sheet_name}",
-                               style="font-size: 1.1em; font-weight: bold; margin-bottom: 5px;"),
-                        tags.table(table_header, table_body, class_="dataframe")
-                    )
-            else:
-                rendered_table = ui.div("Žiadne výsledky pre zadaný výraz.")
-
-        elif not search_performed.get():
-            current_sheet_name = sheet_names()[current_index]
-            data_to_render = mkch10_data.get(current_sheet_name)
-            if data_to_render is not None:
-                def format_row(row):
-                    podfarbit = False
-                    kod_col_name = 'Kód' if 'Kód' in data_to_render.columns else 'Kód diagnózy' if 'Kód diagnózy' in data_to_render.columns else None
-                    if kod_col_name and '-' in str(row[kod_col_name]):
-                        podfarbit = True
-                    cells = [tags.td("" if pd.isna(value) else str(value)) for value in row.values]
-                    return tags.tr(style="background-color: #F0F0F0;" if podfarbit else "", *cells)
-
-                table_header = tags.thead(
-                    tags.tr(*[tags.th(col, style="background-color: #F0F8FF;") for col in data_to_render.columns]))
-                table_body = tags.tbody(*[format_row(row) for index, row in data_to_render.iterrows()])
-                rendered_table = tags.table(table_header, table_body, class_="dataframe")
-            else:
-                rendered_table = ui.div("Dáta pre tento hárok neboli načítané.")
+    @reactive.Effect
+    @reactive.event(input.mkch10_hladaj_button)
+    def _perform_search():
+        vyhladaj_v_mkch10(input.mkch10_hladaj())
+
+    # Vyhľadávanie počas písania – index je dosť rýchly na dotaz po každom ustálení textu
+    @debounce(oneskorenie_vyhladavania)
+    def mkch10_dotaz():
+        return input.mkch10_hladaj()
+
+    @reactive.Effect
+    def _hladaj_pocas_pisania():
+        hladany_vyraz = mkch10_dotaz()
+        with reactive.isolate():
+            if len(hladany_vyraz.strip()) >= 2:
+                vyhladaj_v_mkch10(hladany_vyraz)
+            elif search_performed.get():
+                filtered_mkch10_data.set(None)
+                search_performed.set(False)
+
+    def stav_tlacidla_harku(nazov):
+        # počas vyhľadávania tlačidlo ukazuje počet nájdených riadkov, hárky bez zhody sú neaktívne
+        if not search_performed.get():
+            return nazov, False
+        pocet = len((filtered_mkch10_data.get() or {}).get(nazov, ()))
+        return f"{nazov} ({pocet})", pocet == 0
+
+    def tlacidla_harkov():
+        tlacidla = []
+        with reactive.isolate():
+            for i, nazov in enumerate(sheet_names()):
+                popis, neaktivne = stav_tlacidla_harku(nazov)
+                tlacidla.append(ui.input_action_button(f"goto_sheet_{i}", popis, class_="action-button-nav",
+                                                       style="margin-right: 5px;", disabled=neaktivne))
+        return ui.div(*tlacidla, style="margin-bottom: 10px; overflow-x: auto; white-space: nowrap;")
 
-        elif search_performed.get() and not filtered_mkch10_data.get():
-            rendered_table = ui.div("Žiadne výsledky pre zadaný výraz.")
+    @reactive.Effect
+    def _aktualizuj_tlacidla_harkov():
+        search_performed()
+        filtered_mkch10_data()
+        with reactive.isolate():
+            for i, nazov in enumerate(sheet_names()):
+                popis, neaktivne = stav_tlacidla_harku(nazov)
+                ui.update_action_button(f"goto_sheet_{i}", label=popis, disabled=neaktivne)
+
+    def sleduj_tlacidlo_harku(i):
+        @reactive.Effect
+        @reactive.event(input[f"goto_sheet_{i}"])
+        def _prejdi_na_harok():
+            current_sheet_index.set(i)
+
+    for i in range(len(mkch10_data or {})):
+        sleduj_tlacidlo_harku(i)
+
+    @reactive.calc
+    def mkch10_zobrazene_riadky():
+        # (hárok, pozície riadkov); pozície None znamenajú celý hárok
+        harok = sheet_names()[current_sheet_index()]
+        if search_performed():
+            return harok, (filtered_mkch10_data() or {}).get(harok, [])
+        return harok, None
+
+    @reactive.calc
+    def mkch10_pocet_riadkov():
+        harok, pozicie = mkch10_zobrazene_riadky()
+        if pozicie is not None:
+            return len(pozicie)
+        return len(mkch10_data[harok]) if harok in mkch10_data else 0
+
+    @reactive.calc
+    def mkch10_pocet_stran():
+        return pocet_stran(mkch10_pocet_riadkov(), velkost_strany_mkch10)
+
+    @reactive.Effect
+    def _mkch10_reset_strany():
+        mkch10_zobrazene_riadky()
+        mkch10_strana.set(0)
+
+    @reactive.Effect
+    @reactive.event(input.mkch10_predosla)
+    def _mkch10_predosla():
+        mkch10_strana.set(max(mkch10_strana() - 1, 0))
 
-        return rendered_table
+    @reactive.Effect
+    @reactive.event(input.mkch10_dalsia)
+    def _mkch10_dalsia():
+        mkch10_strana.set(min(mkch10_strana() + 1, mkch10_pocet_stran() - 1))
+
+    @output
+    @render.text
+    @merana("vystup")
+    def mkch10_strana_text():
+        return f"Strana {mkch10_strana() + 1} z {mkch10_pocet_stran()}"
 
     @output
     @render.ui
-    def mkch10_navigation():
-        names = sheet_names()
-        nav_buttons = []
-        import random
-        if search_performed.get() and filtered_mkch10_data.get():
-            filtered_sheet_names = list(filtered_mkch10_data().keys())
-            for i, name in enumerate(filtered_sheet_names):
-                nav_buttons.append(ui.input_action_button(f"goto_sheet_filtered_{i}", name, class_="action-button-nav",
-                                                          style="margin-right: 5px;",
-                                                          key=f"filtered_nav_{i}_{random.random()}"))
-        else:
-            for i, name in enumerate(names):
-                nav_buttons.append(ui.input_action_button(f"goto_sheet_{i}", name, class_="action-button-nav",
-                                                          style="margin-right: 5px;", key=f"nav_{i}_{random.random()}"))
-        return ui.div(*nav_buttons, style="margin-bottom: 10px; overflow-x: auto; white-space: nowrap;")
+    @merana("vystup")
+    def mkch10_current_table():
+        harok, pozicie = mkch10_zobrazene_riadky()
 
-    previous_clicks = {}
+        if search_performed.get():
+            if not filtered_mkch10_data.get():
+                return ui.div("Žiadne výsledky pre zadaný výraz.")
+            if not pozicie:
+                return ui.div("V tomto hárku sa nenašli žiadne výsledky.")
+            return ui.TagList(
+                ui.div(f"Výsledky z hárku: {harok}",
+                       style="font-size: 1.1em; font-weight: bold; margin-bottom: 5px;"),
+                ui.HTML(zobrazenie_mkch10.tabulka(harok, pozicie, mkch10_strana()))
+            )
 
-    @reactive.Effect
-    def _update_sheet_index_from_nav():
-        names = sheet_names()
-        if search_performed.get() and filtered_mkch10_data.get():
-            filtered_sheet_names = list(filtered_mkch10_data().keys())
-            for i in range(len(filtered_sheet_names)):
-                btn_id = f"goto_sheet_filtered_{i}"
-                current_clicks = input[btn_id]()
-                previous = previous_clicks.get(btn_id, 0)
-                if current_clicks > previous:
-                    print(f"Kliknuté (value) na filtrované tlačidlo s indexom: {i}")
-                    current_sheet_index.set(i)
-                previous_clicks[btn_id] = current_clicks
-        else:
-            for i in range(len(names)):
-                btn_id = f"goto_sheet_{i}"
-                current_clicks = input[btn_id]()
-                previous = previous_clicks.get(btn_id, 0)
-                if current_clicks > previous:
-                    print(f"Kliknuté (value) na tlačidlo s indexom: {i}")
-                    current_sheet_index.set(i)
-                previous_clicks[btn_id] = current_clicks
+        if harok not in mkch10_data:
+            return ui.div("Dáta pre tento hárok neboli načítané.")
+        return ui.HTML(zobrazenie_mkch10.tabulka(harok, None, mkch10_strana()))
 
     @reactive.Effect
     @reactive.event(input.mkch10_reset_search)
@@ -499,32 +728,71 @@ def server(input, output, session):
 
     @output
     @render.text
+    @merana("vystup")
     def mkch10_rows_count():
-        if search_performed.get() and filtered_mkch10_data.get():
-            filtered_data = list(filtered_mkch10_data().values())
-            if filtered_data and current_sheet_index() < len(filtered_data):
-                return f"Počet nájdených riadkov: {len(filtered_data[current_sheet_index()])}"
-            else:
-                return "Žiadne výsledky."
+        if search_performed.get():
+            if filtered_mkch10_data.get():
+                return f"Počet nájdených riadkov: {mkch10_pocet_riadkov()}"
+            return "Žiadne výsledky."
         elif mkch10_data and sheet_names():
-            current_sheet_name = sheet_names()[current_sheet_index()]
-            data_to_render = mkch10_data.get(current_sheet_name)
-            if data_to_render is not None:
-                return f"Počet riadkov v aktuálnom hárku: {len(data_to_render)}"
-            else:
-                return ""
+            return f"Počet riadkov v aktuálnom hárku: {mkch10_pocet_riadkov()}"
         else:
             return ""
 
+    # Filtre mriežky sa prepočítajú až po dopísaní textu, rovnako ako filtre demografie
+    @debounce(oneskorenie_filtrov)
+    def data_filtre():
+        return {stlpec: input[f"data_filter_{i}"]() for i, stlpec in enumerate(snimka().mriezka.stlpce)}
+
+    @reactive.calc
+    def data_poradie():
+        stlpec = input.data_triedit_podla()
+        mriezka = snimka().mriezka
+        return mriezka.poradie(data_filtre(),
+                               mriezka.stlpce[int(stlpec)] if stlpec else None,
+                                   input.data_smer() != "zostupne")
+
+    @reactive.calc
+    def data_velkost_strany():
+        return int(input.data_velkost_strany())
+
+    @reactive.calc
+    def data_pocet_stran():
+        return pocet_stran(len(data_poradie()), data_velkost_strany())
+
+    @reactive.Effect
+    def _data_reset_strany():
+        # nové filtre, zoradenie alebo veľkosť strany začínajú vždy od prvej strany
+        data_poradie()
+        data_velkost_strany()
+        data_strana.set(0)
+
+    @reactive.Effect
+    @reactive.event(input.data_predosla)
+    def _data_predosla():
+        data_strana.set(max(data_strana() - 1, 0))
+
+    @reactive.Effect
+    @reactive.event(input.data_dalsia)
+    def _data_dalsia():
+        data_strana.set(min(data_strana() + 1, data_pocet_stran() - 1))
+
     @output
-    @render.table
+    @render.text
+    @merana("vystup")
+    def data_strana_text():
+        return f"Strana {data_strana() + 1} z {data_pocet_stran()} ({len(data_poradie())} riadkov)"
+
+    @output
+    @render.table(float_format="{:g}".format)
+    @merana("vystup")
     def data_table():
-        return df
+        return snimka().mriezka.strana(data_poradie(), data_strana(), data_velkost_strany())
 
-    def generate_hw_table(df, value_extractor):
+    def generate_hw_table(snimka_dat, value_extractor):
         results = []
         for column in ["HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]", "HFE G845A (C282Y) [HFE]"]:
-            hw_result = check_hardy_weinberg(df, column)
+            hw_result = snimka_dat.hardy_weinberg(column)
             if hw_result is not None:
                 results.append(value_extractor(hw_result, column))
             else:
@@ -545,8 +813,9 @@ def server(input, output, session):
 
     @output
     @render.table
+    @merana("vystup")
     def allele_info_table():
-     return generate_hw_table(df, lambda r, c: {
+     return generate_hw_table(snimka(), lambda r, c: {
          "Mutácia": r.get("Mutácia", c),
          "Celkový počet alel": r.get("allele_info", {}).get("total_alleles") if r and r.get("allele_info") is not None else "N/A",
          "Počet normálnych alel": r.get("allele_info", {}).get("normal_alleles") if r and r.get("allele_info") is not None else "N/A",
@@ -558,8 +827,9 @@ def server(input, output, session):
 
     @output
     @render.table
+    @merana("vystup")
     def observed_values_table():
-     return generate_hw_table(df, lambda r, c: {
+     return generate_hw_table(snimka(), lambda r, c: {
          "Mutácia": r.get("Mutácia", c),
          "Normal": r.get("observed", {}).get("normal") if r and r.get("observed") is not None else "N/A",
          "Heterozygot": r.get("observed", {}).get("heterozygot") if r and r.get("observed") is not None else "N/A",
@@ -569,8 +839,9 @@ def server(input, output, session):
 
     @output
     @render.table
+    @merana("vystup")
     def expected_values_table():
-     return generate_hw_table(df, lambda r, c: {
+     return generate_hw_table(snimka(), lambda r, c: {
          "Mutácia": r.get("Mutácia", c),
          "Normal": round(r.get("expected", {}).get("normal"), 2) if r and r.get("expected") is not None and r.get("expected").get("normal") is not None else "N/A",
          "Heterozygot": round(r.get("expected", {}).get("heterozygot"), 2) if r and r.get("expected") is not None and r.get("expected").get("heterozygot") is not None else "N/A",
@@ -580,17 +851,20 @@ def server(input, output, session):
 
     @output
     @render.table
+    @merana("vystup")
     def chi2_test_table():
-     return generate_hw_table(df, lambda r, c: {
+     return generate_hw_table(snimka(), lambda r, c: {
          "Mutácia": r.get("Mutácia", c),
          "Chi-kvadrát test": round(r.get("chi2_results", {}).get("chi2"), 5) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("chi2") is not None else "N/A",
          "Stupne voľnosti": r.get("chi2_results", {}).get("df") if r and r.get("chi2_results") is not None else "N/A",
          "p-hodnota": format_p_value(r.get("chi2_results", {}).get("p_value")) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("p_value") is not None else "N/A",
+         "Exaktná p-hodnota": format_p_value(r.get("chi2_results", {}).get("p_value_exact")) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("p_value_exact") is not None else "N/A",
          "Dôvod N/A": r.get("reason_na", "Dostatočné dáta") if r is not None else "Chyba pri výpočte (pravdepodobne nedostatok dát)"
      })
 
     @output
     @render.table
+    @merana("vystup")
     def hw_hypothesis_table():
      hypothesis_df = pd.DataFrame([
          {
@@ -604,11 +878,13 @@ def server(input, output, session):
 
     @output
     @render.table
+    @merana("vystup")
     def hw_results_table():
-     return generate_hw_table(df, lambda r, c: {
+     return generate_hw_table(snimka(), lambda r, c: {
          "Mutácia": r.get("Mutácia", c),
          "Chi-kvadrát test": round(r.get("chi2_results", {}).get("chi2"), 5) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("chi2") is not None else "N/A",
          "p-hodnota": format_p_value(r.get("chi2_results", {}).get("p_value")) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("p_value") is not None else "N/A",
+         "Exaktná p-hodnota": format_p_value(r.get("chi2_results", {}).get("p_value_exact")) if r and r.get("chi2_results") is not None and r.get("chi2_results").get("p_value_exact") is not None else "N/A",
          "Výsledok": (
              "Na základe chi-kvadrát testu sa nulová hypotéza H0 o Hardy-Weinbergovej rovnováhe nezamieta."
              if r and r.get("chi2_results") is not None and r.get("chi2_results").get("p_value") is not None and r["chi2_results"]["p_value"] > 0.05
@@ -621,11 +897,47 @@ def server(input, output, session):
          "Dôvod N/A": r.get("reason_na", "Dostatočné dáta") if r is not None else "Chyba pri výpočte (pravdepodobne nedostatok dát)"
      })
 
+    def vyber_spracovania():
+        rok_od, rok_do = input.spracovanie_roky()
+        return input.spracovanie_obdobie(), int(rok_od), int(rok_do)
 
     @output
-    @render.ui
-    def analyza_diagnoz_ui():
-        analyza = analyzuj_diagnozy(df, "diagnoza MKCH-10", "validovany vysledok", mkch10_data)
+    @render.text
+    @merana("vystup")
+    def spracovanie_suhrn():
+        casy = snimka().casy_spracovania()
+        text = f"Vzoriek s oboma dátumami: {len(casy.dni)}"
+        if casy.pocet_vynechanych:
+            text += f", vynechaných {casy.pocet_vynechanych} (chýbajúci dátum alebo validácia pred prijatím: " \
+                    f"{casy.pocet_zapornych})"
+        return text + "."
+
+    @output
+    @render.table(float_format="{:.2f}".format)
+    @merana("vystup")
+    def spracovanie_percentily_table():
+        return snimka().casy_spracovania().percentily(*vyber_spracovania())
+
+    @output
+    @render.table(float_format="{:.1f}".format)
+    @merana("vystup")
+    def spracovanie_rozdelenie_table():
+        return snimka().casy_spracovania().rozdelenie(*vyber_spracovania())
+
+    @output
+    @render.table
+    @merana("vystup")
+    def hw_strata_table():
+     # všetky lokusy a skupiny sa počítajú jedným vektorovým výpočtom
+     tabulka = hardy_weinberg_podla_strat(snimka().df, tuple(stlpce_genotypov), input.hw_strata()).copy()
+     for stlpec in ["p-hodnota", "Exaktná p-hodnota"]:
+         tabulka[stlpec] = tabulka[stlpec].map(lambda p: "N/A" if pd.isna(p) else format_p_value(p))
+     tabulka["Chi-kvadrát test"] = tabulka["Chi-kvadrát test"].map(lambda x: "N/A" if pd.isna(x) else x)
+     return tabulka
+
+    @merana("uloha")
+    def analyza_diagnoz_html(snimka_dat):
+        analyza = snimka_dat.vyskyt_diagnoz(mkch10_data, mkch10_index)
         vyskyt_diagnoz_df = analyza['vyskyt_diagnoz']
         celkovy_pocet = analyza['celkovy_pocet']
         chybne_kody_df = analyza['chybne_kody']
@@ -651,35 +963,134 @@ def server(input, output, session):
                 chybne_kody_df["diagnoza MKCH-10"].tolist()) if not chybne_kody_df.empty else "Žiadne chybné kódy")
         )
 
+    @reactive.extended_task
+    async def uloha_diagnoz(snimka_dat):
+        return await na_pozadi(functools.partial(analyza_diagnoz_html, snimka_dat))
+
+    @reactive.effect
+    def _spusti_ulohu_diagnoz():
+        if input.page() != "Analýza diagnóz":
+            return
+        aktualna = snimka()
+        uloha_diagnoz.cancel()
+        uloha_diagnoz(aktualna)
+
+    @output
+    @render.ui
+    @merana("vystup")
+    def analyza_diagnoz_ui():
+        return vysledok_ulohy(uloha_diagnoz, "Analýza diagnóz sa počíta…")
+
     @output
     @render.text
+    @merana("vystup")
     def chybne_kody_text():
-        analyza = analyzuj_diagnozy(df, "diagnoza MKCH-10", "validovany vysledok", mkch10_data)
+        analyza = snimka().vyskyt_diagnoz(mkch10_data, mkch10_index)
         chybne_kody = analyza['chybne_kody']
         return f"Chybné kódy: {', '.join(chybne_kody['diagnoza MKCH-10'])}" if not chybne_kody.empty else "Žiadne chybné kódy"
 
     @output
     @render.table
+    @merana("vystup")
     def genotype_distribution_table():
-        return analyze_genotype_distribution(df)["genotype_percentages"]
+        return snimka().distribucia_genotypov()["genotype_percentages"]
 
     @output
     @render.table
+    @merana("vystup")
     def hemochromatosis_risk_table():
-        return analyze_genotype_distribution(df)["risk_percentages"]
+        return snimka().distribucia_genotypov()["risk_percentages"]
 
     @output
     @render.table
+    @merana("vystup")
     def predisposition_summary_table():
-     predisposition_df = analyze_genotype_distribution(df)["predisposition_table"]
+     # výsledok je zdieľaný v cache, upravuje sa kópia
+     predisposition_df = snimka().distribucia_genotypov()["predisposition_table"].astype({"Percento (%)": object})
      predisposition_df.loc[predisposition_df["Skupina"] == "Celkový počet pacientov", "Percento (%)"] = ""
      return predisposition_df
 
     @output
     @render.table
+    @merana("vystup")
     def vyskyt_diagnoz_table():
-     analyza = analyzuj_diagnozy(df, "diagnoza MKCH-10", "validovany vysledok", mkch10_data)
+     analyza = snimka().vyskyt_diagnoz(mkch10_data, mkch10_index)
      return analyza['vyskyt_diagnoz']
 
+    # Sťahovanie: snímka a vstupy sa prečítajú v relácii pri požiadavke, výpočet aj zápis súboru
+    # po dávkach (exporty.po_davkach) bežia vo vláknach, takže export nezablokuje reláciu
+    def vypocet_tabulky(nazov):
+        aktualna = snimka()
+        if nazov in ("hardy_weinberg", "hardy_weinberg_skupiny"):
+            typ_strat = input.hw_strata() if nazov == "hardy_weinberg_skupiny" else None
+            return functools.partial(hardy_weinberg_tabulka, aktualna.df, typ_strat)
+        if nazov in ("genotype_percentages", "risk_percentages", "predisposition_table"):
+            return lambda: aktualna.distribucia_genotypov()[nazov]
+        if nazov in ("vyskyt_diagnoz", "chybne_kody"):
+            return lambda: aktualna.vyskyt_diagnoz(mkch10_data, mkch10_index)[nazov]
+        if nazov in ("casy_percentily", "casy_rozdelenie"):
+            vyber = vyber_spracovania()
+            if nazov == "casy_percentily":
+                return lambda: aktualna.casy_spracovania().percentily(*vyber)
+            return lambda: aktualna.casy_spracovania().rozdelenie(*vyber)
+        raise ValueError(f"Neznáma tabuľka exportu: {nazov}")
+
+    def nazov_exportu(nazov):
+        return lambda: f"{nazov() if callable(nazov) else nazov}.{input.export_format()}"
+
+    def typ_exportu():
+        return formaty_exportu[input.export_format()]
+
+    @output
+    @render.download_button(filename=nazov_exportu(input.export_tabulka), media_type=typ_exportu)
+    async def stiahni_tabulku():
+        davky = davky_exportu(vypocet_tabulky(input.export_tabulka()), input.export_format())
+        with meraj("export.stiahni_tabulku"):
+            async for davka in davky_na_pozadi(davky):
+                yield davka
+
+    @output
+    @render.download_button(filename=nazov_exportu("pacienti"), media_type=typ_exportu)
+    async def stiahni_pacientov():
+        vek_od, vek_do, pohlavie, diagnoza = filtre()
+        aktualna = snimka()
+
+        def vypocet():
+            # riadky sa vyberú podľa pozícií až pri zápise dávky, vybraná podmnožina sa nekopíruje;
+            # stĺpce zodpovedajú vstupnému datasetu (bez odvodených), pri diagnóze ako v grafoch
+            df = aktualna.df.drop(columns=odvodene_stlpce, errors="ignore")
+            if diagnoza and diagnoza.strip() != "" and diagnoza != "Všetky":
+                df["diagnoza_ano_nie"] = pd.Categorical.from_codes(
+                    aktualna.index_diagnoz.maska(diagnoza).astype(np.int8), categories=["Nie", "Áno"])
+            return df, np.flatnonzero(maska_demografie(df, vek_od, vek_do, pohlavie).to_numpy())
+
+        with meraj("export.stiahni_pacientov"):
+            async for davka in davky_na_pozadi(davky_exportu(vypocet, input.export_format())):
+                yield davka
+
+    @output
+    @render.download_button(filename=nazov_exportu("dataset"), media_type=typ_exportu)
+    async def stiahni_data():
+        # riadky a poradie ako v mriežke (všetky strany)
+        df, pozicie = snimka().df, data_poradie()
+        davky = davky_exportu(lambda: (df.drop(columns=odvodene_stlpce, errors="ignore"), pozicie), input.export_format())
+        with meraj("export.stiahni_data"):
+            async for davka in davky_na_pozadi(davky):
+                yield davka
+
+
+async def metriky_prometheus(request):
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+async def metriky_json(request):
+    return JSONResponse({"merania": statistiky_merani(), "cache": uspesnost_cache()})
+
 
-app = App(app_ui, server)
+# Metriky (histogramy trvania výstupov a funkcií, úspešnosť cache) sú na /metrics vo formáte
+# Prometheus a na /metrics.json; ostatné cesty obsluhuje Shiny aplikácia
+app = Starlette(routes=[
+    Route("/metrics", metriky_prometheus),
+    Route("/metrics.json", metriky_json),
+    Mount("/", app=App(app_ui, server)),
+], lifespan=beh_servera)
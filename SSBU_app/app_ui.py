@@ -51,6 +51,18 @@ css = ui.tags.style("""
     .vertical-layout > * {
         margin-bottom: 5px;
     }
+    .zastupny-obsah { /* Zástupný obsah, kým sa výstup počíta na pozadí */
+        color: #777;
+        font-style: italic;
+        padding: 20px 0;
+    }
+    .ovladanie-exportu { /* Výber tabuľky, formát a tlačidlo sťahovania */
+        display: flex;
+        flex-wrap: wrap;
+        align-items: center;
+        gap: 15px;
+        margin: 10px 0;
+    }
     .action-button-sm {
         padding: 5px 10px;
         font-size: 0.8em;
@@ -72,6 +84,16 @@ css = ui.tags.style("""
          /* display: inline-block;  Odstránené */
          vertical-align: top;
      }
+     .graf-klient {
+         margin: 10px 5px;
+     }
+     .graf-svg {
+         display: block;
+         width: 100%;
+         max-width: 640px;
+         height: auto;
+         font: 12px sans-serif;
+     }
      .graf-obrazok {
          /* width: 650px;  Odstránené, kontroluje sa v img style */
          margin: 10px 5px;
@@ -81,14 +103,137 @@ css = ui.tags.style("""
      }
 """)
 
+# Vykresľovanie grafov v prehliadači: každý div.graf-klient nesie v data-graf JSON popis grafu
+# (grafy.popis_grafu) a po vložení do stránky sa z neho nakreslí SVG
+js_grafy = ui.tags.script("""
+(function () {
+    var svgNS = "http://www.w3.org/2000/svg";
+    var sirka = 640, vyska = 420, legenda = 120;
+    var okraj = {hore: 40, vpravo: 15, dole: 50, vlavo: 65};
+    // farby ako v plotnine: sivá bez skupín, inak predvolená paleta odtieňov
+    var palety = {1: ["#595959"], 2: ["#F8766D", "#00BFC4"], 3: ["#F8766D", "#00BA38", "#619CFF"]};
+
+    function prvok(nazov, atributy, rodic, text) {
+        var el = document.createElementNS(svgNS, nazov);
+        for (var kluc in atributy) el.setAttribute(kluc, atributy[kluc]);
+        if (text !== undefined) el.textContent = text;
+        rodic.appendChild(el);
+        return el;
+    }
+
+    function cislo(hodnota) {
+        return hodnota.toLocaleString("sk-SK", {maximumFractionDigits: 2});
+    }
+
+    function krokOsi(rozsah) {
+        // približne 5 dielikov s krokom 1, 2 alebo 5 × 10^n
+        var hrubo = rozsah / 5, rad = Math.pow(10, Math.floor(Math.log10(hrubo)));
+        return [1, 2, 5, 10].find(function (n) { return n * rad >= hrubo; }) * rad;
+    }
+
+    function vykresli(kontajner, graf) {
+        var svg = prvok("svg", {viewBox: "0 0 " + sirka + " " + vyska, "class": "graf-svg", role: "img",
+                                "aria-label": graf.nadpis}, kontajner);
+        var sLegendou = graf.druh === "stlpce" && graf.legenda !== null;
+        var sirkaPlochy = sirka - okraj.vlavo - okraj.vpravo - (sLegendou ? legenda : 0);
+        var vyskaPlochy = vyska - okraj.hore - okraj.dole;
+
+        var dolna, horna;
+        if (graf.druh === "stlpce") {
+            dolna = 0;
+            horna = Math.max.apply(null, [].concat.apply([1], graf.hodnoty)) * 1.05;
+        } else {
+            var hodnoty = [];
+            graf.krabice.forEach(function (k) { hodnoty.push(k.min, k.max); hodnoty.push.apply(hodnoty, k.odlahle); });
+            dolna = Math.min.apply(null, hodnoty);
+            horna = Math.max.apply(null, hodnoty);
+            var rezerva = Math.max((horna - dolna) * 0.05, 1);
+            dolna -= rezerva;
+            horna += rezerva;
+        }
+        function y(hodnota) { return okraj.hore + vyskaPlochy * (1 - (hodnota - dolna) / (horna - dolna)); }
+        var pas = sirkaPlochy / Math.max(graf.kategorie.length, 1);
+        function stredX(i) { return okraj.vlavo + pas * (i + 0.5); }
+
+        // mriežka a os y
+        var krok = krokOsi(horna - dolna);
+        for (var t = Math.ceil(dolna / krok) * krok; t <= horna; t += krok) {
+            prvok("line", {x1: okraj.vlavo, x2: okraj.vlavo + sirkaPlochy, y1: y(t), y2: y(t), stroke: "#ebebeb"}, svg);
+            prvok("text", {x: okraj.vlavo - 6, y: y(t), "text-anchor": "end", "dominant-baseline": "middle",
+                           fill: "#4d4d4d"}, svg, cislo(Math.round(t * 1e6) / 1e6));
+        }
+        graf.kategorie.forEach(function (kategoria, i) {
+            prvok("text", {x: stredX(i), y: okraj.hore + vyskaPlochy + 16, "text-anchor": "middle", fill: "#4d4d4d"},
+                  svg, kategoria);
+        });
+        prvok("text", {x: okraj.vlavo, y: 20, "font-size": "14"}, svg, graf.nadpis);
+        prvok("text", {x: okraj.vlavo + sirkaPlochy / 2, y: vyska - 10, "text-anchor": "middle"}, svg, graf.os_x);
+        prvok("text", {x: 16, y: okraj.hore + vyskaPlochy / 2, "text-anchor": "middle",
+                       transform: "rotate(-90 16 " + (okraj.hore + vyskaPlochy / 2) + ")"}, svg, graf.os_y);
+
+        if (graf.druh === "stlpce") {
+            var farby = palety[graf.skupiny.length] || palety[3];
+            var sirkaStlpca = pas * 0.9 / graf.skupiny.length;
+            graf.hodnoty.forEach(function (riadok, i) {
+                riadok.forEach(function (pocet, j) {
+                    if (!pocet) return;
+                    var obdlznik = prvok("rect", {x: stredX(i) - pas * 0.45 + j * sirkaStlpca, y: y(pocet),
+                                                  width: sirkaStlpca, height: y(0) - y(pocet),
+                                                  fill: farby[j % farby.length]}, svg);
+                    prvok("title", {}, obdlznik, graf.kategorie[i] + (graf.skupiny[j] ? ", " + graf.skupiny[j] : "")
+                          + ": " + cislo(pocet));
+                });
+            });
+            if (sLegendou) {
+                var xLegendy = sirka - legenda + 5;
+                prvok("text", {x: xLegendy, y: okraj.hore + 10}, svg, graf.legenda);
+                graf.skupiny.forEach(function (skupina, j) {
+                    prvok("rect", {x: xLegendy, y: okraj.hore + 22 + j * 22, width: 14, height: 14,
+                                   fill: farby[j % farby.length]}, svg);
+                    prvok("text", {x: xLegendy + 20, y: okraj.hore + 33 + j * 22}, svg, skupina);
+                });
+            }
+        } else {
+            var sirkaKrabice = pas * 0.75;
+            graf.krabice.forEach(function (k, i) {
+                var x = stredX(i), skupina = prvok("g", {stroke: "#333333", fill: "none"}, svg);
+                prvok("title", {}, skupina, graf.kategorie[i] + ": n = " + cislo(k.pocet) + ", medián = "
+                      + cislo(k.median) + ", kvartily " + cislo(k.q1) + " – " + cislo(k.q3));
+                prvok("line", {x1: x, x2: x, y1: y(k.max), y2: y(k.q3)}, skupina);
+                prvok("line", {x1: x, x2: x, y1: y(k.q1), y2: y(k.min)}, skupina);
+                prvok("rect", {x: x - sirkaKrabice / 2, y: y(k.q3), width: sirkaKrabice,
+                               height: Math.max(y(k.q1) - y(k.q3), 1), fill: "#ffffff"}, skupina);
+                prvok("line", {x1: x - sirkaKrabice / 2, x2: x + sirkaKrabice / 2, y1: y(k.median), y2: y(k.median),
+                               "stroke-width": 2}, skupina);
+                k.odlahle.forEach(function (hodnota) {
+                    prvok("circle", {cx: x, cy: y(hodnota), r: 2, fill: "#333333"}, skupina);
+                });
+            });
+        }
+    }
+
+    function vykresliNove() {
+        document.querySelectorAll(".graf-klient:not([data-vykresleny])").forEach(function (el) {
+            el.setAttribute("data-vykresleny", "");
+            vykresli(el, JSON.parse(el.getAttribute("data-graf")));
+        });
+    }
+
+    // výstupy Shiny vkladajú HTML dynamicky, grafy sa preto kreslia pri každej zmene stránky
+    new MutationObserver(vykresliNove).observe(document.documentElement, {childList: true, subtree: true});
+})();
+""")
+
 app_ui = ui.page_fluid(
     css,
+    js_grafy,
     ui.layout_sidebar(
         ui.sidebar(
             ui.panel_title("SSBU"),
             ui.input_radio_buttons(
                 "page", "Menu",
-                choices=["Úvod", "Data", "Hardy-Weinberg", "Genotypy a predispozície", "Analýza diagnóz", "MKCH-10", "Genotypy, demografia a diagnózy"],
+                choices=["Úvod", "Data", "Hardy-Weinberg", "Genotypy a predispozície", "Analýza diagnóz", "MKCH-10", "Genotypy, demografia a diagnózy",
+                         "Čas spracovania vzoriek"],
                 selected="Úvod"
             ),
             ui.output_ui("dynamic_content")
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from demografia import tabulka_genotypov
+
+# Mutácie testované na asociáciu s pohlavím a diagnózou (v poradí výpisu)
+mutacie_asociacii = ["HFE G845A (C282Y) [HFE]", "HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]"]
+
+
+def odstran_prazdne(ct):
+    # kategoriálne stĺpce môžu v tabuľke vytvoriť nulové riadky/stĺpce pre nepozorované hodnoty
+    return ct.loc[ct.sum(axis=1) > 0, ct.sum(axis=0) > 0]
+
+
+def popis_diagnozy(index_diagnoz, diagnoza):
+    """
+    Vráti popis porovnávanej diagnózy pre výpis testov.
+
+    Args:
+        index_diagnoz (IndexDiagnoz): Index diagnóz datasetu.
+        diagnoza (str): Diagnóza, kategória, rozsah kódov alebo názov skupiny diagnóz.
+
+    Returns:
+        str: Napr. "diagnóza 'K76.0'" alebo "skupina diagnóz '...'".
+    """
+    return f"skupina diagnóz '{diagnoza}'" if index_diagnoz.je_skupina(diagnoza) else f"diagnóza '{diagnoza}'"
+
+
+def _chi_kvadrat(ct):
+    ct = odstran_prazdne(ct)
+    if ct.shape[0] > 1 and ct.shape[1] > 1:
+        chi2, p, dof, _ = chi2_contingency(ct)
+        return chi2, p, dof
+    return np.nan, np.nan, np.nan
+
+
+def chi_kvadrat_testy(kocka, pocty, index_diagnoz, diagnoza, testovat_pohlavie=True, mutacie=mutacie_asociacii):
+    """
+    Vykoná Chí-kvadrát testy asociácie medzi HFE mutáciami a pohlavím/diagnózou
+    z počtov kocky demografie (scipy.stats.chi2_contingency).
+
+    Args:
+        kocka (KockaDemografie): Kocka, z ktorej počty pochádzajú.
+        pocty (np.ndarray): Výsledok vyrez_pre_filtre (alebo KockaDemografie.vyrez).
+        index_diagnoz (IndexDiagnoz): Index diagnóz rovnakých riadkov ako kocka.
+        diagnoza (str): Diagnóza, kategória, rozsah kódov alebo názov skupiny diagnóz.
+        testovat_pohlavie (bool): Či sa má testovať aj asociácia s pohlavím
+                                  (pri filtri na jedno pohlavie nemá zmysel).
+        mutacie (list): Testované stĺpce s genotypmi.
+
+    Returns:
+        pd.DataFrame: Jeden riadok pre každý test (stĺpce Mutácia, Premenná, Chí-kvadrát,
+                      p-hodnota, Stupne voľnosti); pri nedostatku dát sú výsledky NaN.
+    """
+    zhodne_kody = set(index_diagnoz.kody_pre(diagnoza))
+    maska_diagnoz = kocka.maska_diagnoz(lambda x: x in zhodne_kody)
+    nazov_diagnozy = popis_diagnozy(index_diagnoz, diagnoza)
+
+    riadky = []
+    for mutacia in mutacie:
+        if testovat_pohlavie:
+            ct_pohlavie = (tabulka_genotypov(pocty, kocka, mutacia, "pohlavie")
+                           .pivot(index=mutacia, columns="pohlavie", values="pocet").fillna(0))
+            riadky.append((mutacia, "pohlavie", *_chi_kvadrat(ct_pohlavie)))
+
+        ct_diagnoza = (tabulka_genotypov(pocty, kocka, mutacia, "diagnoza_ano_nie", maska_diagnoz)
+                       .pivot(index=mutacia, columns="diagnoza_ano_nie", values="pocet").fillna(0))
+        riadky.append((mutacia, nazov_diagnozy, *_chi_kvadrat(ct_diagnoza)))
+
+    tabulka = pd.DataFrame(riadky, columns=["Mutácia", "Premenná", "Chí-kvadrát", "p-hodnota", "Stupne voľnosti"])
+    tabulka["Stupne voľnosti"] = tabulka["Stupne voľnosti"].astype("Int64")
+    return tabulka
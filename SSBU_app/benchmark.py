@@ -0,0 +1,265 @@
+"""
+Meranie času a pamäte analytických funkcií a ciest vykresľovania na syntetických dátach.
+
+Každá funkcia sa meria bez cache (memoizované funkcie cez inspect.unwrap, cache grafov sa vyprázdni)
+pre každú veľkosť datasetu: medián a minimum času z niekoľkých opakovaní a špička alokovanej
+pamäte (tracemalloc) z jedného ďalšieho behu. Výsledky sa uložia do JSON a dajú sa porovnať
+s výsledkami predchádzajúcej verzie.
+
+Príklad:
+    python benchmark.py --velkosti 1000 100000 1000000 -o benchmark.json
+    python benchmark.py --porovnaj benchmark_stary.json
+"""
+import argparse
+import gc
+import inspect
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from asociacie import chi_kvadrat_testy
+from demografia import KockaDemografie, vyrez_pre_filtre
+from diagnozy import IndexDiagnoz
+from exporty import po_davkach
+from laboratorium import CasySpracovania
+from grafy import vykresli_grafy, priprav_data_grafov, popisy_grafov, cache_grafov
+from mriezka import MriezkaDat
+from shared import mkch10_file_path, nazvy_harkov_mkch10
+from synteticke_data import generuj_dataset
+from utils import stlpce_genotypov, check_hardy_weinberg, analyze_genotype_distribution, analyzuj_diagnozy, \
+    hardy_weinberg_podla_strat, nacitaj_mkch10_ciselnik, vytvor_index_mkch10
+
+predvolene_velkosti = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+# Filtre stránky grafov a testov, pre ktoré sa merajú cesty vykresľovania
+filtre_merania = {"vek_od": 20, "vek_do": 60, "pohlavie": None, "diagnoza": "K70-K77"}
+mutacie_grafov = ["HFE G845A (C282Y) [HFE]", "HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]"]
+
+
+def _bez_cache(funkcia):
+    # memoizované funkcie by od druhého opakovania vracali výsledok z cache
+    return inspect.unwrap(funkcia)
+
+
+def _hardy_weinberg(kontext):
+    for stlpec in stlpce_genotypov:
+        _bez_cache(check_hardy_weinberg)(kontext["df"], stlpec)
+
+
+def _vyskyt_diagnoz(kontext):
+    _bez_cache(analyzuj_diagnozy)(kontext["df"], "diagnoza MKCH-10", "validovany vysledok",
+                                  kontext["mkch10_data"], kontext["mkch10_index"])
+
+
+def _chi_kvadrat(kontext):
+    # cesta výstupu chi_kvadrat_vystup: výrez kocky pre vek a pohlavie, potom testy
+    df, kocka = kontext["df"], kontext["kocka"]
+    pocty, kocka = vyrez_pre_filtre(kocka, df, filtre_merania["vek_od"], filtre_merania["vek_do"],
+                                    filtre_merania["pohlavie"])
+    chi_kvadrat_testy(kocka, pocty, kontext["index_diagnoz"], filtre_merania["diagnoza"])
+
+
+def _data_grafov(kontext):
+    df, kocka = kontext["df"], kontext["kocka"]
+    vek = df["vek"]
+    filtrovane = df[(vek >= filtre_merania["vek_od"]) & (vek <= filtre_merania["vek_do"])].copy()
+    pocty, kocka = vyrez_pre_filtre(kocka, df, filtre_merania["vek_od"], filtre_merania["vek_do"],
+                                    filtre_merania["pohlavie"])
+    zhodne_kody = set(kontext["index_diagnoz"].kody_pre(filtre_merania["diagnoza"]))
+    maska_diagnoz = kocka.maska_diagnoz(lambda x: x in zhodne_kody)
+    return priprav_data_grafov(filtrovane, pocty, kocka, mutacie_grafov, maska_diagnoz)
+
+
+def _grafy(kontext):
+    # cesta výstupu grafy_vystup v režime "png": filtrované riadky, výrez kocky, dáta grafov a vykreslenie;
+    # PNG sa vykresľujú v pracovných procesoch, ich pamäť tracemalloc nezahŕňa
+    cache_grafov.clear()
+    data_grafov = _data_grafov(kontext)
+    vykresli_grafy(list(data_grafov), tuple(filtre_merania.values()), lambda: data_grafov,
+                   f"Diagnóza {filtre_merania['diagnoza']}")
+
+
+def _grafy_klient(kontext):
+    # cesta výstupu grafy_vystup v režime "klient": rovnaké dáta, namiesto PNG iba JSON popisy
+    popisy_grafov(_data_grafov(kontext), f"Diagnóza {filtre_merania['diagnoza']}")
+
+
+def _casy_spracovania(kontext):
+    # stránka "Čas spracovania vzoriek" pri zobrazení po mesiacoch za celú históriu
+    casy = CasySpracovania(kontext["df"])
+    casy.percentily("Mesiac")
+    casy.rozdelenie("Mesiac")
+
+
+def _export(format_exportu):
+    # sťahovanie celého datasetu po dávkach; bajty sa zahadzujú ako pri odoslaní klientovi
+    def export(kontext):
+        for _ in po_davkach(kontext["df"], format_exportu):
+            pass
+    return export
+
+
+# Názov merania -> funkcia, ktorá dostane kontext (dataset a z neho vytvorené štruktúry)
+merania = {
+    "check_hardy_weinberg": _hardy_weinberg,
+    "hardy_weinberg_podla_strat": lambda k: _bez_cache(hardy_weinberg_podla_strat)(
+        k["df"], tuple(stlpce_genotypov), "Veková skupina"),
+    "analyze_genotype_distribution": lambda k: _bez_cache(analyze_genotype_distribution)(k["df"]),
+    "analyzuj_diagnozy": _vyskyt_diagnoz,
+    "KockaDemografie": lambda k: KockaDemografie(k["df"], stlpce_genotypov),
+    "IndexDiagnoz": lambda k: IndexDiagnoz(k["df"]["diagnoza MKCH-10"]),
+    "MriezkaDat": lambda k: MriezkaDat(k["df"]),
+    "vykonaj_chi_kvadrat_testy": _chi_kvadrat,
+    "generuj_grafy": _grafy,
+    "generuj_grafy_klient": _grafy_klient,
+    "casy_spracovania": _casy_spracovania,
+    "export_csv": _export("csv"),
+    "export_parquet": _export("parquet"),
+}
+
+
+def zmeraj(funkcia, kontext, opakovania):
+    """
+    Zmeria čas a špičku pamäte jedného merania.
+
+    Returns:
+        dict: 'cas_median_s', 'cas_min_s', 'opakovania', 'pamat_spicka_mb'.
+    """
+    casy = []
+    for _ in range(opakovania):
+        gc.collect()
+        zaciatok = time.perf_counter()
+        funkcia(kontext)
+        casy.append(time.perf_counter() - zaciatok)
+
+    # tracemalloc spomaľuje výpočet, pamäť sa preto meria v samostatnom behu
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funkcia(kontext)
+        _, spicka = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "cas_median_s": statistics.median(casy),
+        "cas_min_s": min(casy),
+        "opakovania": opakovania,
+        "pamat_spicka_mb": round(spicka / 2 ** 20, 3),
+    }
+
+
+def _verzia_kodu():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spusti(velkosti, nazvy_merani, opakovania, mkch10_data=None, seed=0):
+    """
+    Spustí merania pre všetky veľkosti datasetu.
+
+    Returns:
+        dict: Metadáta prostredia a zoznam výsledkov (jeden záznam pre meranie × veľkosť).
+    """
+    mkch10_index = vytvor_index_mkch10(mkch10_data)
+    vysledky = []
+    for velkost in velkosti:
+        df = generuj_dataset(velkost, seed=seed)
+        kontext = {
+            "df": df,
+            "kocka": KockaDemografie(df, stlpce_genotypov),
+            "index_diagnoz": IndexDiagnoz(df["diagnoza MKCH-10"]),
+            "mkch10_data": mkch10_data,
+            "mkch10_index": mkch10_index,
+        }
+        for nazov in nazvy_merani:
+            # pri veľkých datasetoch sa pomalé merania opakujú menej
+            vysledok = zmeraj(merania[nazov], kontext, opakovania if velkost < 10 ** 6 else max(1, opakovania // 3))
+            vysledky.append({"meranie": nazov, "pocet_riadkov": velkost, **vysledok})
+            logging.info(f"{nazov} ({velkost} riadkov): {vysledok['cas_median_s'] * 1000:.1f} ms, "
+                         f"špička {vysledok['pamat_spicka_mb']:.1f} MB")
+        del df, kontext
+
+    return {
+        "verzia": _verzia_kodu(),
+        "datum": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platforma": platform.platform(),
+        "pocet_cpu": os.cpu_count(),
+        "vysledky": vysledky,
+    }
+
+
+def porovnaj(stare, nove, tolerancia=0.2):
+    """
+    Porovná výsledky dvoch behov a vráti merania, ktoré sa spomalili alebo potrebujú viac pamäte.
+
+    Args:
+        stare (dict): Výsledok spusti predchádzajúcej verzie (načítaný z JSON).
+        nove (dict): Výsledok spusti aktuálnej verzie.
+        tolerancia (float): Povolený relatívny nárast (0.2 = 20 %).
+
+    Returns:
+        pd.DataFrame: Regresie (meranie, počet riadkov, metrika, stará a nová hodnota, pomer).
+    """
+    kluc = ["meranie", "pocet_riadkov"]
+    spojene = pd.DataFrame(stare["vysledky"]).merge(pd.DataFrame(nove["vysledky"]), on=kluc,
+                                                     suffixes=("_stare", "_nove"))
+    regresie = []
+    for metrika in ["cas_median_s", "pamat_spicka_mb"]:
+        pomer = spojene[f"{metrika}_nove"] / spojene[f"{metrika}_stare"].replace(0, np.nan)
+        horsie = spojene[pomer > 1 + tolerancia]
+        regresie.append(pd.DataFrame({
+            "meranie": horsie["meranie"],
+            "pocet_riadkov": horsie["pocet_riadkov"],
+            "metrika": metrika,
+            "stara": horsie[f"{metrika}_stare"],
+            "nova": horsie[f"{metrika}_nove"],
+            "pomer": pomer[horsie.index].round(2),
+        }))
+    return pd.concat(regresie, ignore_index=True)
+
+
+def main(argumenty=None):
+    parser = argparse.ArgumentParser(description="Meranie výkonu analýz na syntetických dátach.")
+    parser.add_argument("--velkosti", nargs="+", type=int, default=predvolene_velkosti,
+                        help="Počty riadkov syntetického datasetu (10³ až 10⁷).")
+    parser.add_argument("--merania", nargs="+", choices=list(merania), default=list(merania))
+    parser.add_argument("--opakovania", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--vystup", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--porovnaj", type=Path, help="JSON predchádzajúceho behu na porovnanie.")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Povolený relatívny nárast času a pamäte pri porovnaní.")
+    args = parser.parse_args(argumenty)
+
+    mkch10_data = nacitaj_mkch10_ciselnik(str(mkch10_file_path), nazvy_harkov_mkch10)
+    vysledok = spusti(args.velkosti, args.merania, args.opakovania, mkch10_data, args.seed)
+    args.vystup.write_text(json.dumps(vysledok, ensure_ascii=False, indent=2), encoding="utf-8")
+    logging.info(f"Výsledky uložené do '{args.vystup}'.")
+
+    if args.porovnaj:
+        regresie = porovnaj(json.loads(args.porovnaj.read_text(encoding="utf-8")), vysledok, args.tolerancia)
+        if not regresie.empty:
+            logging.warning(f"Zhoršenie oproti '{args.porovnaj}':\n{regresie.to_string(index=False)}")
+            return 1
+        logging.info(f"Bez zhoršenia oproti '{args.porovnaj}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,353 @@
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from agregaty import AgregatyDatasetu
+from demografia import KockaDemografie
+from diagnozy import IndexDiagnoz
+from laboratorium import CasySpracovania
+from mapovanie import uloz_dataset, mapuj_dataset
+from mriezka import MriezkaDat
+from utils import typuj_dataset, spoj_datasety, hardy_weinberg_z_poctov, analyzuj_vzory_genotypov, \
+    vyskyt_diagnoz_z_poctov
+
+
+class SnimkaDat:
+    """
+    Nemenný stav datasetu v jednej verzii: riadky, z nich odvodené indexy a agregované počty.
+    Relácie pracujú so snímkou, takže pripájanie nových riadkov nemení dáta počas výpočtu.
+    """
+
+    def __init__(self, verzia, df, stlpce, kocka, index_diagnoz, mriezka, moznosti_diagnoz, agregaty):
+        self.verzia = verzia
+        self.df = df
+        self.stlpce = stlpce
+        self.kocka = kocka
+        self.index_diagnoz = index_diagnoz
+        self.mriezka = mriezka
+        self.moznosti_diagnoz = moznosti_diagnoz
+        self.pocet_riadkov = agregaty.pocet_riadkov
+        self.pocty_genotypov = agregaty.pocty_genotypov.copy()
+        self.pocty_vzorov = agregaty.pocty_vzorov.copy()
+        self.pocty_diagnoz = agregaty.pocty_diagnoz
+        self._vysledky = {}
+
+    def _z_cache(self, kluc, vypocet):
+        if kluc not in self._vysledky:
+            self._vysledky[kluc] = vypocet()
+        return self._vysledky[kluc]
+
+    def hardy_weinberg(self, stlpec):
+        """
+        Returns:
+            dict: Výsledok check_hardy_weinberg pre stĺpec, vypočítaný z agregovaných počtov.
+        """
+        return self._z_cache(("hw", stlpec),
+                             lambda: hardy_weinberg_z_poctov(self.pocty_genotypov[self.stlpce.index(stlpec)]))
+
+    def distribucia_genotypov(self):
+        """
+        Returns:
+            dict: Výsledok analyze_genotype_distribution vypočítaný z počtov vzorov.
+        """
+        return self._z_cache("vzory", lambda: analyzuj_vzory_genotypov(self.pocty_vzorov))
+
+    def vyskyt_diagnoz(self, mkch10_data, mkch10_index=None):
+        """
+        Returns:
+            dict: Výsledok analyzuj_diagnozy vypočítaný z počtov diagnóz podľa roka.
+        """
+        return self._z_cache("diagnozy", lambda: vyskyt_diagnoz_z_poctov(self.pocty_diagnoz, self.pocet_riadkov,
+                                                                          mkch10_data, mkch10_index))
+
+    def casy_spracovania(self):
+        """
+        Returns:
+            CasySpracovania: Časy spracovania vzoriek snímky (vytvoria sa pri prvom použití).
+        """
+        return self._z_cache("casy_spracovania", lambda: CasySpracovania(self.df))
+
+
+@contextlib.contextmanager
+def _zamok_priecinka(priecinok, cakat=False):
+    """
+    Zámok priečinka prichádzajúcich výsledkov zdieľaný procesmi (pracovníkmi servera).
+
+    Args:
+        priecinok (Path): Priečinok prichádzajúcich výsledkov.
+        cakat (bool): Či sa má čakať, kým zámok uvoľní iný proces.
+
+    Yields:
+        bool: Či proces zámok získal (bez čakania môže byť False).
+    """
+    with open(priecinok / ".zamok", "a+b") as subor:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(subor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    subor.seek(0)
+                    msvcrt.locking(subor.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if not cakat:
+                    yield False
+                    return
+                time.sleep(0.1)
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(subor, fcntl.LOCK_UN)
+            else:
+                subor.seek(0)
+                msvcrt.locking(subor.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _presun(subor, ciel):
+    try:
+        shutil.move(str(subor), str(ciel))
+    except OSError as e:
+        logging.warning(f"Súbor '{subor}' sa nepodarilo presunúť do '{ciel}': {e}")
+
+
+class DatasetPacientov:
+    """
+    Dataset pacientov, ku ktorému sa dajú priebežne pripájať nové výsledky bez reštartu.
+
+    Agregované počty (Hardy-Weinberg, vzory genotypov, diagnózy podľa roka), kocka demografie,
+    index diagnóz a kódovanie stĺpcov mriežky sa pri pripojení iba doplnia o nové riadky, vytvorí
+    sa znova iba spojený DataFrame. Každé pripojenie zvýši číslo verzie, podľa ktorého relácie
+    zistia, že majú načítať novú snímku.
+
+    Pri viacerých pracovných procesoch servera pripája súbory z priečinka prichádzajúcich výsledkov
+    vždy iba jeden proces (zámok priečinka) a spojený dataset zverejní ako pamäťovo mapovanú snímku
+    s číslom verzie (podpriečinok "snimky"). Všetky procesy ju prevezmú (synchronizuj), takže
+    relácie každého procesu uvidia nové riadky a dáta zostanú zdieľané aj po pripojení.
+    """
+
+    def __init__(self, df, stlpce, skupiny_diagnoz=None, kapitoly=(), zaklad=""):
+        self.stlpce = list(stlpce)
+        self.skupiny_diagnoz = skupiny_diagnoz
+        self.kapitoly = list(kapitoly)
+        # identifikátor východiskového datasetu; zverejnené snímky iného datasetu sa nepoužijú
+        self.zaklad = zaklad
+        # RLock: skontroluj_priecinok a nacitaj_spracovane volajú synchronizuj s už získaným zámkom
+        self._zamok = threading.RLock()
+        # veľkosť a čas zmeny súborov z predchádzajúcej kontroly priečinka (rozpísané súbory sa nepripájajú)
+        self._stav_suborov = {}
+        # čas posledného presunu do "spracovane" (ns), názvy presunutých súborov sú tak vždy rastúce
+        self._posledny_presun = 0
+        self._agregaty = AgregatyDatasetu(self.stlpce)
+        self._agregaty.pridaj(df)
+        self._snimka = self._vytvor_snimku(0, df, KockaDemografie(df, self.stlpce),
+                                           IndexDiagnoz(df["diagnoza MKCH-10"], self.skupiny_diagnoz),
+                                           MriezkaDat(df), self._agregaty)
+
+    @property
+    def verzia(self):
+        return self._snimka.verzia
+
+    def snimka(self):
+        return self._snimka
+
+    def _vytvor_snimku(self, verzia, df, kocka, index_diagnoz, mriezka, agregaty):
+        return SnimkaDat(verzia, df, self.stlpce, kocka, index_diagnoz, mriezka,
+                         index_diagnoz.moznosti(self.kapitoly), agregaty)
+
+    def _rozsirena(self, snimka, agregaty, df, verzia):
+        # snímka a agregáty pre df, ktorý začína riadkami snímky; pôvodné objekty sa nemenia
+        nove = df.iloc[len(snimka.df):]
+        kocka = snimka.kocka.s_pridanymi(nove)
+        if kocka is None:
+            # nové pohlavie, diagnóza alebo vek mimo osí – kocka sa vytvorí z celého datasetu
+            kocka = KockaDemografie(df, self.stlpce)
+        agregaty = agregaty.s_pridanymi(nove)
+        return self._vytvor_snimku(verzia, df, kocka, snimka.index_diagnoz.s_pridanymi(nove["diagnoza MKCH-10"]),
+                                   snimka.mriezka.s_pridanymi(df), agregaty), agregaty
+
+    def pridaj(self, nove):
+        """
+        Pripojí nové riadky (napr. denný export validovaných výsledkov) iba v tomto procese, nič
+        nezverejní; pri viacerých pracovných procesoch sa výsledky pripájajú cez priečinok
+        prichádzajúcich výsledkov (skontroluj_priecinok). Ak pripojenie zlyhá, snímka ani agregáty
+        sa nezmenia.
+
+        Args:
+            nove (pd.DataFrame): Nové riadky s rovnakými stĺpcami ako dataset (aj netypované, z CSV).
+
+        Returns:
+            int: Nová verzia datasetu.
+        """
+        nove = typuj_dataset(nove.copy())
+        with self._zamok:
+            stara = self._snimka
+            snimka, agregaty = self._rozsirena(stara, self._agregaty, spoj_datasety(stara.df, nove), stara.verzia + 1)
+            # stav sa zmení až po úspešnom vytvorení snímky, pri chybe zostane predchádzajúca verzia
+            self._snimka, self._agregaty = snimka, agregaty
+            logging.info(f"Pripojených {len(nove)} riadkov, dataset má {len(snimka.df)} riadkov "
+                         f"(verzia {self.verzia}).")
+            return self.verzia
+
+    def pridaj_subor(self, cesta_k_suboru):
+        """
+        Pripojí riadky z CSV súboru (oddeľovač ';').
+
+        Returns:
+            int: Nová verzia datasetu.
+        """
+        return self.pridaj(pd.read_csv(cesta_k_suboru, sep=";", header=0, low_memory=False))
+
+    def _zverejni(self, priecinok, df, verzia):
+        # zapíše dataset ako snímku verzie a potom atomicky prepíše popis aktuálnej verzie
+        snimky = priecinok / "snimky"
+        snimky.mkdir(exist_ok=True)
+        nazov = f"v{verzia:06d}.arrow"
+        docasny = snimky / f"{nazov}.{os.getpid()}.tmp"
+        uloz_dataset(df, docasny)
+        os.replace(docasny, snimky / nazov)
+        popis = {"zaklad": self.zaklad, "verzia": verzia, "subor": nazov, "riadkov": len(df)}
+        docasny = snimky / f"aktualna.json.{os.getpid()}.tmp"
+        docasny.write_text(json.dumps(popis), encoding="utf-8")
+        os.replace(docasny, snimky / "aktualna.json")
+        # predchádzajúcu snímku môže iný proces práve mapovať, staršie sa odstránia
+        # (na Windows sa namapovaný súbor odstrániť nedá, skúsi sa to pri ďalšom zverejnení)
+        for stara in snimky.glob("v*.arrow"):
+            if stara.name not in (nazov, f"v{verzia - 1:06d}.arrow"):
+                with contextlib.suppress(OSError):
+                    stara.unlink()
+
+    def synchronizuj(self, priecinok):
+        """
+        Prevezme najnovšiu zverejnenú snímku datasetu: namapuje ju a doplní štruktúry o riadky,
+        ktoré ešte nemá. Volá sa periodicky, pri nezmenenej verzii iba prečíta malý popis verzie.
+
+        Args:
+            priecinok (str | Path): Priečinok prichádzajúcich výsledkov.
+
+        Returns:
+            int: Aktuálna verzia datasetu.
+        """
+        snimky = Path(priecinok) / "snimky"
+        try:
+            popis = json.loads((snimky / "aktualna.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return self.verzia
+        if popis["zaklad"] != self.zaklad or popis["verzia"] <= self.verzia:
+            return self.verzia
+        with self._zamok:
+            if popis["verzia"] <= self.verzia:
+                return self.verzia
+            df = mapuj_dataset(snimky / popis["subor"])
+            if len(df) < len(self._snimka.df):
+                logging.warning(f"Zverejnená snímka verzie {popis['verzia']} má menej riadkov ako dataset.")
+                return self.verzia
+            self._snimka, self._agregaty = self._rozsirena(self._snimka, self._agregaty, df, popis["verzia"])
+            logging.info(f"Prevzatá snímka verzie {self.verzia}, dataset má {len(df)} riadkov.")
+        return self.verzia
+
+    def nacitaj_spracovane(self, priecinok):
+        """
+        Pri štarte prevezme zverejnenú snímku datasetu, aby sa pripojené riadky nestratili po reštarte.
+        Ak žiadna pre tento východiskový dataset nie je (prvé spustenie, zmenený dataset), jeden
+        proces znova pripojí už spracované súbory z podpriečinka "spracovane" a výsledok zverejní.
+
+        Args:
+            priecinok (str | Path): Priečinok prichádzajúcich výsledkov.
+        """
+        priecinok = Path(priecinok)
+        if not priecinok.is_dir():
+            return
+        with self._zamok, _zamok_priecinka(priecinok, cakat=True):
+            if self.synchronizuj(priecinok) > 0:
+                return
+            spracovane = priecinok / "spracovane"
+            subory = sorted(spracovane.glob("*.csv")) if spracovane.is_dir() else []
+            if subory:
+                nove = typuj_dataset(pd.concat([pd.read_csv(s, sep=";", header=0, low_memory=False)
+                                                for s in subory], ignore_index=True))
+                self._zverejni(priecinok, spoj_datasety(self._snimka.df, nove), 1)
+                self.synchronizuj(priecinok)
+
+    def _nazov_spracovaneho(self, subor):
+        # časová pečiatka v názve zachová poradie pripojenia pri opätovnom načítaní (nacitaj_spracovane
+        # radí podľa názvu): sekundy ako YYYYmmddHHMMSS a za nimi nanosekundy, aj pre súbory pripojené
+        # v tej istej sekunde
+        cas = max(time.time_ns(), self._posledny_presun + 1)
+        self._posledny_presun = cas
+        return f"{time.strftime('%Y%m%d%H%M%S', time.localtime(cas // 10 ** 9))}{cas % 10 ** 9:09d}_{subor.name}"
+
+    def skontroluj_priecinok(self, priecinok):
+        """
+        Pripojí nové CSV súbory z priečinka prichádzajúcich výsledkov, zverejní spojený dataset ako
+        novú verziu snímky a súbory presunie do podpriečinka "spracovane". Volá sa periodicky na
+        pozadí v každom pracovnom procese, preto je lacná, keď nič nepribudlo.
+
+        Súbory pripája iba proces, ktorý získa zámok priečinka; ostatné iba prevezmú zverejnenú
+        snímku (synchronizuj), rovnako ako po pripojení aj samotný pripájajúci proces.
+
+        Súbor sa pripojí až vtedy, keď sa jeho veľkosť ani čas zmeny nezmenili od predchádzajúcej
+        kontroly, takže sa nenačíta rozpísaný súbor (exportér môže súbor zapisovať aj ako *.tmp
+        a potom ho premenovať). Súbor, ktorý sa nepodarí načítať alebo pripojiť, sa premenuje na
+        *.chybny a do snímky sa nedostane.
+
+        Args:
+            priecinok (str | Path): Priečinok prichádzajúcich výsledkov.
+
+        Returns:
+            int: Aktuálna verzia datasetu.
+        """
+        priecinok = Path(priecinok)
+        if not priecinok.is_dir():
+            return self.verzia
+        with self._zamok, _zamok_priecinka(priecinok) as ziskany:
+            if ziskany:
+                # najprv riadky, ktoré zverejnil iný proces, nová snímka na ne nadväzuje
+                self.synchronizuj(priecinok)
+                self._pripoj_hotove(priecinok)
+        return self.synchronizuj(priecinok)
+
+    def _pripoj_hotove(self, priecinok):
+        stav, hotove = {}, []
+        for subor in sorted(priecinok.glob("*.csv")):
+            try:
+                info = subor.stat()
+            except FileNotFoundError:
+                continue
+            stav[subor] = (info.st_size, info.st_mtime_ns)
+            if self._stav_suborov.get(subor) == stav[subor]:
+                hotove.append(subor)
+        self._stav_suborov = {s: v for s, v in stav.items() if s not in hotove}
+
+        # každý súbor sa najprv pripojí k lokálnej kópii stavu, chybný sa tak dá vyradiť samostatne
+        snimka, agregaty, pripojene = self._snimka, self._agregaty, []
+        for subor in hotove:
+            try:
+                nove = typuj_dataset(pd.read_csv(subor, sep=";", header=0, low_memory=False))
+                snimka, agregaty = self._rozsirena(snimka, agregaty, spoj_datasety(snimka.df, nove), snimka.verzia + 1)
+                pripojene.append(subor)
+            except Exception as e:
+                logging.warning(f"Súbor '{subor}' sa nepodarilo pripojiť: {e}")
+                _presun(subor, subor.with_suffix(".chybny"))
+        if not pripojene:
+            return
+        self._zverejni(priecinok, snimka.df, self.verzia + 1)
+        logging.info(f"Zverejnená snímka verzie {self.verzia + 1} s {len(snimka.df)} riadkami "
+                     f"({len(pripojene)} nových súborov).")
+        spracovane = priecinok / "spracovane"
+        spracovane.mkdir(exist_ok=True)
+        for subor in pripojene:
+            _presun(subor, spracovane / self._nazov_spracovaneho(subor))
@@ -0,0 +1,206 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils import genotypy
+
+
+def je_cele_cislo(hodnota):
+    return hodnota is None or float(hodnota).is_integer()
+
+
+class KockaDemografie:
+    """
+    Predpočítaná kocka počtov pacientov: mutácia × genotyp × pohlavie × vekový bin × diagnóza.
+
+    Vek je rozdelený na polročné biny (presne celé číslo / medzi dvoma celými číslami), takže
+    filtre vek >= od a vek <= do s celočíselnými hranicami sa dajú vyhodnotiť presne iba
+    rozdielom kumulatívnych súčtov – bez prechodu cez riadky pacientov.
+
+    Genotyp má 4 hodnoty: normal, heterozygot, mutant a chýbajúci/iný (index 3). Posledný index
+    v osi pohlavia a diagnózy patrí chýbajúcim hodnotám, posledný vekový bin chýbajúcemu veku.
+    """
+
+    def __init__(self, df, mutacie):
+        self.mutacie = list(mutacie)
+
+        pohlavie = df["pohlavie"].astype(object)
+        self.pohlavia = sorted(pohlavie.dropna().unique())
+        self.diagnozy = sorted(df["diagnoza MKCH-10"].astype(object).dropna().unique()) + [np.nan]
+
+        vek = pd.to_numeric(df["vek"], errors="coerce").to_numpy(dtype=np.float64)
+        platny_vek = ~np.isnan(vek)
+        self.vek_min = math.floor(vek[platny_vek].min()) if platny_vek.any() else 0
+        vek_max = math.floor(vek[platny_vek].max()) if platny_vek.any() else 0
+        # bin 2k: vek presne vek_min + k, bin 2k + 1: vek medzi vek_min + k a vek_min + k + 1
+        self.pocet_platnych_binov = 2 * (vek_max - self.vek_min) + 2
+
+        # kumulatívne súčty cez vekovú os: súčet rozsahu binov = rozdiel dvoch rezov
+        self._kumulativne = np.cumsum(self._pocty(df), axis=3, dtype=np.int32)
+        self._kumulativne = np.concatenate([np.zeros_like(self._kumulativne[:, :, :, :1]), self._kumulativne], axis=3)
+
+    def _tvar(self):
+        return len(genotypy) + 1, len(self.pohlavia) + 1, self.pocet_platnych_binov + 1, len(self.diagnozy)
+
+    def _pocty(self, df):
+        """
+        Spočíta riadky do buniek kocky s jej súčasnými osami.
+
+        Returns:
+            np.ndarray | None: Počty tvaru (mutácia × genotyp × pohlavie × vekový bin × diagnóza),
+                               alebo None, ak riadky obsahujú pohlavie, diagnózu alebo vek mimo osí.
+        """
+        pohlavie = df["pohlavie"].astype(object)
+        kody_pohlavia = pd.Categorical(pohlavie, categories=self.pohlavia).codes.astype(np.int64)
+        diagnozy = df["diagnoza MKCH-10"].astype(object)
+        kody_diagnoz = pd.Categorical(diagnozy, categories=self.diagnozy[:-1]).codes.astype(np.int64)
+        vek = pd.to_numeric(df["vek"], errors="coerce").to_numpy(dtype=np.float64)
+        platny_vek = ~np.isnan(vek)
+        if ((kody_pohlavia < 0) & pohlavie.notna().to_numpy()).any() or \
+                ((kody_diagnoz < 0) & diagnozy.notna().to_numpy()).any() or \
+                (platny_vek.any() and (vek[platny_vek].min() < self.vek_min
+                                       or 2 * (math.floor(vek[platny_vek].max()) - self.vek_min) + 2 > self.pocet_platnych_binov)):
+            return None
+        kody_pohlavia[kody_pohlavia < 0] = len(self.pohlavia)
+        kody_diagnoz[kody_diagnoz < 0] = len(self.diagnozy) - 1
+
+        cela_cast = np.floor(np.where(platny_vek, vek, self.vek_min))
+        kody_veku = (2 * (cela_cast - self.vek_min) + (np.where(platny_vek, vek, 0) != cela_cast)).astype(np.int64)
+        kody_veku[~platny_vek] = self.pocet_platnych_binov
+
+        tvar = self._tvar()
+        pocty = np.zeros((len(self.mutacie),) + tvar, dtype=np.int64)
+        zaklad = ((kody_pohlavia * tvar[2]) + kody_veku) * tvar[3] + kody_diagnoz
+        for i, mutacia in enumerate(self.mutacie):
+            kody_genotypu = pd.Categorical(df[mutacia], categories=genotypy).codes.astype(np.int64)
+            kody_genotypu[kody_genotypu < 0] = len(genotypy)
+            ploche = kody_genotypu * (tvar[1] * tvar[2] * tvar[3]) + zaklad
+            pocty[i] = np.bincount(ploche, minlength=int(np.prod(tvar))).reshape(tvar)
+        return pocty
+
+    def s_pridanymi(self, nove):
+        """
+        Vráti novú kocku rozšírenú o ďalšie riadky. Práca závisí od veľkosti kocky a počtu nových
+        riadkov, nie od veľkosti pôvodného datasetu; pôvodná kocka sa nemení.
+
+        Args:
+            nove (pd.DataFrame): Nové riadky pacientov.
+
+        Returns:
+            KockaDemografie | None: Rozšírená kocka, alebo None, ak nové riadky nepatria do osí kocky
+                                    (novú diagnózu, pohlavie alebo vek mimo rozsahu treba prepočítať celé).
+        """
+        pocty = self._pocty(nove)
+        if pocty is None:
+            return None
+        nova = copy.copy(self)
+        nova._kumulativne = self._kumulativne.copy()
+        nova._kumulativne[:, :, :, 1:, :] += np.cumsum(pocty, axis=3, dtype=np.int32)
+        return nova
+
+    def vyrez(self, vek_od=None, vek_do=None, pohlavie=None):
+        """
+        Vráti počty pre vekový rozsah a pohlavie sčítané cez vek.
+
+        Args:
+            vek_od (int, voliteľné): Minimálny vek (vrátane).
+            vek_do (int, voliteľné): Maximálny vek (vrátane).
+            pohlavie (str, voliteľné): Kód pohlavia ("F", "M"), None pre všetky.
+
+        Returns:
+            np.ndarray | None: Počty tvaru (mutácia × genotyp × pohlavie × diagnóza), alebo None,
+                               ak hranice veku nie sú celé čísla (kocka ich nevie vyhodnotiť presne).
+        """
+        if not (je_cele_cislo(vek_od) and je_cele_cislo(vek_do)):
+            return None
+
+        if vek_od is None and vek_do is None:
+            # bez vekového filtra sa započítajú aj pacienti bez veku
+            od, do = 0, self.pocet_platnych_binov + 1
+        else:
+            od = 0 if vek_od is None else 2 * (int(vek_od) - self.vek_min)
+            do = self.pocet_platnych_binov if vek_do is None else 2 * (int(vek_do) - self.vek_min) + 1
+            od = min(max(od, 0), self.pocet_platnych_binov)
+            do = min(max(do, od), self.pocet_platnych_binov)
+
+        pocty = self._kumulativne[:, :, :, do, :] - self._kumulativne[:, :, :, od, :]
+        if pohlavie is not None:
+            maska = np.array([p == pohlavie for p in self.pohlavia] + [False])
+            pocty = pocty * maska[None, None, :, None]
+        return pocty
+
+    def maska_diagnoz(self, predikat):
+        """
+        Vyhodnotí predikát raz pre každý unikátny kód diagnózy v kocke.
+
+        Args:
+            predikat (callable): Funkcia kód -> bool (kód môže byť NaN).
+
+        Returns:
+            np.ndarray: Booleovská maska cez os diagnóz.
+        """
+        return np.array([bool(predikat(kod)) for kod in self.diagnozy], dtype=bool)
+
+
+def vyrez_pre_filtre(kocka, df, vek_od=None, vek_do=None, pohlavie=None):
+    """
+    Vráti počty z kocky pre zadané filtre. Pri neceločíselných hraniciach veku sa vytvorí
+    malá kocka iba z pacientov vo vekovom rozsahu.
+
+    Returns:
+        tuple: (počty tvaru mutácia × genotyp × pohlavie × diagnóza, použitá kocka)
+    """
+    pocty = kocka.vyrez(vek_od, vek_do, pohlavie)
+    if pocty is not None:
+        return pocty, kocka
+
+    maska = pd.Series(True, index=df.index)
+    if vek_od is not None:
+        maska &= df["vek"] >= vek_od
+    if vek_do is not None:
+        maska &= df["vek"] <= vek_do
+    docasna_kocka = KockaDemografie(df[maska], kocka.mutacie)
+    return docasna_kocka.vyrez(None, None, pohlavie), docasna_kocka
+
+
+def tabulka_genotypov(pocty, kocka, mutacia, podla=None, maska_diagnoz=None):
+    """
+    Pripraví agregovanú tabuľku počtov pre stĺpcový graf alebo kontingenčnú tabuľku.
+
+    Args:
+        pocty (np.ndarray): Výsledok vyrez_pre_filtre.
+        kocka (KockaDemografie): Kocka, z ktorej počty pochádzajú.
+        mutacia (str): Stĺpec s genotypom mutácie.
+        podla (str, voliteľné): None, "pohlavie" alebo "diagnoza_ano_nie".
+        maska_diagnoz (np.ndarray, voliteľné): Maska diagnóz pre podla="diagnoza_ano_nie".
+
+    Returns:
+        pd.DataFrame: Stĺpce [mutacia, (podla), "pocet"], iba nenulové riadky.
+    """
+    # chýbajúce genotypy sa do grafov ani testov nezapočítavajú (ako pri crosstab)
+    pocty_mutacie = pocty[kocka.mutacie.index(mutacia), :len(genotypy)]
+
+    if podla is None:
+        tabulka = pd.DataFrame({mutacia: genotypy, "pocet": pocty_mutacie.sum(axis=(1, 2))})
+    elif podla == "pohlavie":
+        hodnoty = pocty_mutacie[:, :len(kocka.pohlavia), :].sum(axis=2)
+        tabulka = pd.DataFrame({
+            mutacia: np.repeat(genotypy, len(kocka.pohlavia)),
+            "pohlavie": np.tile(kocka.pohlavia, len(genotypy)),
+            "pocet": hodnoty.ravel(),
+        })
+    elif podla == "diagnoza_ano_nie":
+        ano = pocty_mutacie[:, :, maska_diagnoz].sum(axis=(1, 2))
+        nie = pocty_mutacie[:, :, ~maska_diagnoz].sum(axis=(1, 2))
+        tabulka = pd.DataFrame({
+            mutacia: np.repeat(genotypy, 2),
+            "diagnoza_ano_nie": np.tile(["Áno", "Nie"], len(genotypy)),
+            "pocet": np.column_stack([ano, nie]).ravel(),
+        })
+    else:
+        raise ValueError(f"Neznáme rozdelenie: {podla}")
+
+    tabulka[mutacia] = pd.Categorical(tabulka[mutacia], categories=genotypy)
+    return tabulka[tabulka["pocet"] > 0].reset_index(drop=True)
@@ -0,0 +1,281 @@
+import copy
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils import normalizuj_kody
+
+_vzor_kategorie = re.compile(r"^([A-Z])(\d{2})")
+
+
+def kategoria_kodu(kod):
+    """
+    Vráti kategóriu (písmeno a dve číslice) MKCH-10 kódu, napr. "K76.0" -> "K76".
+
+    Returns:
+        str | None: Kategória, alebo None pre kód v neočakávanom tvare.
+    """
+    zhoda = _vzor_kategorie.match(kod)
+    return zhoda.group(0) if zhoda else None
+
+
+def _poradie_kategorie(kategoria):
+    return kategoria[0], int(kategoria[1:3])
+
+
+def je_v_hierarchii(kod, dotaz):
+    """
+    Zistí, či kód patrí pod dotaz v hierarchii MKCH-10.
+
+    Dotaz môže byť rozsah kategórií (blok "K70-K77" alebo kapitola "K00-K93"), kategória ("K76"
+    zahŕňa K76, K76.0, K76.9, ...), podkategória ("K76.0" zahŕňa aj K76.00) alebo kratší prefix
+    ("K" pre celé písmeno). Na rozdiel od hľadania podreťazca "K7" nezodpovedá "BK76".
+
+    Args:
+        kod (str): Normalizovaný kód diagnózy.
+        dotaz (str): Normalizovaný dotaz.
+
+    Returns:
+        bool
+    """
+    if "-" in dotaz:
+        od, _, do = dotaz.partition("-")
+        kategoria, kategoria_od, kategoria_do = kategoria_kodu(kod), kategoria_kodu(od), kategoria_kodu(do)
+        if not (kategoria and kategoria_od and kategoria_do):
+            return False
+        return _poradie_kategorie(kategoria_od) <= _poradie_kategorie(kategoria) <= _poradie_kategorie(kategoria_do)
+    if kod == dotaz:
+        return True
+    if "." in dotaz or len(dotaz) < 3:
+        return kod.startswith(dotaz)
+    return kod.startswith(dotaz + ".")
+
+
+def _cislo_kategorie(kategoria):
+    # poradie kategórie ako jedno číslo (písmeno * 100 + číslo), -1 pre kód bez kategórie
+    return ord(kategoria[0]) * 100 + int(kategoria[1:3]) if kategoria else -1
+
+
+def _kategoria_cisla(cislo):
+    return f"{chr(cislo // 100)}{cislo % 100:02d}"
+
+
+def _usek(posun, kody_riadkov, pocet_kodov):
+    # úsek indexu: pozície riadkov zoradené podľa čísla kódu a začiatky kódov v nich;
+    # riadky bez kódu (-1) sú na začiatku, úseky kódov nasledujú za nimi
+    poradie = np.argsort(kody_riadkov, kind="stable") + posun
+    pocty = np.bincount(kody_riadkov[kody_riadkov >= 0], minlength=pocet_kodov)
+    zaciatky = np.concatenate([[0], np.cumsum(pocty)]) + int((kody_riadkov < 0).sum())
+    return posun, poradie, zaciatky
+
+
+def _spoj_useky(prvy, druhy, pocet_kodov):
+    # čísla kódov riadkov sa obnovia z poradia a začiatkov, nie sú uložené zvlášť
+    kody_riadkov = []
+    for posun, poradie, zaciatky in (prvy, druhy):
+        kody = np.full(len(poradie), -1, dtype=np.int64)
+        kody[poradie[zaciatky[0]:] - posun] = np.repeat(np.arange(len(zaciatky) - 1), np.diff(zaciatky))
+        kody_riadkov.append(kody)
+    return _usek(prvy[0], np.concatenate(kody_riadkov), pocet_kodov)
+
+
+class IndexDiagnoz:
+    """
+    Invertovaný index normalizovaný kód diagnózy -> pozície riadkov datasetu.
+
+    Riadky sú zoradené podľa kódu (stabilne) po úsekoch datasetu, takže riadky jedného kódu tvoria
+    v úseku súvislý úsek poľa pozícií. Pripojené riadky (s_pridanymi) tvoria nový úsek a nové kódy
+    dostanú ďalšie čísla; posledné úseky sa zlúčia, keď predposledný nie je aspoň dvakrát väčší,
+    takže úsekov je O(log n) a pripojenie stojí amortizovane O(dávka · log n).
+
+    Dotaz sa vyhodnotí bez prechodu riadkov aj unikátnych kódov v Pythone: prefixy a kategórie
+    binárnym vyhľadávaním v zoradených kódoch, rozsahy kategórií porovnaním vopred vypočítaných
+    čísel kategórií kódov. V cache sú iba zodpovedajúce kódy a počet riadkov (súčet počtov kódov);
+    pozície a maska riadkov sa vytvoria až na požiadanie a neukladajú sa.
+
+    Pomenované skupiny diagnóz (názov -> zoznam kódov alebo rozsahov) sa vyhodnotia pri vytvorení
+    indexu a ich názov sa dá použiť všade, kde sa očakáva dotaz.
+    """
+
+    def __init__(self, kody, skupiny=None, max_vysledkov=128):
+        self.pocet_riadkov = 0
+        self.skupiny = dict(skupiny or {})
+        self._max_vysledkov = max_vysledkov
+        self._id_kodu = {}
+        self._pocty = np.zeros(0, dtype=np.int64)
+        self._useky = []
+        self._zorad_kody()
+        self._pripoj(kody)
+
+    def s_pridanymi(self, kody):
+        """
+        Vráti nový index rozšírený o riadky pripojené na koniec datasetu; pôvodný index sa nemení.
+        Práca závisí od počtu nových riadkov a kódov, nie od veľkosti datasetu.
+
+        Args:
+            kody (pd.Series): Kódy diagnóz nových riadkov.
+
+        Returns:
+            IndexDiagnoz: Index všetkých riadkov.
+        """
+        novy = copy.copy(self)
+        novy._id_kodu = dict(self._id_kodu)
+        novy._pripoj(kody)
+        return novy
+
+    def _pripoj(self, kody):
+        kody = normalizuj_kody(pd.Series(kody)).reset_index(drop=True)
+        kody_riadkov, unikatne = pd.factorize(kody)
+        pocet_kodov = len(self._id_kodu)
+        # čísla kódov v poradí prvého výskytu, posledný prvok prevedie chýbajúci kód (-1) na -1
+        cisla = np.array([self._id_kodu.setdefault(str(kod), len(self._id_kodu)) for kod in unikatne] + [-1],
+                         dtype=np.int64)
+        kody_riadkov = cisla[kody_riadkov]
+        if len(self._id_kodu) > pocet_kodov:
+            self._zorad_kody()
+
+        pocty = np.bincount(kody_riadkov[kody_riadkov >= 0], minlength=len(self._id_kodu))
+        pocty[:pocet_kodov] += self._pocty
+        self._pocty = pocty
+        useky = self._useky + [_usek(self.pocet_riadkov, kody_riadkov, len(self._id_kodu))]
+        while len(useky) > 1 and len(useky[-2][1]) <= 2 * len(useky[-1][1]):
+            useky[-2:] = [_spoj_useky(useky[-2], useky[-1], len(self._id_kodu))]
+        self._useky = useky
+        self.pocet_riadkov += len(kody_riadkov)
+        self._pocty_zoradenych = self._pocty[self._id_zoradenych]
+        self.pocty = dict(zip(self.kody, self._pocty_zoradenych.tolist()))
+
+        self._vysledky = OrderedDict()
+        self._zamok = threading.Lock()
+        self._vysledky_skupin = {nazov: self._vyhodnot(kody) for nazov, kody in self.skupiny.items()}
+
+    def _zorad_kody(self):
+        # zoradené kódy pre binárne vyhľadávanie a čísla ich kategórií pre rozsahy
+        kody = np.array(list(self._id_kodu), dtype=str)
+        self._id_zoradenych = np.argsort(kody, kind="stable")
+        self._zoradene_kody = kody[self._id_zoradenych]
+        self.kody = self._zoradene_kody.tolist()
+        self._kategorie = np.array([_cislo_kategorie(kategoria_kodu(kod)) for kod in self.kody], dtype=np.int32)
+
+    @staticmethod
+    def _normalizuj_dotaz(dotaz):
+        if isinstance(dotaz, str):
+            dotaz = [dotaz]
+        return tuple(sorted({d.strip().upper() for d in dotaz if d and d.strip()}))
+
+    def je_skupina(self, dotaz):
+        return isinstance(dotaz, str) and dotaz in self.skupiny
+
+    def _s_prefixom(self, prefix):
+        # kódy začínajúce prefixom tvoria v zoradených kódoch súvislý úsek
+        zaciatok, koniec = np.searchsorted(self._zoradene_kody, [prefix, prefix + "\U0010ffff"])
+        return np.arange(zaciatok, koniec)
+
+    def _kody_dotazu(self, dotaz):
+        # rovnaký význam ako je_v_hierarchii, vyhodnotený naraz pre všetky kódy
+        if "-" in dotaz:
+            od, _, do = dotaz.partition("-")
+            kategoria_od, kategoria_do = kategoria_kodu(od), kategoria_kodu(do)
+            if not (kategoria_od and kategoria_do):
+                return np.empty(0, dtype=np.intp)
+            return np.flatnonzero((self._kategorie >= _cislo_kategorie(kategoria_od))
+                                  & (self._kategorie <= _cislo_kategorie(kategoria_do)))
+        if "." in dotaz or len(dotaz) < 3:
+            return self._s_prefixom(dotaz)
+        presny = self._s_prefixom(dotaz)
+        presny = presny[self._zoradene_kody[presny] == dotaz]
+        return np.concatenate([presny, self._s_prefixom(dotaz + ".")])
+
+    def _vyhodnot(self, dotaz):
+        if self.je_skupina(dotaz):
+            return self._vysledky_skupin[dotaz]
+        kluc = self._normalizuj_dotaz(dotaz)
+        with self._zamok:
+            vysledok = self._vysledky.get(kluc)
+            if vysledok is not None:
+                self._vysledky.move_to_end(kluc)
+                return vysledok
+
+        kody = np.unique(np.concatenate([self._kody_dotazu(d) for d in kluc] + [np.empty(0, dtype=np.intp)]))
+        kody.flags.writeable = False
+        vysledok = (kody, int(self._pocty_zoradenych[kody].sum()))
+        with self._zamok:
+            self._vysledky[kluc] = vysledok
+            while len(self._vysledky) > self._max_vysledkov:
+                self._vysledky.popitem(last=False)
+        return vysledok
+
+    def kody_pre(self, dotaz):
+        """
+        Vráti kódy datasetu, ktoré patria pod dotaz (alebo pod ktorýkoľvek z viacerých dotazov).
+
+        Args:
+            dotaz (str | iterable): Názov skupiny, kód, prefix alebo rozsah kategórií, prípadne ich zoznam.
+
+        Returns:
+            list: Zodpovedajúce kódy v zoradenom poradí.
+        """
+        return [self.kody[i] for i in self._vyhodnot(dotaz)[0]]
+
+    def pocet(self, dotaz):
+        """
+        Returns:
+            int: Počet riadkov s diagnózou pod dotazom (zo súčtu počtov kódov, bez prechodu riadkov).
+        """
+        return self._vyhodnot(dotaz)[1]
+
+    def pozicie(self, dotaz):
+        """
+        Vráti zoradené pozície riadkov s diagnózou pod dotazom.
+
+        Returns:
+            np.ndarray: Pozície riadkov (pre DataFrame.iloc).
+        """
+        cisla = self._id_zoradenych[self._vyhodnot(dotaz)[0]]
+        casti = [np.empty(0, dtype=np.int64)]
+        for _, poradie, zaciatky in self._useky:
+            # úseky idú za sebou, stačí zoradiť pozície v rámci úseku
+            cisla_useku = cisla[cisla < len(zaciatky) - 1]
+            if len(cisla_useku):
+                casti.append(np.sort(np.concatenate([poradie[zaciatky[i]:zaciatky[i + 1]] for i in cisla_useku])))
+        return np.concatenate(casti)
+
+    def maska(self, dotaz):
+        """
+        Vráti booleovskú masku riadkov s diagnózou pod dotazom (vytvorí sa pri každom volaní).
+
+        Returns:
+            np.ndarray: Maska dĺžky datasetu.
+        """
+        maska = np.zeros(self.pocet_riadkov, dtype=bool)
+        maska[self.pozicie(dotaz)] = True
+        return maska
+
+    def moznosti(self, kapitoly=()):
+        """
+        Pripraví voľby pre výber diagnózy: skupiny diagnóz, kapitoly a kategórie z číselníka
+        a jednotlivé kódy. Počty sa sčítajú z počtov kódov, dotazy volieb sa neukladajú do cache.
+
+        Args:
+            kapitoly (iterable): Rozsahy kapitol MKCH-10 (napr. nazvy_harkov_mkch10).
+
+        Returns:
+            dict: Voľby pre ui.input_select (skupiny ako vnorené slovníky).
+        """
+        def pocet(dotaz):
+            return int(self._pocty_zoradenych[self._kody_dotazu(dotaz)].sum())
+
+        kategorie = [_kategoria_cisla(c) for c in np.unique(self._kategorie) if c >= 0]
+        kody_kapitol = {k: self._kody_dotazu(k) for k in kapitoly}
+        mnozina_kategorii = set(kategorie)
+        return {
+            "Všetky": "Všetky",
+            "Skupiny diagnóz": {nazov: f"{nazov} ({self.pocet(nazov)})" for nazov in self.skupiny},
+            "Kapitoly": {k: f"{k} ({int(self._pocty_zoradenych[kody].sum())})" for k, kody in kody_kapitol.items() if len(kody)},
+            "Kategórie": {k: f"{k} ({pocet(k)})" for k in kategorie},
+            # kód zhodný s kategóriou (napr. "I10") je už zahrnutý vo voľbe kategórie
+            "Kódy": {k: f"{k} ({self.pocty[k]})" for k in self.kody if k not in mnozina_kategorii},
+        }
@@ -0,0 +1,138 @@
+"""
+Zápis tabuliek a vybraných riadkov datasetu po dávkach ako CSV alebo Parquet (sťahovanie z aplikácie).
+
+Súbor sa nevytvára celý v pamäti: generátory vracajú bajty po dávkach riadkov a riadky dávky sa
+z datasetu vyberú podľa pozícií až pri jej zápise. Oba formáty zapisuje pyarrow (CSV aj s formátovaním
+dátumov je niekoľkokrát rýchlejšie ako DataFrame.to_csv), v Parquet je každá dávka jedna skupina riadkov.
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from utils import format_datumu
+
+# Formát -> typ obsahu odpovede
+formaty_exportu = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+# Počet riadkov jednej dávky (jednej skupiny riadkov v Parquet)
+velkost_davky = 100_000
+
+
+class _ZbernyVystup:
+    """
+    Zapisovateľný súbor pre zapisovače pyarrow, ktorý si zapísané bajty iba drží, kým si ich generátor nevyberie.
+    """
+
+    def __init__(self):
+        self._casti = []
+        self._pozicia = 0
+        self.closed = False
+
+    def write(self, data):
+        self._casti.append(bytes(data))
+        self._pozicia += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pozicia
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vyber(self):
+        data = b"".join(self._casti)
+        self._casti.clear()
+        return data
+
+
+def _davky(df, pozicie, velkost):
+    pocet = len(df) if pozicie is None else len(pozicie)
+    for zaciatok in range(0, pocet, velkost):
+        if pozicie is None:
+            yield df.iloc[zaciatok:zaciatok + velkost]
+        else:
+            yield df.take(pozicie[zaciatok:zaciatok + velkost])
+
+
+def priprav_na_parquet(tabulka):
+    """
+    Stĺpce so zmiešanými hodnotami (napr. kategórie a text, čísla a "N/A") prevedie na text,
+    ktorý Parquet uloží bez chyby typu. Chýbajúce hodnoty zostanú chýbajúce (nie text "nan").
+
+    Returns:
+        pd.DataFrame: Tabuľka s textovými stĺpcami namiesto stĺpcov typu object.
+    """
+    return tabulka.astype({s: "string" for s in tabulka.columns if tabulka[s].dtype == object})
+
+
+def _tabulka_arrow(tabulka, schema=None):
+    return pa.Table.from_pandas(priprav_na_parquet(tabulka), schema=schema, preserve_index=False)
+
+
+def _datumy_na_text(tabulka):
+    return pa.table([pc.strftime(stlpec, format=format_datumu) if pa.types.is_timestamp(stlpec.type) else stlpec
+                     for stlpec in tabulka.columns], names=tabulka.column_names)
+
+
+def csv_po_davkach(df, pozicie=None, velkost=velkost_davky):
+    """
+    Zapíše riadky ako CSV (oddeľovač ';', dátumy format_datumu ako vo vstupnom datasete,
+    textové hodnoty v úvodzovkách).
+
+    Args:
+        df (pd.DataFrame): Dataset alebo tabuľka výsledkov.
+        pozicie (np.ndarray, voliteľné): Pozície zapisovaných riadkov, predvolene všetky riadky.
+        velkost (int): Počet riadkov dávky.
+
+    Yields:
+        bytes: Hlavička s prvou dávkou, potom ďalšie dávky (UTF-8).
+    """
+    schema = _tabulka_arrow(df.iloc[:0]).schema
+    vystup = _ZbernyVystup()
+    with pcsv.CSVWriter(vystup, _datumy_na_text(schema.empty_table()).schema,
+                        write_options=pcsv.WriteOptions(delimiter=";")) as zapisovac:
+        for davka in _davky(df, pozicie, velkost):
+            zapisovac.write_table(_datumy_na_text(_tabulka_arrow(davka, schema)))
+            yield vystup.vyber()
+    yield vystup.vyber()
+
+
+def parquet_po_davkach(df, pozicie=None, velkost=velkost_davky):
+    """
+    Zapíše riadky ako Parquet s jednou skupinou riadkov na dávku.
+
+    Args:
+        df (pd.DataFrame): Dataset alebo tabuľka výsledkov.
+        pozicie (np.ndarray, voliteľné): Pozície zapisovaných riadkov, predvolene všetky riadky.
+        velkost (int): Počet riadkov dávky.
+
+    Yields:
+        bytes: Časti súboru v poradí zápisu, posledná obsahuje pätu so schémou.
+    """
+    schema = _tabulka_arrow(df.iloc[:0]).schema
+    vystup = _ZbernyVystup()
+    with pq.ParquetWriter(vystup, schema) as zapisovac:
+        for davka in _davky(df, pozicie, velkost):
+            zapisovac.write_table(_tabulka_arrow(davka, schema), row_group_size=velkost)
+            yield vystup.vyber()
+    yield vystup.vyber()
+
+
+def po_davkach(df, format_exportu, pozicie=None, velkost=velkost_davky):
+    """
+    Generátor dávok súboru v zadanom formáte (csv_po_davkach alebo parquet_po_davkach).
+
+    Args:
+        df (pd.DataFrame): Dataset alebo tabuľka výsledkov.
+        format_exportu (str): Kľúč formaty_exportu.
+        pozicie (np.ndarray, voliteľné): Pozície zapisovaných riadkov, predvolene všetky riadky.
+        velkost (int): Počet riadkov dávky.
+    """
+    if format_exportu == "csv":
+        return csv_po_davkach(df, pozicie, velkost)
+    if format_exportu == "parquet":
+        return parquet_po_davkach(df, pozicie, velkost)
+    raise ValueError(f"Neznámy formát exportu: {format_exportu}")
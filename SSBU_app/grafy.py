@@ -0,0 +1,308 @@
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from plotnine import ggplot, aes, geom_col, geom_boxplot, theme_minimal, labs, position_dodge
+
+from demografia import tabulka_genotypov
+from metriky import merana, registruj_cache
+from utils import genotypy
+
+# Typy grafov pre každú mutáciu na stránke "Genotypy, demografia a diagnózy"
+typy_grafov = ["distribucia", "vek", "pohlavie", "diagnoza"]
+# Typ grafu -> (nadpis za názvom mutácie, popis osi y)
+texty_grafov = {
+    "distribucia": ("Distribúcia genotypov", "Počet pacientov"),
+    "vek": ("Vek podľa genotypu", "Vek"),
+    "pohlavie": ("Genotypy podľa pohlavia", "Počet pacientov"),
+    "diagnoza": ("Genotypy podľa diagnózy", "Počet pacientov"),
+}
+# Typ stĺpcového grafu -> stĺpec, podľa ktorého sa stĺpce delia (farba)
+skupiny_grafov = {"distribucia": None, "pohlavie": "pohlavie", "diagnoza": "diagnoza_ano_nie"}
+
+
+def vytvor_graf(data, mutacia, typ, fill_legend=None):
+    """
+    Vytvorí plotnine graf daného typu pre jednu mutáciu.
+
+    Args:
+        data (pd.DataFrame): Pre stĺpcové grafy agregované počty (stĺpec "pocet", pozri
+                             demografia.tabulka_genotypov), pre typ "vek" riadky pacientov.
+        mutacia (str): Stĺpec s genotypom mutácie.
+        typ (str): Jeden z typy_grafov.
+        fill_legend (str, voliteľné): Popis legendy pre graf podľa diagnózy.
+
+    Returns:
+        ggplot: Graf.
+    """
+    if typ not in texty_grafov:
+        raise ValueError(f"Neznámy typ grafu: {typ}")
+    nadpis, os_y = texty_grafov[typ]
+    if typ == "distribucia":
+        # distribúcia genotypov – bez fill podla diagnozy; len čistý count
+        return (ggplot(data, aes(x=mutacia, y="pocet")) + geom_col()
+                + labs(title=f"{mutacia} – {nadpis}", x="Genotyp", y=os_y)
+                + theme_minimal())
+    if typ == "vek":
+        return (ggplot(data, aes(x=mutacia, y="vek"))
+                + geom_boxplot()
+                + labs(title=f"{mutacia} – {nadpis}", x="Genotyp", y=os_y)
+                + theme_minimal())
+    return (ggplot(data, aes(x=mutacia, y="pocet", fill=skupiny_grafov[typ]))
+            + geom_col(position=position_dodge())
+            + labs(title=f"{mutacia} – {nadpis}", x="Genotyp", y=os_y,
+                   fill="Pohlavie" if typ == "pohlavie" else fill_legend)
+            + theme_minimal())
+
+
+def priprav_data_grafov(df, pocty, kocka, mutacie, maska_diagnoz=None):
+    """
+    Pripraví dáta všetkých grafov stránky pre vykresli_grafy.
+
+    Args:
+        df (pd.DataFrame): Vyfiltrované riadky pacientov (iba pre boxplot veku).
+        pocty (np.ndarray): Výrez kocky demografie pre rovnaké filtre (pozri vyrez_pre_filtre).
+        kocka (KockaDemografie): Kocka, z ktorej počty pochádzajú.
+        mutacie (list): Stĺpce s genotypmi.
+        maska_diagnoz (np.ndarray, voliteľné): Maska diagnóz; bez nej sa graf podľa diagnózy vynechá.
+
+    Returns:
+        dict: (mutácia, typ) -> DataFrame.
+    """
+    data_grafov = {}
+    for mutacia in mutacie:
+        # stĺpcové grafy sa skladajú z výrezu predpočítanej kocky počtov
+        data_grafov[(mutacia, "distribucia")] = tabulka_genotypov(pocty, kocka, mutacia)
+        data_grafov[(mutacia, "vek")] = df[[mutacia, "vek"]]
+        data_grafov[(mutacia, "pohlavie")] = tabulka_genotypov(pocty, kocka, mutacia, "pohlavie")
+        if maska_diagnoz is not None:
+            data_grafov[(mutacia, "diagnoza")] = tabulka_genotypov(pocty, kocka, mutacia, "diagnoza_ano_nie",
+                                                                   maska_diagnoz)
+    return data_grafov
+
+
+def _krabica(hodnoty):
+    # rovnaké štatistiky ako geom_boxplot: kvartily (lineárna interpolácia), fúzy po najkrajnejšiu
+    # hodnotu do 1,5 × IQR od krabice, hodnoty mimo fúzov ako odľahlé body
+    q1, median, q3 = np.percentile(hodnoty, [25, 50, 75])
+    iqr = q3 - q1
+    vnutri = hodnoty[(hodnoty >= q1 - 1.5 * iqr) & (hodnoty <= q3 + 1.5 * iqr)]
+    odlahle = hodnoty[(hodnoty < vnutri.min()) | (hodnoty > vnutri.max())]
+    return {"min": round(float(vnutri.min()), 2), "q1": round(float(q1), 2), "median": round(float(median), 2),
+            "q3": round(float(q3), 2), "max": round(float(vnutri.max()), 2), "pocet": int(len(hodnoty)),
+            # vek má jedno desatinné miesto, rôznych odľahlých hodnôt je preto málo
+            "odlahle": np.unique(np.round(odlahle, 1)).tolist()}
+
+
+def popis_grafu(data, mutacia, typ, fill_legend=None):
+    """
+    Opíše graf agregovanými číslami pre vykreslenie v prehliadači (namiesto PNG z vykresli_png):
+    stĺpcové grafy počtami, boxplot veku kvartilmi, fúzmi a odľahlými hodnotami.
+
+    Args:
+        data (pd.DataFrame): Rovnaké dáta ako pre vytvor_graf.
+        mutacia (str): Stĺpec s genotypom mutácie.
+        typ (str): Jeden z typy_grafov.
+        fill_legend (str, voliteľné): Popis legendy pre graf podľa diagnózy.
+
+    Returns:
+        dict: Popis grafu serializovateľný do JSON (kľúč "druh" je "stlpce" alebo "boxplot").
+    """
+    if typ not in texty_grafov:
+        raise ValueError(f"Neznámy typ grafu: {typ}")
+    nadpis, os_y = texty_grafov[typ]
+    popis = {"nadpis": f"{mutacia} – {nadpis}", "os_x": "Genotyp", "os_y": os_y}
+
+    if typ == "vek":
+        kody = pd.Categorical(data[mutacia], categories=genotypy).codes
+        vek = data["vek"].to_numpy(dtype=np.float64)
+        platne = ~np.isnan(vek)
+        kategorie, krabice = [], []
+        for kod, genotyp in enumerate(genotypy):
+            hodnoty = vek[platne & (kody == kod)]
+            if len(hodnoty):
+                kategorie.append(genotyp)
+                krabice.append(_krabica(hodnoty))
+        return {**popis, "druh": "boxplot", "kategorie": kategorie, "krabice": krabice}
+
+    # agregované tabuľky majú najviac niekoľko riadkov, prechod v Pythone je rýchlejší ako pivot_table
+    skupina = skupiny_grafov[typ]
+    genotypy_riadkov = [str(g) for g in data[mutacia]]
+    skupiny_riadkov = [str(s) for s in data[skupina]] if skupina else [""] * len(data)
+    kategorie = [g for g in genotypy if g in genotypy_riadkov]
+    # poradie farieb ako v plotnine (zoradené hodnoty)
+    skupiny = sorted(set(skupiny_riadkov))
+    hodnoty = [[0] * len(skupiny) for _ in kategorie]
+    for genotyp, nazov_skupiny, pocet in zip(genotypy_riadkov, skupiny_riadkov, data["pocet"]):
+        hodnoty[kategorie.index(genotyp)][skupiny.index(nazov_skupiny)] += int(pocet)
+    return {**popis, "druh": "stlpce",
+            "legenda": None if skupina is None else ("Pohlavie" if typ == "pohlavie" else fill_legend),
+            "kategorie": kategorie, "skupiny": skupiny, "hodnoty": hodnoty}
+
+
+@merana("grafy")
+def popisy_grafov(data_grafov, fill_legend=None):
+    """
+    Opíše zadané grafy pre vykreslenie v prehliadači (pozri popis_grafu).
+
+    Returns:
+        dict: (mutácia, typ) -> JSON text popisu grafu.
+    """
+    return {(mutacia, typ): json.dumps(popis_grafu(data, mutacia, typ, fill_legend), ensure_ascii=False)
+            for (mutacia, typ), data in data_grafov.items()}
+
+
+def vykresli_png(data, mutacia, typ, fill_legend=None):
+    """
+    Vykreslí graf do PNG. Funkcia beží aj v pracovných procesoch, preto je na úrovni modulu.
+
+    Returns:
+        bytes: Obsah PNG súboru.
+    """
+    fig = vytvor_graf(data, mutacia, typ, fill_legend).draw()
+    buf = io.BytesIO()
+    FigureCanvas(fig).print_png(buf)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class CachePNG:
+    """
+    LRU cache vykreslených grafov ohraničená celkovou veľkosťou v bajtoch.
+    """
+
+    def __init__(self, max_bajtov=64 * 1024 * 1024):
+        self.max_bajtov = max_bajtov
+        self.bajtov = 0
+        self.hits = 0
+        self.misses = 0
+        self._zaznamy = OrderedDict()
+        self._zamok = threading.Lock()
+
+    def get(self, kluc):
+        with self._zamok:
+            png = self._zaznamy.get(kluc)
+            if png is None:
+                self.misses += 1
+                return None
+            self._zaznamy.move_to_end(kluc)
+            self.hits += 1
+            return png
+
+    def put(self, kluc, png):
+        with self._zamok:
+            if kluc in self._zaznamy:
+                self.bajtov -= len(self._zaznamy.pop(kluc))
+            self._zaznamy[kluc] = png
+            self.bajtov += len(png)
+            while self.bajtov > self.max_bajtov and len(self._zaznamy) > 1:
+                _, stary = self._zaznamy.popitem(last=False)
+                self.bajtov -= len(stary)
+
+    def info(self):
+        with self._zamok:
+            return {"hits": self.hits, "misses": self.misses, "pocet": len(self._zaznamy), "bajtov": self.bajtov}
+
+    def clear(self):
+        with self._zamok:
+            self._zaznamy.clear()
+            self.bajtov = self.hits = self.misses = 0
+
+
+cache_grafov = CachePNG()
+registruj_cache("grafy_png", cache_grafov.info)
+_executor = None
+_executor_zamok = threading.Lock()
+
+
+def _ziskaj_executor():
+    global _executor
+    with _executor_zamok:
+        if _executor is None:
+            # spawn: pracovné procesy nededia vlákna a stav servera
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _zrus_executor():
+    global _executor
+    with _executor_zamok:
+        _executor = None
+
+
+def _pockaj_na_grafy(buduce, kluce, zrusenie):
+    while True:
+        hotove, nedokoncene = wait(buduce, timeout=None if zrusenie is None else 0.1)
+        if not nedokoncene:
+            return [b.result() for b in buduce]
+        if zrusenie.is_set():
+            for buduci in nedokoncene:
+                buduci.cancel()
+            # už vykreslené grafy sa uložia, ďalšie vyvolanie ich nebude kresliť znova
+            for kluc, buduci in zip(kluce, buduce):
+                if buduci in hotove and buduci.exception() is None:
+                    cache_grafov.put(kluc, buduci.result())
+            raise CancelledError("Vykresľovanie grafov bolo zrušené.")
+
+
+@merana("grafy")
+def vykresli_grafy(grafy, filtre, priprav_data, fill_legend=None, zrusenie=None):
+    """
+    Vykreslí zadané grafy. Hotové PNG sa berú z cache podľa (mutácia, typ, filtre, legenda),
+    chýbajúce sa vykreslia paralelne v procesoch. Dáta grafov sa pripravia iba vtedy, keď
+    niektorý graf v cache chýba, návrat k už zobrazeným filtrom je preto okamžitý.
+
+    Args:
+        grafy (list): Dvojice (mutácia, typ) v poradí zobrazenia.
+        filtre (tuple): Verzia snímky a hodnoty filtrov, ktoré jednoznačne určujú dáta (kľúč cache).
+        priprav_data (callable): Vráti dict (mutácia, typ) -> DataFrame pre vytvor_graf.
+        fill_legend (str, voliteľné): Popis legendy pre graf podľa diagnózy.
+        zrusenie (threading.Event, voliteľné): Po nastavení sa nezačaté grafy zrušia
+                                               a vyvolá sa concurrent.futures.CancelledError.
+
+    Returns:
+        dict: (mutácia, typ) -> PNG bajty.
+    """
+    vysledky = {}
+    chybajuce = []
+    for mutacia, typ in grafy:
+        kluc = (mutacia, typ, filtre, fill_legend)
+        png = cache_grafov.get(kluc)
+        if png is None:
+            chybajuce.append(kluc)
+        else:
+            vysledky[(mutacia, typ)] = png
+
+    if chybajuce:
+        data_grafov = priprav_data()
+        kluce = chybajuce
+        ulohy = [(data_grafov[(mutacia, typ)], mutacia, typ, fill_legend) for mutacia, typ, _, _ in kluce]
+        try:
+            executor = _ziskaj_executor()
+            pngs = _pockaj_na_grafy([executor.submit(vykresli_png, *uloha) for uloha in ulohy], kluce, zrusenie)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            _zrus_executor()
+            logging.warning(f"Paralelné vykresľovanie grafov zlyhalo ({e}), grafy sa vykreslia postupne.")
+            pngs = []
+            for uloha in ulohy:
+                if zrusenie is not None and zrusenie.is_set():
+                    raise CancelledError("Vykresľovanie grafov bolo zrušené.")
+                pngs.append(vykresli_png(*uloha))
+
+        for kluc, png in zip(kluce, pngs):
+            cache_grafov.put(kluc, png)
+            vysledky[(kluc[0], kluc[1])] = png
+    return vysledky
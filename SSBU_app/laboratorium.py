@@ -0,0 +1,145 @@
+"""
+Čas spracovania vzoriek v laboratóriu: od prijatia vzorky po validovaný výsledok.
+
+Časy a kódy období sa z datasetu vypočítajú raz (CasySpracovania), percentily a rozdelenie
+podľa obdobia sa potom počítajú vektorovo zoskupením celej histórie.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metriky import merana
+
+obdobia_spracovania = ["Rok", "Štvrťrok", "Mesiac"]
+percentily_spracovania = [0.5, 0.75, 0.9, 0.95, 0.99]
+# Hranice intervalov rozdelenia času spracovania v dňoch, posledný interval je bez hranice
+hranice_rozdelenia = [0, 1, 2, 3, 5, 7, 14, 30]
+
+
+def _popis_obdobia(kod, obdobie):
+    if obdobie == "Rok":
+        return str(kod)
+    if obdobie == "Štvrťrok":
+        return f"{kod // 10} Q{kod % 10}"
+    return f"{kod // 100}-{kod % 100:02d}"
+
+
+class CasySpracovania:
+    """
+    Čas spracovania každej vzorky (v dňoch) a kódy období podľa roka a mesiaca validácie.
+    Záznamy bez niektorého dátumu alebo so záporným časom sa do štatistík nezapočítajú.
+    Výsledky pre kombináciu obdobia a rozsahu rokov sa pamätajú (inštancia patrí jednej snímke dát).
+    """
+
+    def __init__(self, df):
+        rozdiel = (df["validovany vysledok"] - df["prijem vzorky"]).to_numpy()
+        dni = rozdiel / np.timedelta64(1, "D")
+        self.pocet_zapornych = int(np.sum(dni < 0))
+        rok = df["rok"].to_numpy(dtype=np.float64, na_value=np.nan)
+        mesiac = df["mesiac"].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        platne = ~np.isnan(dni) & (dni >= 0) & ~np.isnan(rok) & ~np.isnan(mesiac)
+        self.pocet_vynechanych = int(len(df) - platne.sum())
+        self.dni = dni[platne]
+        self.rok = rok[platne].astype(np.int32)
+        mesiac = mesiac[platne].astype(np.int32)
+        self._kody = {
+            "Rok": self.rok,
+            "Štvrťrok": self.rok * 10 + (mesiac - 1) // 3 + 1,
+            "Mesiac": self.rok * 100 + mesiac,
+        }
+        self._vysledky = {}
+        self._zamok = threading.Lock()
+
+    def roky(self):
+        """
+        Returns:
+            tuple: (prvý, posledný) rok validácie, (None, None) bez platných záznamov.
+        """
+        if not len(self.rok):
+            return None, None
+        return int(self.rok.min()), int(self.rok.max())
+
+    def _vyber(self, obdobie, rok_od, rok_do):
+        if obdobie not in self._kody:
+            raise ValueError(f"Neznáme obdobie: {obdobie}")
+        maska = np.ones(len(self.rok), dtype=bool)
+        if rok_od is not None:
+            maska &= self.rok >= rok_od
+        if rok_do is not None:
+            maska &= self.rok <= rok_do
+        return self._kody[obdobie][maska], self.dni[maska]
+
+    def _z_cache(self, kluc, vypocet):
+        with self._zamok:
+            if kluc not in self._vysledky:
+                self._vysledky[kluc] = vypocet()
+            return self._vysledky[kluc]
+
+    def percentily(self, obdobie="Rok", rok_od=None, rok_do=None):
+        """
+        Štatistiky času spracovania pre každé obdobie a spolu.
+
+        Args:
+            obdobie (str): Jedno z obdobia_spracovania.
+            rok_od (int, voliteľné): Prvý zahrnutý rok validácie.
+            rok_do (int, voliteľné): Posledný zahrnutý rok validácie.
+
+        Returns:
+            pd.DataFrame: Obdobie, počet vzoriek, priemer, percentily a maximum (v dňoch);
+                          posledný riadok "Spolu" je za celý vybraný rozsah.
+        """
+        return self._z_cache(("percentily", obdobie, rok_od, rok_do),
+                             lambda: _percentily(*self._vyber(obdobie, rok_od, rok_do), obdobie))
+
+    def rozdelenie(self, obdobie="Rok", rok_od=None, rok_do=None):
+        """
+        Rozdelenie času spracovania do intervalov (hranice_rozdelenia) pre každé obdobie.
+
+        Returns:
+            pd.DataFrame: Obdobie, počet vzoriek a percento vzoriek v každom intervale;
+                          posledný riadok "Spolu" je za celý vybraný rozsah.
+        """
+        return self._z_cache(("rozdelenie", obdobie, rok_od, rok_do),
+                             lambda: _rozdelenie(*self._vyber(obdobie, rok_od, rok_do), obdobie))
+
+
+@merana("laboratorium")
+def _percentily(kody, dni, obdobie):
+    nazvy_percentilov = [f"P{round(q * 100)} (dni)" if q != 0.5 else "Medián (dni)" for q in percentily_spracovania]
+    dni = pd.Series(dni)
+    skupiny = dni.groupby(kody, sort=True)
+    tabulka = skupiny.agg(["size", "mean"]).set_axis(["Počet vzoriek", "Priemer (dni)"], axis=1)
+    if len(dni):
+        # quantile so zoznamom sa počíta pre všetky skupiny naraz
+        tabulka[nazvy_percentilov] = skupiny.quantile(percentily_spracovania).unstack().to_numpy()
+    else:
+        # prázdny výber (napr. rozsah rokov bez vzoriek): tabuľka iba s riadkom "Spolu"
+        tabulka[nazvy_percentilov] = np.nan
+    tabulka["Max (dni)"] = skupiny.max()
+    tabulka.index = [_popis_obdobia(kod, obdobie) for kod in tabulka.index]
+
+    spolu = [len(dni), dni.mean(), *dni.quantile(percentily_spracovania), dni.max()] if len(dni) else \
+        [0] + [np.nan] * (len(tabulka.columns) - 1)
+    tabulka.loc["Spolu"] = spolu
+    tabulka["Počet vzoriek"] = tabulka["Počet vzoriek"].astype(np.int64)
+    return tabulka.round(2).rename_axis("Obdobie").reset_index()
+
+
+@merana("laboratorium")
+def _rozdelenie(kody, dni, obdobie):
+    popisy = [f"{od}–{do} d" for od, do in zip(hranice_rozdelenia, hranice_rozdelenia[1:])] + \
+             [f"{hranice_rozdelenia[-1]}+ d"]
+    interval = np.searchsorted(hranice_rozdelenia, dni, side="right") - 1
+    kody_obdobi, obdobia = pd.factorize(kody, sort=True)
+    # počty pre všetky obdobia a intervaly jedným bincount nad kombinovaným kódom
+    pocty = np.bincount(kody_obdobi * len(popisy) + interval,
+                        minlength=len(obdobia) * len(popisy)).reshape(len(obdobia), len(popisy))
+    pocty = np.vstack([pocty, pocty.sum(axis=0)])
+    spolu = pocty.sum(axis=1)
+    percenta = np.round(pocty / np.maximum(spolu, 1)[:, None] * 100, 1)
+    tabulka = pd.DataFrame(percenta, columns=popisy)
+    tabulka.insert(0, "Počet vzoriek", spolu)
+    tabulka.insert(0, "Obdobie", [_popis_obdobia(kod, obdobie) for kod in obdobia] + ["Spolu"])
+    return tabulka
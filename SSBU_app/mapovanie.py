@@ -0,0 +1,149 @@
+"""
+Snímky tabuliek vo formáte Arrow IPC, ktoré sa čítajú cez pamäťovo mapovaný súbor bez kopírovania.
+
+Všetky procesy (pracovníci servera, procesy reportu) mapujú ten istý súbor iba na čítanie, stránky
+dát preto zdieľa page cache operačného systému a každý ďalší proces stojí len niekoľko MB. Stĺpce
+sa zapisujú bez bitmapy platnosti, aby ich numpy/pandas mohli použiť priamo:
+kategórie ako kódy (-1 = chýbajúca hodnota) s kategóriami v metadátach stĺpca, dátumy ako int64
+(NaT je najmenšie int64), desatinné čísla s NaN a text ako large_string (typ reťazcov pandas).
+Malé stĺpce s celými číslami s chýbajúcimi hodnotami (Int16, Int8) si bitmapu ponechajú a kopírujú sa.
+
+Polia načítaných DataFrame sú iba na čítanie; zápis na mieste (df.loc[...] = ...) zlyhá,
+pridanie alebo nahradenie celého stĺpca funguje. Operácia, ktorá vytvorí nový DataFrame (napr.
+spojenie s pripojenými riadkami), už pracuje so súkromnou kópiou; dataset.DatasetPacientov preto
+spojený dataset znova zapíše ako snímku a namapuje, aby zostal zdieľaný.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def _zapis_tabulku(tabulka, cesta):
+    # nekomprimovaný IPC súbor s jednou dávkou: každý stĺpec je jeden súvislý buffer
+    with pa.OSFile(str(cesta), "wb") as subor, pa.ipc.new_file(subor, tabulka.schema) as zapisovac:
+        zapisovac.write_table(tabulka, max_chunksize=max(tabulka.num_rows, 1))
+
+
+def _mapuj_tabulku(cesta):
+    return pa.ipc.open_file(pa.memory_map(str(cesta), "r")).read_all()
+
+
+def _stlpec_arrow(nazov, stlpec):
+    dtype = stlpec.dtype
+    if isinstance(dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(dtype.categories):
+        metadata = {"kategorie": json.dumps(list(dtype.categories), ensure_ascii=False),
+                    "usporiadane": json.dumps(bool(dtype.ordered))}
+        return pa.field(nazov, pa.from_numpy_dtype(stlpec.cat.codes.dtype), metadata=metadata), \
+            pa.array(stlpec.cat.codes.to_numpy())
+    if isinstance(dtype, np.dtype) and dtype.kind == "M":
+        return pa.field(nazov, pa.int64(), metadata={"dtype": str(dtype)}), \
+            pa.array(stlpec.to_numpy().view(np.int64))
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in "iu":
+        # celé čísla s <NA> (napr. odvodený rok): pri čítaní sa obnoví pôvodný typ pandas
+        pole = pa.Array.from_pandas(stlpec)
+        return pa.field(nazov, pole.type, metadata={"pandas_dtype": dtype.name}), pole
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        # pa.array z numpy poľa ponechá NaN ako hodnotu (from_pandas by z nej urobil null)
+        return pa.field(nazov, pa.from_numpy_dtype(dtype)), pa.array(stlpec.to_numpy())
+    # ostatné typy (text, kategórie s inými hodnotami) sa uložia bežne a pri čítaní sa prevedú cez pandas
+    pole = pa.Array.from_pandas(stlpec)
+    if pa.types.is_string(pole.type):
+        pole = pole.cast(pa.large_string())
+    return pa.field(nazov, pole.type), pole
+
+
+def uloz_dataset(df, cesta):
+    """
+    Zapíše typovaný dataset ako Arrow IPC snímku, ktorú načíta mapuj_dataset (index sa neukladá).
+
+    Args:
+        df (pd.DataFrame): Typovaný dataset (napr. z typuj_dataset).
+        cesta (str | Path): Cieľový súbor.
+    """
+    polia, stlpce = zip(*(_stlpec_arrow(nazov, df[nazov]) for nazov in df.columns))
+    _zapis_tabulku(pa.Table.from_arrays(list(stlpce), schema=pa.schema(polia)), cesta)
+
+
+def mapuj_dataset(cesta):
+    """
+    Namapuje snímku z uloz_dataset a vráti DataFrame, ktorého stĺpce ukazujú priamo do súboru.
+
+    Args:
+        cesta (str | Path): Súbor snímky.
+
+    Returns:
+        pd.DataFrame: Dataset s indexom 0..n-1 (polia iba na čítanie).
+    """
+    tabulka = _mapuj_tabulku(cesta)
+    stlpce = {}
+    for pole, stlpec in zip(tabulka.schema, tabulka.columns):
+        metadata = pole.metadata or {}
+        if b"pandas_dtype" in metadata:
+            dtype = pd.api.types.pandas_dtype(metadata[b"pandas_dtype"].decode())
+            stlpce[pole.name] = stlpec.to_pandas(types_mapper={stlpec.type: dtype}.get)
+            continue
+        if stlpec.num_chunks != 1 or stlpec.null_count:
+            stlpce[pole.name] = stlpec.to_pandas()
+            continue
+        hodnoty = stlpec.chunk(0)
+        if b"kategorie" in metadata:
+            stlpce[pole.name] = pd.Categorical.from_codes(
+                hodnoty.to_numpy(zero_copy_only=True), validate=False,
+                dtype=pd.CategoricalDtype(json.loads(metadata[b"kategorie"]),
+                                          ordered=json.loads(metadata[b"usporiadane"])))
+        elif b"dtype" in metadata:
+            stlpce[pole.name] = hodnoty.to_numpy(zero_copy_only=True).view(metadata[b"dtype"].decode())
+        elif pa.types.is_primitive(hodnoty.type) and not pa.types.is_boolean(hodnoty.type):
+            stlpce[pole.name] = hodnoty.to_numpy(zero_copy_only=True)
+        else:
+            stlpce[pole.name] = hodnoty.to_pandas()
+    # copy=False: DataFrame si polia nekopíruje ani nezlučuje do blokov
+    return pd.DataFrame(stlpce, index=pd.RangeIndex(tabulka.num_rows), copy=False)
+
+
+def uloz_harky(harky, cesta):
+    """
+    Zapíše hárky (napr. číselníka MKCH-10) do jednej Arrow IPC snímky. Hárky sa uložia pod sebou
+    v spoločnej tabuľke so zjednotenými stĺpcami, rozsah riadkov a stĺpce hárku sú v metadátach.
+
+    Args:
+        harky (dict): Názov hárku -> pd.DataFrame.
+        cesta (str | Path): Cieľový súbor.
+    """
+    tabulky, rozsahy, zaciatok = [], [], 0
+    for nazov, harok in harky.items():
+        tabulka = pa.Table.from_pandas(harok, preserve_index=False)
+        tabulka = tabulka.cast(pa.schema([pole.with_type(pa.large_string()) if pa.types.is_string(pole.type)
+                                          else pole for pole in tabulka.schema]))
+        tabulky.append(tabulka.replace_schema_metadata(None))
+        rozsahy.append([nazov, zaciatok, tabulka.num_rows, [str(s) for s in harok.columns]])
+        zaciatok += tabulka.num_rows
+    spolocna = pa.concat_tables(tabulky, promote_options="default") if tabulky else pa.table({})
+    _zapis_tabulku(spolocna.replace_schema_metadata({"harky": json.dumps(rozsahy, ensure_ascii=False)}), cesta)
+
+
+def mapuj_harky(cesta):
+    """
+    Namapuje snímku z uloz_harky. Textové stĺpce (large_string) sú pohľady do mapovaného súboru
+    bez kopírovania, aj keď obsahujú chýbajúce hodnoty; ostatné stĺpce (napr. celé prázdne) sa
+    skopírujú prevodom pandas.
+
+    Args:
+        cesta (str | Path): Súbor snímky.
+
+    Returns:
+        dict: Názov hárku -> pd.DataFrame (v pôvodnom poradí hárkov).
+    """
+    tabulka = _mapuj_tabulku(cesta)
+    rozsahy = json.loads(tabulka.schema.metadata[b"harky"])
+    harky = {}
+    for nazov, zaciatok, pocet, stlpce in rozsahy:
+        harok = tabulka.slice(zaciatok, pocet).select(stlpce)
+        # typ reťazcov pandas je postavený na large_string, pole sa preto iba obalí
+        harky[nazov] = pd.DataFrame({stlpec: pd.array(hodnoty, dtype="str") if pa.types.is_large_string(hodnoty.type)
+                                     else hodnoty.to_pandas()
+                                     for stlpec, hodnoty in zip(harok.column_names, harok.columns)},
+                                    index=pd.RangeIndex(pocet), copy=False)
+    return harky
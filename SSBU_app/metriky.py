@@ -0,0 +1,176 @@
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Horné hranice košov histogramu trvania (v sekundách), posledný kôš je bez hranice
+hranice_histogramu = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Merania dlhšie ako prah (v sekundách) sa zapíšu do logu ako varovanie
+prah_pomaleho_merania = 2.0
+
+_histogramy = {}
+_zdroje_cache = {}
+_zamok = threading.Lock()
+
+
+class Histogram:
+    """
+    Histogram trvaní jedného merania s pevnými košmi (hranice_histogramu).
+    """
+
+    def __init__(self):
+        self.kose = [0] * (len(hranice_histogramu) + 1)
+        self.pocet = 0
+        self.sucet = 0.0
+        self.maximum = 0.0
+
+    def pridaj(self, trvanie):
+        self.kose[bisect_left(hranice_histogramu, trvanie)] += 1
+        self.pocet += 1
+        self.sucet += trvanie
+        self.maximum = max(self.maximum, trvanie)
+
+    def kvantil(self, q):
+        """
+        Odhad kvantilu trvania (horná hranica koša, v ktorom kvantil leží).
+
+        Returns:
+            float | None: Trvanie v sekundách, None ak nie je žiadne meranie.
+        """
+        if not self.pocet:
+            return None
+        hranica = q * self.pocet
+        kumulativne = 0
+        for i, pocet in enumerate(self.kose):
+            kumulativne += pocet
+            if kumulativne >= hranica:
+                return hranice_histogramu[i] if i < len(hranice_histogramu) else self.maximum
+        return self.maximum
+
+
+def zaznamenaj(nazov, trvanie):
+    """
+    Pridá trvanie do histogramu merania.
+
+    Args:
+        nazov (str): Názov merania (napr. "utils.check_hardy_weinberg", "vystup.grafy_vystup").
+        trvanie (float): Trvanie v sekundách.
+    """
+    with _zamok:
+        histogram = _histogramy.get(nazov)
+        if histogram is None:
+            histogram = _histogramy[nazov] = Histogram()
+        histogram.pridaj(trvanie)
+    if trvanie >= prah_pomaleho_merania:
+        logging.warning("Pomalé meranie %s: %.0f ms", nazov, trvanie * 1000)
+    else:
+        # formátovanie sa odloží, pri úrovni INFO nestojí záznam nič
+        logging.debug("%s: %.2f ms", nazov, trvanie * 1000)
+
+
+@contextmanager
+def meraj(nazov):
+    """
+    Kontextový manažér, ktorý zmeria trvanie bloku a zapíše ho do histogramu. Blok ukončený
+    výnimkou sa nezapíše (napr. výstup Shiny prerušený, kým nie sú vstupy pripravené).
+    """
+    zaciatok = time.perf_counter()
+    yield
+    zaznamenaj(nazov, time.perf_counter() - zaciatok)
+
+
+def merana(predpona):
+    """
+    Dekorátor, ktorý meria trvanie každého volania funkcie pod názvom "predpona.názov_funkcie".
+    Pri @render výstupoch sa uvádza pod dekorátor render, aby meral výpočet výstupu. Volania
+    ukončené výnimkou sa nezapíšu (ako pri meraj).
+
+    Args:
+        predpona (str): Skupina meraní, napr. "utils" alebo "vystup".
+    """
+    def dekorator(funkcia):
+        nazov = f"{predpona}.{funkcia.__name__}"
+
+        @functools.wraps(funkcia)
+        def obal(*args, **kwargs):
+            zaciatok = time.perf_counter()
+            vysledok = funkcia(*args, **kwargs)
+            zaznamenaj(nazov, time.perf_counter() - zaciatok)
+            return vysledok
+        return obal
+    return dekorator
+
+
+def registruj_cache(nazov, info):
+    """
+    Zaregistruje cache, ktorej úspešnosť sa má zobrazovať v metrikách.
+
+    Args:
+        nazov (str): Názov cache.
+        info (callable): Funkcia bez argumentov, ktorá vráti objekt alebo dict s 'hits' a 'misses'.
+    """
+    with _zamok:
+        _zdroje_cache[nazov] = info
+
+
+def statistiky_merani():
+    """
+    Returns:
+        dict: Názov merania -> dict s počtom, súčtom, maximom, p50/p95 (v sekundách) a košmi.
+    """
+    with _zamok:
+        return {nazov: {
+            "pocet": h.pocet,
+            "sucet_s": h.sucet,
+            "max_s": h.maximum,
+            "p50_s": h.kvantil(0.5),
+            "p95_s": h.kvantil(0.95),
+            "kose": list(h.kose),
+        } for nazov, h in sorted(_histogramy.items())}
+
+
+def uspesnost_cache():
+    """
+    Returns:
+        dict: Názov cache -> dict s 'hits', 'misses' a 'hit_rate' (None bez prístupov).
+    """
+    with _zamok:
+        zdroje = dict(_zdroje_cache)
+    vysledok = {}
+    for nazov, info in sorted(zdroje.items()):
+        stav = info()
+        stav = stav if isinstance(stav, dict) else stav._asdict()
+        pristupy = stav["hits"] + stav["misses"]
+        vysledok[nazov] = {"hits": stav["hits"], "misses": stav["misses"],
+                           "hit_rate": stav["hits"] / pristupy if pristupy else None}
+    return vysledok
+
+
+def _stitok(hodnota):
+    return str(hodnota).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    """
+    Vráti metriky v textovom formáte Prometheus (histogramy trvaní a úspešnosť cache).
+
+    Returns:
+        str: Text pre endpoint /metrics.
+    """
+    riadky = ["# HELP ssbu_trvanie_sekundy Trvanie meraných funkcií a výstupov.",
+              "# TYPE ssbu_trvanie_sekundy histogram"]
+    for nazov, stav in statistiky_merani().items():
+        kumulativne = 0
+        for hranica, pocet in zip(hranice_histogramu + ("+Inf",), stav["kose"]):
+            kumulativne += pocet
+            riadky.append(f'ssbu_trvanie_sekundy_bucket{{nazov="{_stitok(nazov)}",le="{hranica}"}} {kumulativne}')
+        riadky.append(f'ssbu_trvanie_sekundy_sum{{nazov="{_stitok(nazov)}"}} {stav["sucet_s"]}')
+        riadky.append(f'ssbu_trvanie_sekundy_count{{nazov="{_stitok(nazov)}"}} {stav["pocet"]}')
+
+    cache = uspesnost_cache()
+    for metrika, kluc in [("ssbu_cache_hits_total", "hits"), ("ssbu_cache_misses_total", "misses")]:
+        riadky.append(f"# TYPE {metrika} counter")
+        riadky.extend(f'{metrika}{{cache="{_stitok(nazov)}"}} {stav[kluc]}' for nazov, stav in cache.items())
+    return "\n".join(riadky) + "\n"
@@ -0,0 +1,259 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils import format_datumu
+
+# Zápis číselného filtra: "50", "20-60", ">50", ">=50", "<50", "<=50"
+_vzor_rozsahu = re.compile(r"^\s*(-?\d+(?:[.,]\d+)?)\s*-\s*(-?\d+(?:[.,]\d+)?)\s*$")
+_vzor_porovnania = re.compile(r"^\s*(<=|>=|<|>|=)?\s*(-?\d+(?:[.,]\d+)?)\s*$")
+
+
+def _na_cislo(text):
+    return float(text.replace(",", "."))
+
+
+def _texty_hodnot(hodnoty):
+    """
+    Vráti texty unikátnych hodnôt stĺpca tak, ako sa zobrazujú v mriežke (dátumy vo formáte
+    format_datumu, desatinné čísla ako "{:g}"), malými písmenami.
+
+    Returns:
+        pd.Index: Texty v poradí hodnôt.
+    """
+    if isinstance(hodnoty, pd.DatetimeIndex):
+        texty = pd.array(pc.strftime(pa.array(hodnoty), format=format_datumu), dtype="str")
+    elif pd.api.types.is_float_dtype(hodnoty.dtype):
+        texty = np.char.mod("%g", hodnoty.to_numpy())
+    else:
+        texty = hodnoty.astype(str)
+    return pd.Index(texty, dtype="str").str.lower()
+
+
+def _maska_hodnot(hodnoty, texty, text, ciselny):
+    """
+    Vyhodnotí textový filter nad unikátnymi hodnotami stĺpca.
+
+    Číselné stĺpce prijímajú presnú hodnotu, rozsah "od-do" alebo porovnanie (">50", "<=30"),
+    ostatné stĺpce (aj číselné pri inom zápise) sa filtrujú podreťazcom zobrazeného textu
+    (texty z _texty_hodnot) bez ohľadu na veľkosť písmen.
+
+    Returns:
+        np.ndarray: Booleovská maska cez unikátne hodnoty.
+    """
+    if ciselny:
+        # float32 (vek) sa porovnáva vo float32, aby zadané "59.7" zodpovedalo zobrazenej hodnote
+        cisla = np.asarray(hodnoty, dtype=np.float32 if hodnoty.dtype == np.float32 else np.float64)
+        rozsah = _vzor_rozsahu.match(text)
+        if rozsah:
+            return (cisla >= _na_cislo(rozsah.group(1))) & (cisla <= _na_cislo(rozsah.group(2)))
+        porovnanie = _vzor_porovnania.match(text)
+        if porovnanie:
+            hranica = _na_cislo(porovnanie.group(2))
+            operator = porovnanie.group(1) or "="
+            return {"<": cisla < hranica, "<=": cisla <= hranica, ">": cisla > hranica,
+                    ">=": cisla >= hranica, "=": cisla == hranica}[operator]
+    return np.asarray(texty.str.contains(text.strip().lower(), regex=False), dtype=bool)
+
+
+class MriezkaDat:
+    """
+    Stránkovaná, triediteľná a filtrovateľná tabuľka vyhodnocovaná na serveri.
+
+    Každý stĺpec sa raz zakóduje na (kódy, zoradené unikátne hodnoty). Filter sa potom vyhodnotí
+    iba nad unikátnymi hodnotami a na riadky sa prenesie indexovaním kódov, zoradenie je stabilný
+    argsort kódov. Permutácie zoradení a masky filtrov sa ukladajú do cache, takže zmena strany
+    znamená iba výrez z hotového poradia riadkov a klientovi sa posiela len viditeľná časť.
+
+    Mriežka datasetu s pripojenými riadkami (s_pridanymi) prevezme kódovanie stĺpcov pôvodnej
+    mriežky a pri prvom použití stĺpca zakóduje iba nové riadky.
+    """
+
+    def __init__(self, df, max_masiek=64, max_permutacii=8):
+        self.df = df
+        self.stlpce = list(df.columns)
+        self._kodovanie = {}
+        # stĺpec -> (počet riadkov, kódy, unikátne hodnoty, číselný, texty) z mriežky pred pripojením
+        self._predosle_kodovanie = {}
+        self._texty = {}
+        self._permutacie = OrderedDict()
+        self._max_permutacii = max_permutacii
+        self._masky = OrderedDict()
+        self._max_masiek = max_masiek
+        self._zamok = threading.Lock()
+
+    def s_pridanymi(self, df):
+        """
+        Vráti mriežku datasetu rozšíreného o riadky pripojené na koniec; pôvodná mriežka sa nemení.
+
+        Args:
+            df (pd.DataFrame): Dataset, ktorého prvé riadky sú riadky tejto mriežky.
+
+        Returns:
+            MriezkaDat: Mriežka nového datasetu.
+        """
+        nova = MriezkaDat(df, self._max_masiek, self._max_permutacii)
+        with self._zamok:
+            predosle = dict(self._predosle_kodovanie)
+            predosle.update({stlpec: (len(self.df), *kodovanie, self._texty.get(stlpec))
+                             for stlpec, kodovanie in self._kodovanie.items()})
+        nova._predosle_kodovanie = {stlpec: v for stlpec, v in predosle.items() if stlpec in nova.stlpce}
+        return nova
+
+    def _hodnoty(self, stlpec):
+        hodnoty = self.df[stlpec]
+        if isinstance(hodnoty.dtype, pd.CategoricalDtype):
+            hodnoty = hodnoty.astype(hodnoty.cat.categories.dtype)
+        return hodnoty
+
+    def _zakoduj(self, stlpec):
+        with self._zamok:
+            if stlpec not in self._kodovanie:
+                predosle = self._predosle_kodovanie.pop(stlpec, None)
+                kodovanie = self._rozsir_kodovanie(stlpec, *predosle) if predosle else None
+                if kodovanie is None:
+                    kody, unikatne = pd.factorize(self._hodnoty(stlpec), sort=True)
+                    kodovanie = (kody, unikatne, pd.api.types.is_numeric_dtype(unikatne.dtype))
+                self._kodovanie[stlpec] = kodovanie
+            return self._kodovanie[stlpec]
+
+    def _rozsir_kodovanie(self, stlpec, pocet_riadkov, kody, unikatne, ciselny, texty):
+        # zakódujú sa iba riadky za pocet_riadkov, ich unikátne hodnoty sa zlúčia s pôvodnými;
+        # None, ak sa hodnoty nedajú zlúčiť do jedného zoradeného indexu rovnakého typu
+        nove_kody, nove_unikatne = pd.factorize(self._hodnoty(stlpec).iloc[pocet_riadkov:], sort=True)
+        try:
+            zlucene = unikatne.union(nove_unikatne)
+        except TypeError:
+            return None
+        if zlucene.dtype != unikatne.dtype or not zlucene.is_monotonic_increasing:
+            return None
+        povodne_na_zlucene = zlucene.get_indexer(unikatne)
+        nove_na_zlucene = zlucene.get_indexer(nove_unikatne)
+        if len(zlucene) > len(unikatne):
+            # posledný prvok prevedie chýbajúcu hodnotu (-1) na -1
+            kody = np.append(povodne_na_zlucene, -1)[kody]
+        kody = np.concatenate([kody, np.append(nove_na_zlucene, -1)[nove_kody]])
+        if texty is not None:
+            zdroj = np.empty(len(zlucene), dtype=np.intp)
+            zdroj[nove_na_zlucene] = len(unikatne) + np.arange(len(nove_unikatne))
+            zdroj[povodne_na_zlucene] = np.arange(len(unikatne))
+            self._texty[stlpec] = texty.append(_texty_hodnot(nove_unikatne))[zdroj]
+        return kody, zlucene, ciselny
+
+    def _zobrazene_texty(self, stlpec):
+        # texty unikátnych hodnôt sa pre textový filter pripravia raz pre stĺpec
+        _, unikatne, _ = self._zakoduj(stlpec)
+        texty = self._texty.get(stlpec)
+        if texty is None:
+            texty = _texty_hodnot(unikatne)
+            with self._zamok:
+                self._texty[stlpec] = texty
+        return texty
+
+    def permutacia(self, stlpec, vzostupne=True):
+        """
+        Vráti poradie riadkov zoradené podľa stĺpca, chýbajúce hodnoty sú vždy na konci.
+
+        Args:
+            stlpec (str): Názov stĺpca.
+            vzostupne (bool): Smer zoradenia.
+
+        Returns:
+            np.ndarray: Pozície riadkov v zoradenom poradí.
+        """
+        kluc = (stlpec, vzostupne)
+        with self._zamok:
+            permutacia = self._permutacie.get(kluc)
+            if permutacia is not None:
+                self._permutacie.move_to_end(kluc)
+                return permutacia
+
+        kody, unikatne, _ = self._zakoduj(stlpec)
+        pocet = len(unikatne)
+        poradie = kody if vzostupne else pocet - 1 - kody
+        poradie = np.where(kody < 0, pocet, poradie)
+        permutacia = np.argsort(poradie, kind="stable")
+        with self._zamok:
+            self._permutacie[kluc] = permutacia
+            while len(self._permutacie) > self._max_permutacii:
+                self._permutacie.popitem(last=False)
+        return permutacia
+
+    def maska_filtra(self, stlpec, text):
+        """
+        Vráti booleovskú masku riadkov vyhovujúcich filtru jedného stĺpca.
+
+        Args:
+            stlpec (str): Názov stĺpca.
+            text (str): Zápis filtra (pozri _maska_hodnot).
+
+        Returns:
+            np.ndarray: Maska cez riadky datasetu.
+        """
+        kluc = (stlpec, text)
+        with self._zamok:
+            maska = self._masky.get(kluc)
+            if maska is not None:
+                self._masky.move_to_end(kluc)
+                return maska
+
+        kody, unikatne, ciselny = self._zakoduj(stlpec)
+        # posledný prvok patrí chýbajúcim hodnotám (kód -1), tie filtru nevyhovujú
+        vyhovuje = np.append(_maska_hodnot(unikatne, self._zobrazene_texty(stlpec), text, ciselny), False)
+        maska = vyhovuje[kody]
+
+        with self._zamok:
+            self._masky[kluc] = maska
+            while len(self._masky) > self._max_masiek:
+                self._masky.popitem(last=False)
+        return maska
+
+    def poradie(self, filtre=None, triedit_podla=None, vzostupne=True):
+        """
+        Vráti pozície riadkov po aplikovaní filtrov a zoradenia.
+
+        Args:
+            filtre (dict, voliteľné): Stĺpec -> text filtra, prázdne texty sa ignorujú.
+            triedit_podla (str, voliteľné): Stĺpec na zoradenie, None pre pôvodné poradie.
+            vzostupne (bool): Smer zoradenia.
+
+        Returns:
+            np.ndarray: Pozície riadkov (pre DataFrame.iloc).
+        """
+        maska = None
+        for stlpec, text in (filtre or {}).items():
+            if text and text.strip():
+                maska_stlpca = self.maska_filtra(stlpec, text.strip())
+                maska = maska_stlpca if maska is None else maska & maska_stlpca
+
+        if triedit_podla is None:
+            return np.arange(len(self.df)) if maska is None else np.flatnonzero(maska)
+        permutacia = self.permutacia(triedit_podla, vzostupne)
+        return permutacia if maska is None else permutacia[maska[permutacia]]
+
+    def strana(self, poradie, cislo_strany, velkost_strany):
+        """
+        Vráti jednu stranu riadkov, dátumy ako text vo formáte format_datumu (rovnako ako ich
+        porovnáva textový filter).
+
+        Args:
+            poradie (np.ndarray): Výsledok metódy poradie.
+            cislo_strany (int): Číslo strany od 0.
+            velkost_strany (int): Počet riadkov na strane.
+
+        Returns:
+            pd.DataFrame: Riadky zvolenej strany.
+        """
+        zaciatok = cislo_strany * velkost_strany
+        strana = self.df.iloc[poradie[zaciatok:zaciatok + velkost_strany]]
+        return strana.assign(**{stlpec: strana[stlpec].dt.strftime(format_datumu) for stlpec in strana.columns
+                                if pd.api.types.is_datetime64_any_dtype(strana[stlpec])})
+
+
+def pocet_stran(pocet_riadkov, velkost_strany):
+    return max(1, -(-pocet_riadkov // velkost_strany))
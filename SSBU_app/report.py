@@ -0,0 +1,200 @@
+"""
+Dávkový report bez spustenia Shiny aplikácie.
+
+Pre každý dataset (CSV s oddeľovačom ';') vypočíta Hardy-Weinbergovu rovnováhu, distribúciu
+genotypov, výskyt diagnóz a Chí-kvadrát testy asociácie, voliteľne aj po skupinách (strata),
+a výsledky zapíše ako CSV, HTML alebo Parquet. Dvojice dataset × typ strát sa počítajú
+paralelne v samostatných procesoch.
+
+Príklad:
+    python report.py laboratorium_a.csv laboratorium_b.csv -o reporty -f csv html --strata Rok Pohlavie
+"""
+import argparse
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from asociacie import chi_kvadrat_testy
+from demografia import KockaDemografie
+from diagnozy import IndexDiagnoz
+from exporty import priprav_na_parquet
+from vyhladavanie import bez_diakritiky
+from shared import nacitaj_dataset, skupiny_diagnoz, predvolena_skupina_diagnoz, mkch10_file_path, \
+    nazvy_harkov_mkch10
+from utils import stlpce_genotypov, vytvor_strata, hardy_weinberg_podla_strat, pocty_genotypov, \
+    hardy_weinberg_batch, hardy_weinberg_exact, analyze_genotype_distribution, analyzuj_diagnozy, \
+    nacitaj_mkch10_ciselnik, vytvor_index_mkch10
+
+typy_strat = ["Rok", "Pohlavie", "Veková skupina"]
+formaty = ["csv", "html", "parquet"]
+
+# Číselník MKCH-10 načítaný raz v každom procese (pozri _inicializuj_proces)
+_ciselnik = None
+
+
+def _inicializuj_proces(cesta_mkch10):
+    global _ciselnik
+    mkch10_data = nacitaj_mkch10_ciselnik(str(cesta_mkch10), nazvy_harkov_mkch10)
+    _ciselnik = (mkch10_data, vytvor_index_mkch10(mkch10_data))
+
+
+def hardy_weinberg_tabulka(df, typ_strat=None):
+    """
+    Tabuľka Hardy-Weinbergovej rovnováhy pre všetky lokusy, voliteľne po skupinách.
+
+    Returns:
+        pd.DataFrame: Rovnaké stĺpce ako hardy_weinberg_podla_strat (bez stĺpca skupiny, ak typ_strat je None).
+    """
+    if typ_strat is not None:
+        return hardy_weinberg_podla_strat(df, tuple(stlpce_genotypov), typ_strat)
+    pocty, _ = pocty_genotypov(df, stlpce_genotypov)
+    vysledok = hardy_weinberg_batch(pocty)
+    tabulka = pd.DataFrame({
+        "Mutácia": stlpce_genotypov,
+        "Normal": pocty[0, :, 0],
+        "Heterozygot": pocty[0, :, 1],
+        "Mutant": pocty[0, :, 2],
+        "Frekvencia mutovanej alely (q)": vysledok['allele_q'][0].round(5),
+        "Chi-kvadrát test": vysledok['chi2'][0].round(5),
+        "p-hodnota": vysledok['p_value'][0],
+        "Exaktná p-hodnota": hardy_weinberg_exact(pocty)[0],
+    })
+    tabulka.loc[~vysledok['testovatelne'][0], ["Chi-kvadrát test", "p-hodnota", "Exaktná p-hodnota"]] = float("nan")
+    return tabulka
+
+
+def analyzuj_skupinu(df, diagnoza, mkch10_data, mkch10_index, testovat_pohlavie=True):
+    """
+    Vypočíta tabuľky reportu, ktoré sa pre skupiny počítajú z podmnožiny riadkov.
+
+    Returns:
+        dict: Názov tabuľky -> pd.DataFrame.
+    """
+    tabulky = dict(analyze_genotype_distribution(df))
+    diagnozy = analyzuj_diagnozy(df, "diagnoza MKCH-10", "validovany vysledok", mkch10_data, mkch10_index)
+    tabulky["vyskyt_diagnoz"] = diagnozy["vyskyt_diagnoz"]
+    tabulky["chybne_kody"] = diagnozy["chybne_kody"]
+
+    kocka = KockaDemografie(df, stlpce_genotypov)
+    index_diagnoz = IndexDiagnoz(df["diagnoza MKCH-10"], skupiny_diagnoz)
+    tabulky["asociacie"] = chi_kvadrat_testy(kocka, kocka.vyrez(), index_diagnoz, diagnoza, testovat_pohlavie)
+    return tabulky
+
+
+def vytvor_report(df, typ_strat=None, diagnoza=predvolena_skupina_diagnoz, mkch10_data=None, mkch10_index=None):
+    """
+    Vypočíta všetky tabuľky reportu pre dataset.
+
+    Args:
+        df (pd.DataFrame): Typovaný dataset pacientov.
+        typ_strat (str, voliteľné): Typ skupín pre vytvor_strata, None pre celý dataset.
+        diagnoza (str): Diagnóza alebo skupina diagnóz pre Chí-kvadrát testy.
+        mkch10_data (dict, voliteľné): Hárky číselníka MKCH-10.
+        mkch10_index (dict, voliteľné): Index z vytvor_index_mkch10.
+
+    Returns:
+        dict: Názov tabuľky -> pd.DataFrame; pri skupinách má každá tabuľka prvý stĺpec so skupinou.
+    """
+    tabulky = {"hardy_weinberg": hardy_weinberg_tabulka(df, typ_strat)}
+    if typ_strat is None:
+        tabulky.update(analyzuj_skupinu(df, diagnoza, mkch10_data, mkch10_index))
+        return tabulky
+
+    strata = vytvor_strata(df, typ_strat)
+    casti = {}
+    for skupina, riadky in df.groupby(strata, observed=True, sort=True):
+        tabulky_skupiny = analyzuj_skupinu(riadky, diagnoza, mkch10_data, mkch10_index,
+                                           testovat_pohlavie=typ_strat != "Pohlavie")
+        for nazov, tabulka in tabulky_skupiny.items():
+            casti.setdefault(nazov, []).append(tabulka.assign(**{typ_strat: skupina})
+                                               [[typ_strat, *tabulka.columns]])
+    tabulky.update({nazov: pd.concat(zoznam, ignore_index=True) for nazov, zoznam in casti.items()})
+    return tabulky
+
+
+def _nazov_suboru(text):
+    return re.sub(r"[^\w.-]+", "_", bez_diakritiky(text)).strip("_")
+
+
+def zapis_tabulku(tabulka, cesta_bez_pripony, format_vystupu):
+    """
+    Zapíše tabuľku v zadanom formáte.
+
+    Returns:
+        Path: Cesta k zapísanému súboru.
+    """
+    cesta = cesta_bez_pripony.with_suffix(f".{format_vystupu}")
+    if format_vystupu == "csv":
+        tabulka.to_csv(cesta, sep=";", index=False)
+    elif format_vystupu == "html":
+        tabulka.to_html(cesta, index=False, na_rep="N/A", classes="dataframe")
+    elif format_vystupu == "parquet":
+        priprav_na_parquet(tabulka).to_parquet(cesta, index=False)
+    else:
+        raise ValueError(f"Neznámy formát výstupu: {format_vystupu}")
+    return cesta
+
+
+def spracuj_ulohu(cesta_datasetu, typ_strat, priecinok, formaty_vystupu, diagnoza):
+    """
+    Vypočíta report jedného datasetu pre jeden typ strát a zapíše ho (spúšťa sa v procese).
+
+    Returns:
+        list: Cesty k zapísaným súborom.
+    """
+    if _ciselnik is None:
+        _inicializuj_proces(mkch10_file_path)
+    mkch10_data, mkch10_index = _ciselnik
+
+    df = nacitaj_dataset(cesta_datasetu)
+    tabulky = vytvor_report(df, typ_strat, diagnoza, mkch10_data, mkch10_index)
+
+    cielovy = Path(priecinok) / _nazov_suboru(Path(cesta_datasetu).stem)
+    cielovy.mkdir(parents=True, exist_ok=True)
+    pripona = "" if typ_strat is None else f"_{_nazov_suboru(typ_strat)}"
+    return [zapis_tabulku(tabulka, cielovy / f"{nazov}{pripona}", format_vystupu)
+            for nazov, tabulka in tabulky.items()
+            for format_vystupu in formaty_vystupu]
+
+
+def main(argumenty=None):
+    parser = argparse.ArgumentParser(description="Dávkový report HFE analýz bez spustenia Shiny aplikácie.")
+    parser.add_argument("datasety", nargs="+", type=Path, help="CSV súbory s datasetmi (oddeľovač ';').")
+    parser.add_argument("-o", "--vystup", type=Path, default=Path("reporty"), help="Výstupný priečinok.")
+    parser.add_argument("-f", "--format", nargs="+", choices=formaty, default=["csv"], dest="formaty",
+                        help="Formáty výstupných tabuliek.")
+    parser.add_argument("--strata", nargs="*", choices=typy_strat, default=[],
+                        help="Typy skupín, pre ktoré sa report vytvorí navyše k celému datasetu.")
+    parser.add_argument("--diagnoza", default=predvolena_skupina_diagnoz,
+                        help="Diagnóza, rozsah kódov alebo skupina diagnóz pre Chí-kvadrát testy.")
+    parser.add_argument("--mkch10", type=Path, default=mkch10_file_path, help="Súbor s číselníkom MKCH-10.")
+    parser.add_argument("-j", "--procesy", type=int, default=os.cpu_count() or 1, help="Počet procesov.")
+    args = parser.parse_args(argumenty)
+
+    # číselník sa načíta raz pred spustením procesov, procesy ho potom čítajú z cache
+    _inicializuj_proces(args.mkch10)
+    ulohy = [(dataset, typ_strat) for dataset in args.datasety for typ_strat in [None, *args.strata]]
+
+    chyby = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.procesy, len(ulohy))),
+                             initializer=_inicializuj_proces, initargs=(args.mkch10,)) as executor:
+        buduce = {executor.submit(spracuj_ulohu, dataset, typ_strat, args.vystup, args.formaty, args.diagnoza):
+                  (dataset, typ_strat) for dataset, typ_strat in ulohy}
+        for buduci in as_completed(buduce):
+            dataset, typ_strat = buduce[buduci]
+            popis = f"{dataset.name}" + (f" ({typ_strat})" if typ_strat else "")
+            try:
+                subory = buduci.result()
+                logging.info(f"Report {popis}: zapísaných {len(subory)} súborov.")
+            except Exception as e:
+                chyby += 1
+                logging.error(f"Report {popis} zlyhal: {e}")
+    return 1 if chyby else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,65 @@
 from pathlib import Path
+import logging
 import pandas as pd
+from utils import cesta_k_cache, uloz_do_cache, typuj_dataset, stlpce_genotypov
+from mapovanie import uloz_dataset, mapuj_dataset
 
 app_dir = Path(__file__).parent
-df = pd.read_csv(app_dir / "ocisteny_dataset.csv", sep=";", header=0, low_memory=False)
+
+# Pomenované skupiny diagnóz: zoznam MKCH-10 kódov, kategórií alebo rozsahov kategórií
+# (pozri diagnozy.je_v_hierarchii). Dajú sa zvoliť v testoch aj grafoch namiesto jedného kódu.
+skupiny_diagnoz = {
+    "Pečeňová diagnóza (K76.0, K75.9)": ["K76.0", "K75.9"],
+    "Choroby pečene (K70-K77)": ["K70-K77"],
+    "Alkoholová choroba pečene (K70)": ["K70"],
+    "Fibróza a cirhóza pečene (K74)": ["K74"],
+    "Poruchy metabolizmu železa (E83.1)": ["E83.1"],
+}
+# Skupina porovnávaná v chí-kvadrát testoch, keď nie je zvolená diagnóza
+predvolena_skupina_diagnoz = "Pečeňová diagnóza (K76.0, K75.9)"
+# Zvýši sa pri zmene stĺpcov typovaného datasetu, staršie snímky sa potom nepoužijú
+verzia_snimky = 2
+
+
+def nacitaj_dataset(cesta_k_suboru, pouzit_cache=True):
+    """
+    Načíta dataset pacientov z CSV (oddeľovač ';') do typovanej podoby.
+    Typovaný dataset sa ukladá ako Arrow IPC snímka v adresári .cache, kým sa CSV nezmení.
+    Snímka sa pamäťovo mapuje (mapovanie.mapuj_dataset), takže všetky procesy zdieľajú
+    jednu kópiu dát a načítanie netrvá dlhšie pri väčšom datasete.
+
+    Args:
+        cesta_k_suboru (str | Path): Cesta k CSV súboru.
+        pouzit_cache (bool): Či sa má čítať a zapisovať snímka.
+
+    Returns:
+        pd.DataFrame: Typovaný dataset pacientov (zo snímky s poliami iba na čítanie).
+    """
+    cesta_cache = cesta_k_cache(cesta_k_suboru, f".v{verzia_snimky}.arrow") if pouzit_cache else None
+    if cesta_cache is not None and cesta_cache.exists():
+        try:
+            return mapuj_dataset(cesta_cache)
+        except Exception as e:
+            logging.warning(f"Snímku datasetu '{cesta_cache}' sa nepodarilo načítať: {e}")
+
+    data = typuj_dataset(pd.read_csv(cesta_k_suboru, sep=";", header=0, low_memory=False))
+    if cesta_cache is not None:
+        uloz_do_cache(cesta_cache, lambda cesta: uloz_dataset(data, cesta))
+        if cesta_cache.exists():
+            # aj prvý proces pracuje s mapovanou snímkou, nie so súkromnou kópiou
+            return mapuj_dataset(cesta_cache)
+    return data
+
+
+cesta_datasetu = app_dir / "ocisteny_dataset.csv"
+df = nacitaj_dataset(cesta_datasetu)
+# Identifikátor východiskového datasetu (zdroj a verzia snímky); zverejnené snímky s pripojenými
+# výsledkami sa po zmene CSV alebo typovania nepoužijú
+zaklad_datasetu = cesta_k_cache(cesta_datasetu, f".v{verzia_snimky}").name
+
+# Priečinok, do ktorého sa ukladajú CSV exporty nových výsledkov; aplikácia ich priebežne pripája
+priecinok_prichadzajucich = app_dir / "prichadzajuce"
 
 # Cesta k súboru s MKCH-10 číselníkom
 mkch10_file_path = app_dir / "Medzinarodna_klasifikacia_chorob_01062024.xls"
-nazvy_harkov_mkch10 = ["A00-B99", "C00-D48", "D50-D90", "E00-E90", "F00-F99", "G00-G99", "H00-H59", "H60-H95", "I00-I99", "J00-J99", "K00-K93", "L00-L99", "M00-M99", "N00-N99", "O00-O99", "P00-P96", "Q00-Q99", "R00-R99", "S00-T98", "V01-Y98", "Z00-Z99", "U00-U99"]
\ No newline at end of file
+nazvy_harkov_mkch10 = ["A00-B99", "C00-D48", "D50-D90", "E00-E90", "F00-F99", "G00-G99", "H00-H59", "H60-H95", "I00-I99", "J00-J99", "K00-K93", "L00-L99", "M00-M99", "N00-N99", "O00-O99", "P00-P96", "Q00-Q99", "R00-R99", "S00-T98", "V01-Y98", "Z00-Z99", "U00-U99"]
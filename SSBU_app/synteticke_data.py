@@ -0,0 +1,104 @@
+"""
+Generátor syntetického datasetu pacientov so schémou ocisteny_dataset.csv.
+
+Frekvencie sa preberajú zo vzorového datasetu: kombinácie genotypov troch HFE mutácií (spolu,
+takže zostanú zachované aj zložené heterozygoty), kódy diagnóz, pohlavie, vek a čas od prijatia
+vzorky po validáciu výsledku. Generovanie je vektorové, 10⁷ riadkov trvá niekoľko sekúnd.
+
+Príklad:
+    python synteticke_data.py 1000000 syntet_1m.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import genotypy, stlpce_vzoru, pocet_vzorov, spocitaj_vzory_genotypov, format_datumu, typuj_dataset, \
+    odvod_obdobia, odvodene_stlpce
+
+# Vzorový dataset, z ktorého sa preberajú frekvencie
+cesta_vzoru = Path(__file__).parent / "ocisteny_dataset.csv"
+
+
+def _kategoricky_stlpec(rng, hodnoty, pocet_riadkov):
+    # výber sa robí nad kódmi kategórií, nie nad reťazcami; chýbajúca hodnota má kód -1
+    kody_vzoru, kategorie = pd.factorize(hodnoty, sort=True)
+    pocty = np.bincount(kody_vzoru + 1, minlength=len(kategorie) + 1)
+    kody = rng.choice(len(pocty), size=pocet_riadkov, p=pocty / pocty.sum()) - 1
+    return pd.Categorical.from_codes(kody, categories=kategorie)
+
+
+def generuj_dataset(pocet_riadkov, vzor=None, seed=0):
+    """
+    Vygeneruje typovaný dataset pacientov (rovnaké stĺpce a typy ako nacitaj_dataset).
+
+    Args:
+        pocet_riadkov (int): Počet pacientov.
+        vzor (pd.DataFrame, voliteľné): Typovaný dataset, z ktorého sa preberú frekvencie
+                                        (predvolene ocisteny_dataset.csv).
+        seed (int): Seed generátora náhodných čísel.
+
+    Returns:
+        pd.DataFrame: Syntetický dataset s indexom 0..pocet_riadkov-1.
+    """
+    if vzor is None:
+        vzor = typuj_dataset(pd.read_csv(cesta_vzoru, sep=";", header=0, low_memory=False))
+    rng = np.random.default_rng(seed)
+
+    # genotypy: vzor (kombinácia troch lokusov) podľa pozorovaných početností
+    pocty_vzorov = spocitaj_vzory_genotypov(vzor)
+    vzory = rng.choice(pocet_vzorov, size=pocet_riadkov, p=pocty_vzorov / pocty_vzorov.sum())
+    stlpce = {}
+    for i, stlpec in enumerate(stlpce_vzoru.values()):
+        kody = (vzory // 4 ** (len(stlpce_vzoru) - 1 - i) % 4).astype(np.int8)
+        kody[kody == 3] = -1
+        stlpce[stlpec] = pd.Categorical.from_codes(kody, categories=genotypy)
+
+    pohlavie = _kategoricky_stlpec(rng, vzor["pohlavie"].astype(object), pocet_riadkov)
+    diagnozy = _kategoricky_stlpec(rng, vzor["diagnoza MKCH-10"].astype(object), pocet_riadkov)
+
+    # vek: pozorovaný vek s malým šumom, aby sa hodnoty neopakovali presne
+    vek_vzoru = vzor["vek"].dropna().to_numpy(dtype=np.float64)
+    vek = rng.choice(vek_vzoru, size=pocet_riadkov) + rng.normal(0, 1, size=pocet_riadkov)
+    vek = np.clip(np.round(vek, 1), 0, 110).astype(np.float32)
+
+    # validácia rovnomerne v období vzoru (na minúty), prijatie vzorky o pozorovaný odstup skôr
+    validovany = vzor["validovany vysledok"].dropna()
+    minuty_od, minuty_do = (validovany.min().value // 60_000_000_000, validovany.max().value // 60_000_000_000)
+    validovany_vysledok = pd.to_datetime(rng.integers(minuty_od, minuty_do + 1, size=pocet_riadkov), unit="m")
+    odstupy = (vzor["validovany vysledok"] - vzor["prijem vzorky"]).dropna().to_numpy()
+    prijem_vzorky = validovany_vysledok - pd.to_timedelta(rng.choice(odstupy, size=pocet_riadkov))
+
+    return odvod_obdobia(pd.DataFrame({
+        "id": np.arange(1, pocet_riadkov + 1, dtype=np.int64) * 1000 + rng.integers(1, 10, size=pocet_riadkov),
+        "validovany vysledok": validovany_vysledok.astype(vzor["validovany vysledok"].dtype),
+        "prijem vzorky": prijem_vzorky.astype(vzor["prijem vzorky"].dtype),
+        "pohlavie": pohlavie,
+        "vek": vek,
+        "diagnoza MKCH-10": diagnozy,
+        **{stlpec: stlpce[stlpec] for stlpec in vzor.columns if stlpec in stlpce},
+    }))[list(vzor.columns)]
+
+
+def uloz_csv(df, cesta_k_suboru):
+    """
+    Zapíše dataset vo formáte ocisteny_dataset.csv (oddeľovač ';', dátumy format_datumu,
+    bez stĺpcov odvodených pri načítaní).
+
+    Args:
+        df (pd.DataFrame): Typovaný dataset.
+        cesta_k_suboru (str | Path): Cieľový súbor.
+    """
+    df = df.drop(columns=odvodene_stlpce, errors="ignore")
+    df.assign(id=df["id"].map("{:09d}".format)).to_csv(cesta_k_suboru, sep=";", index=False,
+                                                        date_format=format_datumu, float_format="%.2f")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vygeneruje syntetický dataset pacientov do CSV.")
+    parser.add_argument("pocet_riadkov", type=int)
+    parser.add_argument("cesta", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    uloz_csv(generuj_dataset(args.pocet_riadkov, seed=args.seed), args.cesta)
@@ -2,8 +2,139 @@ import pandas as pd
 import numpy as np
 from scipy.stats import chi2
 import logging
+import functools
+import os
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from metriky import merana, registruj_cache
+from mapovanie import uloz_harky, mapuj_harky
+
+# Úroveň logovania sa dá zmeniť premennou prostredia, napr. SSBU_LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.environ.get("SSBU_LOG_LEVEL", "INFO").upper())
+
+genotypy = ["normal", "heterozygot", "mutant"]
+# Stĺpce s genotypmi HFE mutácií (možné hodnoty sú v genotypy)
+stlpce_genotypov = ["HFE C187G (H63D) [HFE]", "HFE A193T (S65C) [HFE]", "HFE G845A (C282Y) [HFE]"]
+stlpce_datumov = ["validovany vysledok", "prijem vzorky"]
+# Stĺpce odvodené pri načítaní z dátumu validovaného výsledku (v CSV nie sú)
+odvodene_stlpce = ["rok", "mesiac"]
+format_datumu = "%d.%m.%Y %H:%M"
+# Približný počet stavov (počtov heterozygotov) exaktného testu HWE vyhodnotených naraz v jednom bloku
+max_prvkov_exact = 2 ** 16
+# Cache rozdelení exaktného testu HWE: iba krátke rozdelenia (do 32 kB) a najviac max_pocet_rozdeleni_cache
+# z nich, spolu najviac približne 16 MB
+max_dlzka_rozdelenia_cache = 4096
+max_pocet_rozdeleni_cache = 512
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# id(DataFrame) -> (weakref, odtlačok); odtlačok sa pre ten istý objekt počíta iba raz
+_odtlacky_dat = {}
+# názov funkcie -> memoizovaná funkcia, kvôli súhrnným štatistikám
+_memoizovane_funkcie = {}
+# (n, počet minoritných alel) -> rozdelenie počtu heterozygotov exaktného testu HWE (LRU)
+_rozdelenia_exact = OrderedDict()
+_zamok_rozdeleni_exact = threading.Lock()
+_pocitadla_rozdeleni_exact = {"hits": 0, "misses": 0}
+registruj_cache("hwe_exact_rozdelenia", lambda: CacheInfo(_pocitadla_rozdeleni_exact["hits"],
+                                                           _pocitadla_rozdeleni_exact["misses"],
+                                                           max_pocet_rozdeleni_cache, len(_rozdelenia_exact)))
+
+def odtlacok_dat(data):
+    """
+    Vypočíta odtlačok (fingerprint) DataFrame/Series podľa tvaru, stĺpcov a hashu obsahu.
+    Výsledok sa pamätá pre daný objekt, dáta sa preto považujú za nemenné.
+
+    Args:
+        data (pd.DataFrame | pd.Series): Dáta.
+
+    Returns:
+        tuple: Hashovateľný odtlačok dát.
+    """
+    kluc = id(data)
+    zaznam = _odtlacky_dat.get(kluc)
+    if zaznam is not None and zaznam[0]() is data:
+        return zaznam[1]
+
+    stlpce = tuple(data.columns) if isinstance(data, pd.DataFrame) else (data.name,)
+    odtlacok = (data.shape, stlpce, int(pd.util.hash_pandas_object(data, index=True).sum()))
+    _odtlacky_dat[kluc] = (weakref.ref(data, lambda _, kluc=kluc: _odtlacky_dat.pop(kluc, None)), odtlacok)
+    return odtlacok
+
+def _kluc_argumentu(hodnota):
+    if isinstance(hodnota, (pd.DataFrame, pd.Series)):
+        return ("data", odtlacok_dat(hodnota))
+    try:
+        hash(hodnota)
+        return hodnota
+    except TypeError:
+        # nehashovateľné objekty (napr. číselník) podľa identity; záznam v cache drží referenciu,
+        # takže id nemôže byť medzitým použité iným objektom
+        return ("id", id(hodnota))
+
+def memoizuj(maxsize=32):
+    """
+    Dekorátor, ktorý pamätá výsledky funkcie v rámci celého procesu (zdieľané medzi reláciami).
+    Kľúčom je odtlačok dátových argumentov a ostatné parametre, pri zaplnení sa odstráni
+    najdlhšie nepoužitý záznam (LRU). Funkcia dostane metódy cache_info() a cache_clear().
+
+    Vrátené výsledky sú zdieľané, volajúci ich nesmie meniť.
+
+    Args:
+        maxsize (int): Maximálny počet zapamätaných výsledkov.
+    """
+    def dekorator(funkcia):
+        cache = OrderedDict()
+        zamok = threading.Lock()
+        pocitadla = {"hits": 0, "misses": 0}
+
+        @functools.wraps(funkcia)
+        def obal(*args, **kwargs):
+            kluc = (tuple(_kluc_argumentu(a) for a in args),
+                    tuple(sorted((k, _kluc_argumentu(v)) for k, v in kwargs.items())))
+            with zamok:
+                if kluc in cache:
+                    cache.move_to_end(kluc)
+                    pocitadla["hits"] += 1
+                    return cache[kluc][0]
+                pocitadla["misses"] += 1
+
+            vysledok = funkcia(*args, **kwargs)
+            with zamok:
+                cache[kluc] = (vysledok, args, kwargs)
+                cache.move_to_end(kluc)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return vysledok
+
+        def cache_info():
+            with zamok:
+                return CacheInfo(pocitadla["hits"], pocitadla["misses"], maxsize, len(cache))
+
+        def cache_clear():
+            with zamok:
+                cache.clear()
+                pocitadla["hits"] = pocitadla["misses"] = 0
+
+        obal.cache_info = cache_info
+        obal.cache_clear = cache_clear
+        _memoizovane_funkcie[funkcia.__name__] = obal
+        registruj_cache(funkcia.__name__, cache_info)
+        return obal
+    return dekorator
+
+def statistiky_cache():
+    """
+    Vráti štatistiky (hits, misses, maxsize, currsize) všetkých memoizovaných funkcií.
 
-logging.basicConfig(level=logging.INFO)
+    Returns:
+        dict: Názov funkcie -> CacheInfo.
+    """
+    return {nazov: funkcia.cache_info() for nazov, funkcia in _memoizovane_funkcie.items()}
 
 def get_genotype_counts(df, column):
     counts = df[column].value_counts()
@@ -24,6 +155,7 @@ def format_p_value(p_value, decimal_places=5):
     else:
         return f"{p_value:.{decimal_places}f}"
 
+@merana("utils")
 def chi_square_test(observed, expected):
     observed = np.array(observed)
     expected = np.array(expected)
@@ -42,162 +174,395 @@ def chi_square_test(observed, expected):
 
     p_value = chi2.sf(chi2_statistic, degrees_of_freedom)
 
-    print(f"Calculated Chi-squared statistic: {chi2_statistic}")
-    print(f"Calculated Degrees of Freedom: {degrees_of_freedom}")
-    print(f"Calculated p-value: {p_value}")
+    logging.debug("Chí-kvadrát: %s, stupne voľnosti: %s, p-hodnota: %s", chi2_statistic, degrees_of_freedom, p_value)
 
     return chi2_statistic, p_value, degrees_of_freedom
 
 
+@merana("utils")
+def pocty_genotypov(df, stlpce, strata=None):
+    """
+    Spočíta genotypy (normal, heterozygot, mutant) pre viac lokusov a skupín (strát) naraz.
+
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
+        stlpce (list): Stĺpce s genotypmi (lokusy).
+        strata (pd.Series, voliteľné): Označenie skupiny pre každý riadok (napr. rok, pohlavie).
+                                       Riadky bez skupiny sa vynechajú. Bez strát je jedna skupina.
+
+    Returns:
+        tuple: (np.ndarray tvaru (strata × lokusy × 3), zoznam označení strát)
+    """
+    if strata is None:
+        kody_strat = np.zeros(len(df), dtype=np.int64)
+        nazvy_strat = ["Všetky"]
+    else:
+        kody_strat, nazvy_strat = pd.factorize(strata, sort=True)
+        nazvy_strat = list(nazvy_strat)
+
+    pocet_strat = len(nazvy_strat)
+    pocty = np.zeros((pocet_strat, len(stlpce), 3), dtype=np.int64)
+    for i, stlpec in enumerate(stlpce):
+        kody_genotypov = pd.Categorical(df[stlpec], categories=genotypy).codes
+        platne = (kody_genotypov >= 0) & (kody_strat >= 0)
+        pocty[:, i, :] = np.bincount(kody_strat[platne] * 3 + kody_genotypov[platne],
+                                     minlength=pocet_strat * 3).reshape(pocet_strat, 3)
+    return pocty, nazvy_strat
+
+@merana("utils")
+def hardy_weinberg_batch(pocty):
+    """
+    Vypočíta test Hardy-Weinbergovej rovnováhy pre ľubovoľný počet lokusov a strát naraz.
+
+    Args:
+        pocty (array-like): Počty genotypov tvaru (..., 3) v poradí normal, heterozygot, mutant,
+                            napr. (strata × lokusy × 3) z pocty_genotypov.
+
+    Returns:
+        dict: Polia tvaru (...) – 'total', 'total_alleles', 'normal_alleles', 'mutant_alleles',
+              'allele_p', 'allele_q', 'chi2', 'p_value', 'df', 'testovatelne', 'nenulove_genotypy'
+              a pole 'expected' tvaru (..., 3).
+    """
+    pocty = np.asarray(pocty, dtype=np.int64)
+    total = pocty.sum(axis=-1)
+    normal_alleles = 2 * pocty[..., 0] + pocty[..., 1]
+    mutant_alleles = 2 * pocty[..., 2] + pocty[..., 1]
+    total_alleles = 2 * total
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(total > 0, normal_alleles / np.maximum(total_alleles, 1), np.nan)
+        q = np.where(total > 0, mutant_alleles / np.maximum(total_alleles, 1), np.nan)
+        expected = np.stack([p ** 2 * total, 2 * p * q * total, q ** 2 * total], axis=-1)
+
+        # chi-kvadrát iba cez kategórie s nenulovou očakávanou početnosťou
+        platne = expected > 0
+        clen = np.where(platne, (pocty - expected) ** 2 / np.where(platne, expected, 1), 0.0)
+    dostatok_kategorii = platne.sum(axis=-1) >= 2
+    chi2_statistic = np.where(dostatok_kategorii, clen.sum(axis=-1), 0.0)
+    degrees_of_freedom = np.where(dostatok_kategorii, 1, 0)
+    p_value = np.where(dostatok_kategorii, chi2.sf(chi2_statistic, 1), 1.0)
+
+    nenulove_genotypy = (pocty > 0).sum(axis=-1)
+    return {
+        'total': total,
+        'total_alleles': total_alleles,
+        'normal_alleles': normal_alleles,
+        'mutant_alleles': mutant_alleles,
+        'allele_p': p,
+        'allele_q': q,
+        'expected': expected,
+        'chi2': chi2_statistic,
+        'p_value': p_value,
+        'df': degrees_of_freedom,
+        'nenulove_genotypy': nenulove_genotypy,
+        'testovatelne': (total >= 2) & (nenulove_genotypy >= 2),
+    }
+
+def _hwe_exact_blok(n, n_minor):
+    # Rozdelenia počtu heterozygotov všetkých tabuliek bloku ležia za sebou v jednom poli (segment
+    # na tabuľku) a počítajú sa naraz: rekurencia P(h+2)/P(h) v logaritmoch ako kumulatívny súčet
+    # v rámci segmentu a normalizácia cez reduceat.
+    dlzky = n_minor // 2 + 1
+    zaciatky = np.concatenate(([0], np.cumsum(dlzky)[:-1]))
+
+    def po_segmentoch(hodnoty):
+        return np.repeat(hodnoty, dlzky)
+
+    heterozygoti = np.arange(dlzky.sum(), dtype=np.float64)
+    heterozygoti -= po_segmentoch(zaciatky)
+    heterozygoti *= 2
+    heterozygoti += po_segmentoch(n_minor % 2)
+    homozygoti_minor = (po_segmentoch(n_minor) - heterozygoti) / 2
+    homozygoti_major = po_segmentoch(n) - heterozygoti - homozygoti_minor
+    with np.errstate(divide="ignore"):
+        log_pomery = np.log(4 * homozygoti_minor * homozygoti_major / ((heterozygoti + 1) * (heterozygoti + 2)))
+    # posledný stav segmentu nemá nasledovníka
+    log_pomery[zaciatky + dlzky - 1] = 0.0
+    log_p = np.cumsum(log_pomery)
+    log_p -= log_pomery
+    log_p -= po_segmentoch(log_p[zaciatky])
+
+    log_p -= po_segmentoch(np.maximum.reduceat(log_p, zaciatky))
+    pravdepodobnosti = np.exp(log_p, out=log_p)
+    pravdepodobnosti /= po_segmentoch(np.add.reduceat(pravdepodobnosti, zaciatky))
+    return np.split(pravdepodobnosti, zaciatky[1:])
+
+def _hwe_exact_rozdelenia(n, n_minor):
+    # Rozdelenia pre dvojice (n, n_minor): krátke z cache, chýbajúce sa vypočítajú spolu v jednom bloku
+    kluce = list(zip(n.tolist(), n_minor.tolist()))
+    rozdelenia = {}
+    with _zamok_rozdeleni_exact:
+        for kluc in kluce:
+            if kluc in _rozdelenia_exact:
+                _rozdelenia_exact.move_to_end(kluc)
+                rozdelenia[kluc] = _rozdelenia_exact[kluc]
+                _pocitadla_rozdeleni_exact["hits"] += 1
+    chybajuce = [k for k in dict.fromkeys(kluce) if k not in rozdelenia]
+    if chybajuce:
+        n_chybajuce, n_minor_chybajuce = np.array(chybajuce, dtype=np.int64).T
+        vypocitane = _hwe_exact_blok(n_chybajuce, n_minor_chybajuce)
+        with _zamok_rozdeleni_exact:
+            _pocitadla_rozdeleni_exact["misses"] += len(chybajuce)
+            for kluc, rozdelenie in zip(chybajuce, vypocitane):
+                rozdelenia[kluc] = rozdelenie
+                if len(rozdelenie) <= max_dlzka_rozdelenia_cache:
+                    rozdelenie.setflags(write=False)
+                    _rozdelenia_exact[kluc] = rozdelenie
+            while len(_rozdelenia_exact) > max_pocet_rozdeleni_cache:
+                _rozdelenia_exact.popitem(last=False)
+    return [rozdelenia[kluc] for kluc in kluce]
+
+def _hwe_exact_p(tabulky):
+    # p-hodnota je súčet pravdepodobností stavov, ktoré nie sú pravdepodobnejšie ako pozorovaný
+    n_het = tabulky[:, 1]
+    n_minor = np.minimum(2 * tabulky[:, 0], 2 * tabulky[:, 2]) + n_het
+    rozdelenia = _hwe_exact_rozdelenia(tabulky.sum(axis=1), n_minor)
+    dlzky = n_minor // 2 + 1
+    zaciatky = np.concatenate(([0], np.cumsum(dlzky)[:-1]))
+    pravdepodobnosti = np.concatenate(rozdelenia)
+    p_pozorovane = pravdepodobnosti[zaciatky + n_het // 2]
+    # tolerancia kvôli zaokrúhľovaniu pri porovnaní rovnako pravdepodobných stavov
+    pravdepodobnosti *= pravdepodobnosti <= np.repeat(p_pozorovane * (1 + 1e-7), dlzky)
+    return np.minimum(1.0, np.add.reduceat(pravdepodobnosti, zaciatky))
+
+@merana("utils")
+def hardy_weinberg_exact(pocty):
+    """
+    Exaktný test Hardy-Weinbergovej rovnováhy (Wigginton et al., 2005), vhodný aj pre
+    zriedkavé varianty, kde chi-kvadrát test nie je spoľahlivý. Všetky tabuľky (lokusy × skupiny)
+    sa vyhodnotia vektorovo v blokoch približne max_prvkov_exact stavov, rovnaké tabuľky iba raz.
+    Rozdelenia počtu heterozygotov pre (n, počet minoritných alel) sa pamätajú, ak majú najviac
+    max_dlzka_rozdelenia_cache stavov.
+
+    Args:
+        pocty (array-like): Počty genotypov tvaru (..., 3) v poradí normal, heterozygot, mutant.
+
+    Returns:
+        np.ndarray: p-hodnoty tvaru (...), NaN ak nie sú žiadne vzorky.
+    """
+    pocty = np.asarray(pocty, dtype=np.int64)
+    ploche = pocty.reshape(-1, 3)
+    p_hodnoty = np.full(len(ploche), np.nan)
+    neprazdne = ploche.sum(axis=1) > 0
+    if neprazdne.any():
+        tabulky, spatne = np.unique(ploche[neprazdne], axis=0, return_inverse=True)
+        dlzky = (np.minimum(2 * tabulky[:, 0], 2 * tabulky[:, 2]) + tabulky[:, 1]) // 2 + 1
+        # bloky tabuliek po približne max_prvkov_exact stavoch, pamäť nerastie s počtom skupín
+        hranice = np.cumsum(dlzky) // max_prvkov_exact
+        vysledky = np.concatenate([_hwe_exact_p(tabulky[hranice == blok]) for blok in np.unique(hranice)])
+        p_hodnoty[neprazdne] = vysledky[spatne.ravel()]
+    return p_hodnoty.reshape(pocty.shape[:-1])
+
+@merana("utils")
+@memoizuj(maxsize=64)
 def check_hardy_weinberg(df, column):
-    counts = df[column].value_counts()
-    print(f"Value counts for column '{column}':\n{counts}")
-    n_normal = counts.get('normal', 0)
-    n_heterozygot = counts.get('heterozygot', 0)
-    n_mutant = counts.get('mutant', 0)
-    total = n_normal + n_heterozygot + n_mutant
-    observed_counts = [n_normal, n_heterozygot, n_mutant]
-    non_zero_observed = sum(1 for count in observed_counts if count > 0)
+    pocty, _ = pocty_genotypov(df, [column])
+    logging.debug(f"HWE pre '{column}': pozorované {pocty[0, 0].tolist()}")
+    return hardy_weinberg_z_poctov(pocty[0, 0])
+
+@merana("utils")
+def hardy_weinberg_z_poctov(observed_counts):
+    """
+    Vyhodnotí Hardy-Weinbergovu rovnováhu pre jeden lokus z už spočítaných genotypov.
+
+    Args:
+        observed_counts (np.ndarray): Počty genotypov (normal, heterozygot, mutant).
 
-    print(f"n_normal: {n_normal}, n_heterozygot: {n_heterozygot}, n_mutant: {n_mutant}, total: {total}")
-    print(f"Number of non-zero observed genotypes: {non_zero_observed}")
+    Returns:
+        dict: Rovnaký výsledok ako check_hardy_weinberg.
+    """
+    observed_counts = np.asarray(observed_counts, dtype=np.int64)
+    vysledok = {k: v[0, 0] for k, v in hardy_weinberg_batch(observed_counts[None, None]).items()}
 
     reason_na = None
-    allele_info = None
-    expected = None
-    chi2_results = None
+    allele_info = {}
+    expected = {}
+    chi2_results = {}
 
-    if total < 2:
+    if vysledok['total'] < 2:
         reason_na = "Príliš málo vzoriek"
-        allele_info = {}
-        expected = {}
-        chi2_results = {}
-    elif non_zero_observed < 2:
+    elif vysledok['nenulove_genotypy'] < 2:
         reason_na = "Príliš málo pozorovaných genotypov"
-        allele_info = {}
-        expected = {}
-        chi2_results = {}
     else:
-        total_alleles = 2 * total
-        normal_alleles = 2 * n_normal + n_heterozygot
-        mutant_alleles = 2 * n_mutant + n_heterozygot
-
-        p = normal_alleles / total_alleles
-        q = mutant_alleles / total_alleles
-        print(f"Allele frequencies for column '{column}': p = {p:.4f}, q = {q:.4f}")
-
         allele_info = {
-            'total_alleles': total_alleles,
-            'normal_alleles': normal_alleles,
-            'mutant_alleles': mutant_alleles,
-            'allele_p': p,
-            'allele_q': q
-        }
-
-        expected = {
-            'normal': (p ** 2) * total,
-            'heterozygot': 2 * p * q * total,
-            'mutant': (q ** 2) * total
+            'total_alleles': vysledok['total_alleles'],
+            'normal_alleles': vysledok['normal_alleles'],
+            'mutant_alleles': vysledok['mutant_alleles'],
+            'allele_p': vysledok['allele_p'],
+            'allele_q': vysledok['allele_q']
         }
-        expected_counts = [expected['normal'], expected['heterozygot'], expected['mutant']]
-        non_zero_expected = sum(1 for count in expected_counts if count > 0)
-        print(f"Expected genotype counts for column '{column}': {expected}")
-        print(f"Number of non-zero expected genotypes: {non_zero_expected}")
-
-        chi2_statistic, p_value, df_returned = chi_square_test(observed_counts, expected_counts)
-        print(f"DOF returned from chi_square_test for column '{column}': {df_returned}")
+        expected = dict(zip(genotypy, vysledok['expected']))
         chi2_results = {
-            'chi2': chi2_statistic,
-            'p_value': p_value,
-            'df': df_returned
+            'chi2': vysledok['chi2'],
+            'p_value': vysledok['p_value'],
+            'df': int(vysledok['df']),
+            'p_value_exact': hardy_weinberg_exact(observed_counts)[()]
         }
 
     return {
         'reason_na': reason_na,
         'allele_info': allele_info,
-        'observed': dict(zip(['normal', 'heterozygot', 'mutant'], observed_counts)),
+        'observed': dict(zip(genotypy, observed_counts)),
         'expected': expected,
         'chi2_results': chi2_results
     }
 
-def analyze_genotype_distribution(df):
-    c282y_col = "HFE G845A (C282Y) [HFE]"
-    h63d_col = "HFE C187G (H63D) [HFE]"
-    s65c_col = "HFE A193T (S65C) [HFE]"
-    data = df.copy()
-    total_patients = len(data)
-
-    n_normal_c282y, n_heterozygot_c282y, n_mutant_c282y, _ = get_genotype_counts(data, c282y_col)
-    n_normal_h63d, n_heterozygot_h63d, n_mutant_h63d, _ = get_genotype_counts(data, h63d_col)
-    n_normal_s65c, n_heterozygot_s65c, n_mutant_s65c, _ = get_genotype_counts(data, s65c_col)
-
-    genotype_percentages_data = {
-        "Mutácia": ["C282Y", "H63D", "S65C"],
-        "Normal (%)": [
-            n_normal_c282y / total_patients * 100,
-            n_normal_h63d / total_patients * 100,
-            n_normal_s65c / total_patients * 100
-        ],
-        "Heterozygot (%)": [
-            n_heterozygot_c282y / total_patients * 100,
-            n_heterozygot_h63d / total_patients * 100,
-            n_heterozygot_s65c / total_patients * 100
-        ],
-        "Mutant (%)": [
-            n_mutant_c282y / total_patients * 100,
-            n_mutant_h63d / total_patients * 100,
-            n_mutant_s65c / total_patients * 100
-        ]
-    }
-    genotype_df = pd.DataFrame(genotype_percentages_data)
-    for col in ["Normal (%)", "Heterozygot (%)", "Mutant (%)"]:
-        genotype_df[col] = genotype_df[col].round(2)
+def vytvor_strata(df, typ):
+    """
+    Vytvorí označenie skupiny (strata) pre každého pacienta.
 
-    compound_heterozygotes = data[(data[c282y_col] == "heterozygot") &
-                                  (data[h63d_col] == "heterozygot")].shape[0]
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
+        typ (str): "Rok", "Pohlavie" alebo "Veková skupina" (po 10 rokoch).
 
-    compound_c282y_s65c = data[(data[c282y_col] == "heterozygot") &
-                                     (data[s65c_col] == "heterozygot")].shape[0]
+    Returns:
+        pd.Series: Označenie skupiny pre každý riadok (NaN ak sa nedá určiť).
+    """
+    if typ == "Rok":
+        return rok_datumu(df, "validovany vysledok").astype("Int64")
+    if typ == "Pohlavie":
+        return df["pohlavie"].astype(object)
+    if typ == "Veková skupina":
+        hranice = list(range(0, 130, 10))
+        popisy = [f"{od}–{od + 9}" for od in hranice[:-1]]
+        return pd.cut(df["vek"], bins=hranice, right=False, labels=popisy)
+    raise ValueError(f"Neznámy typ strát: {typ}")
+
+@merana("utils")
+@memoizuj()
+def hardy_weinberg_podla_strat(df, stlpce, typ_strat):
+    """
+    Vypočíta Hardy-Weinbergovu rovnováhu pre všetky lokusy a skupiny jedným výpočtom.
 
-    c282y_carriers = data[(data[c282y_col] == "heterozygot") &
-                          (data[h63d_col] != "heterozygot") &
-                                (data[s65c_col] != "heterozygot")].shape[0]
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
+        stlpce (tuple): Stĺpce s genotypmi.
+        typ_strat (str): Typ skupín pre vytvor_strata.
 
-    h63d_carriers = data[(data[h63d_col] == "heterozygot") &
-                               (data[c282y_col] != "heterozygot") &
-                                (data[s65c_col] != "heterozygot")].shape[0]
+    Returns:
+        pd.DataFrame: Jeden riadok pre každú dvojicu skupina × mutácia.
+    """
+    stlpce = list(stlpce)
+    pocty, nazvy_strat = pocty_genotypov(df, stlpce, vytvor_strata(df, typ_strat))
+    vysledok = hardy_weinberg_batch(pocty)
+
+    skupina = np.repeat(np.array(nazvy_strat, dtype=object), len(stlpce))
+    tabulka = pd.DataFrame({
+        typ_strat: skupina,
+        "Mutácia": np.tile(np.array(stlpce, dtype=object), len(nazvy_strat)),
+        "Normal": pocty[..., 0].ravel(),
+        "Heterozygot": pocty[..., 1].ravel(),
+        "Mutant": pocty[..., 2].ravel(),
+        "Frekvencia mutovanej alely (q)": vysledok['allele_q'].ravel().round(5),
+        "Chi-kvadrát test": vysledok['chi2'].ravel().round(5),
+        "p-hodnota": vysledok['p_value'].ravel(),
+        "Exaktná p-hodnota": hardy_weinberg_exact(pocty).ravel(),
+    })
+    testovatelne = vysledok['testovatelne'].ravel()
+    tabulka.loc[~testovatelne, ["Chi-kvadrát test", "p-hodnota", "Exaktná p-hodnota"]] = np.nan
+    return tabulka
+
+# Poradie mutácií pri kódovaní trojlokusového genotypu do jedného čísla
+stlpce_vzoru = {
+    "C282Y": "HFE G845A (C282Y) [HFE]",
+    "H63D": "HFE C187G (H63D) [HFE]",
+    "S65C": "HFE A193T (S65C) [HFE]",
+}
+# Genotyp lokusu: 0 normal, 1 heterozygot, 2 mutant, 3 chýbajúca/iná hodnota
+pocet_vzorov = 4 ** len(stlpce_vzoru)
+_vzory = np.arange(pocet_vzorov)
+_lokus = {mutacia: _vzory // 4 ** (len(stlpce_vzoru) - 1 - i) % 4 for i, mutacia in enumerate(stlpce_vzoru)}
+
+# Vyhľadávacie tabuľky vzor -> príslušnosť ku kategórii (nová kategória = nový riadok)
+kategorie_rizika = {
+    "C282Y homozygot": _lokus["C282Y"] == 2,
+    "H63D homozygot": _lokus["H63D"] == 2,
+    "S65C homozygot": _lokus["S65C"] == 2,
+    "C282Y/H63D zložený heterozygot": (_lokus["C282Y"] == 1) & (_lokus["H63D"] == 1),
+    "C282Y/S65C zložený heterozygot": (_lokus["C282Y"] == 1) & (_lokus["S65C"] == 1),
+    "H63D/S65C zložený heterozygot": (_lokus["H63D"] == 1) & (_lokus["S65C"] == 1),
+}
+kategorie_prenasacov = {
+    mutacia: (_lokus[mutacia] == 1) & np.all([_lokus[ina] != 1 for ina in stlpce_vzoru if ina != mutacia], axis=0)
+    for mutacia in stlpce_vzoru
+}
+# Genetická predispozícia sa počíta ako súčet týchto kategórií (ako doteraz)
+kategorie_predispozicie = ["C282Y homozygot", "H63D homozygot",
+                           "C282Y/H63D zložený heterozygot", "C282Y/S65C zložený heterozygot"]
+
+def zakoduj_genotypy(df):
+    """
+    Zakóduje genotypy troch HFE mutácií každého pacienta do jedného malého čísla (vzoru).
 
-    s65c_carriers = data[(data[s65c_col] == "heterozygot") &
-                               (data[c282y_col] != "heterozygot") &
-                               (data[h63d_col] != "heterozygot")].shape[0]
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
 
-    total_carriers = c282y_carriers + h63d_carriers + s65c_carriers
-    total_at_risk = n_mutant_c282y + n_mutant_h63d + compound_heterozygotes + compound_c282y_s65c
-    total_non_affected = total_patients - total_carriers - total_at_risk
-    
-    risk_data = {
-        "Kategória": ["C282Y homozygot", "H63D homozygot", "S65C homozygot",
-                      "C282Y/H63D zložený heterozygot", "C282Y/S65C zložený heterozygot"],
-        "Percento (%)": [
-            n_mutant_c282y / total_patients * 100,
-            n_mutant_h63d / total_patients * 100,
-            n_mutant_s65c / total_patients * 100,
-            compound_heterozygotes / total_patients * 100,
-            compound_c282y_s65c / total_patients * 100
-        ],
-    }
-    risk_df = pd.DataFrame(risk_data)
+    Returns:
+        np.ndarray: Vzor pre každý riadok (0 až pocet_vzorov - 1).
+    """
+    vzory = np.zeros(len(df), dtype=np.uint8)
+    for stlpec in stlpce_vzoru.values():
+        kody = pd.Categorical(df[stlpec], categories=genotypy).codes
+        vzory = vzory * 4 + np.where(kody < 0, 3, kody).astype(np.uint8)
+    return vzory
+
+@merana("utils")
+def spocitaj_vzory_genotypov(df):
+    """
+    Spočíta pacientov pre každý vzor genotypov jedným prechodom (bincount).
+
+    Returns:
+        np.ndarray: Počty dĺžky pocet_vzorov.
+    """
+    return np.bincount(zakoduj_genotypy(df), minlength=pocet_vzorov)
+
+@merana("utils")
+def analyzuj_vzory_genotypov(pocty_vzorov):
+    """
+    Vypočíta tabuľky zastúpenia genotypov, rizikových kategórií a predispozície
+    z počtov vzorov genotypov (spocitaj_vzory_genotypov).
+
+    Args:
+        pocty_vzorov (np.ndarray): Počty pacientov pre každý vzor.
+
+    Returns:
+        dict: 'genotype_percentages', 'risk_percentages', 'predisposition_table'.
+    """
+    pocty_vzorov = np.asarray(pocty_vzorov)
+    total_patients = int(pocty_vzorov.sum())
+
+    def percento(pocet):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.float64(pocet) / total_patients * 100
+
+    genotype_df = pd.DataFrame({
+        "Mutácia": list(stlpce_vzoru),
+        "Normal (%)": [percento(pocty_vzorov[_lokus[m] == 0].sum()) for m in stlpce_vzoru],
+        "Heterozygot (%)": [percento(pocty_vzorov[_lokus[m] == 1].sum()) for m in stlpce_vzoru],
+        "Mutant (%)": [percento(pocty_vzorov[_lokus[m] == 2].sum()) for m in stlpce_vzoru],
+    })
+    for col in ["Normal (%)", "Heterozygot (%)", "Mutant (%)"]:
+        genotype_df[col] = genotype_df[col].round(2)
+
+    pocty_rizika = {kategoria: int(pocty_vzorov[maska].sum()) for kategoria, maska in kategorie_rizika.items()}
+    risk_df = pd.DataFrame({
+        "Kategória": list(pocty_rizika),
+        "Percento (%)": [percento(pocet) for pocet in pocty_rizika.values()],
+    })
     risk_df["Percento (%)"] = risk_df["Percento (%)"].round(2)
 
-    predisposition_data = {
+    total_carriers = sum(int(pocty_vzorov[maska].sum()) for maska in kategorie_prenasacov.values())
+    total_at_risk = sum(pocty_rizika[kategoria] for kategoria in kategorie_predispozicie)
+    total_non_affected = total_patients - total_carriers - total_at_risk
+
+    predisposition_df = pd.DataFrame({
         "Skupina": ["Prenášači", "Genetická predispozícia", "Nepostihnutí", "Celkový počet pacientov"],
         "Počet": [total_carriers, total_at_risk, total_non_affected, total_patients],
-        "Percento (%)": [round(total_carriers / total_patients * 100, 2),
-                         round(total_at_risk / total_patients * 100, 2),
-                         round(total_non_affected / total_patients * 100, 2),
+        "Percento (%)": [round(percento(total_carriers), 2),
+                         round(percento(total_at_risk), 2),
+                         round(percento(total_non_affected), 2),
                          100.00]
-    }
-    predisposition_df = pd.DataFrame(predisposition_data)
+    })
 
     return {
         "genotype_percentages": genotype_df,
@@ -205,7 +570,157 @@ def analyze_genotype_distribution(df):
         "predisposition_table": predisposition_df
     }
 
-def prirad_kapitolu_mkch10(kod, mkch10_data):
+@merana("utils")
+@memoizuj()
+def analyze_genotype_distribution(df):
+    return analyzuj_vzory_genotypov(spocitaj_vzory_genotypov(df))
+
+def najdi_stlpce_mkch10(sheet_df):
+    """
+    Nájde v hárku číselníka MKCH-10 stĺpec s kódom a stĺpec s názvom.
+
+    Args:
+        sheet_df (pd.DataFrame): Hárok číselníka MKCH-10.
+
+    Returns:
+        tuple: (názov stĺpca s kódom, názov stĺpca s názvom), chýbajúci stĺpec je None.
+    """
+    kod_col = 'Kód diagnózy' if 'Kód diagnózy' in sheet_df.columns else 'Kód' if 'Kód' in sheet_df.columns else None
+    nazov_col = 'Nazov' if 'Nazov' in sheet_df.columns else 'Názov' if 'Názov' in sheet_df.columns else None
+    return kod_col, nazov_col
+
+def normalizuj_kody(kody):
+    """
+    Zjednotí zápis MKCH-10 kódov (odstráni medzery na okrajoch, prevedie na veľké písmená).
+
+    Args:
+        kody (pd.Series): Kódy diagnóz.
+
+    Returns:
+        pd.Series: Normalizované kódy, chýbajúce hodnoty zostávajú NaN.
+    """
+    if isinstance(kody.dtype, pd.CategoricalDtype):
+        kody = kody.astype(object)
+    return kody.where(kody.isna(), kody.astype(str).str.strip().str.upper())
+
+def rok_datumu(df, stlpec_datum):
+    """
+    Vráti rok dátumu pre každý riadok. Pre validovaný výsledok sa použije stĺpec "rok"
+    odvodený pri načítaní, iné (aj textové) dátumy sa prevedú.
+
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
+        stlpec_datum (str): Názov stĺpca s dátumom.
+
+    Returns:
+        pd.Series: Rok (Int16), chýbajúci dátum je <NA>.
+    """
+    if stlpec_datum == "validovany vysledok" and "rok" in df.columns:
+        return df["rok"]
+    datum = df[stlpec_datum]
+    if not pd.api.types.is_datetime64_any_dtype(datum):
+        datum = pd.to_datetime(datum, format=format_datumu, errors="coerce")
+    return datum.dt.year.astype("Int16")
+
+def odvod_obdobia(data):
+    """
+    Doplní stĺpce odvodene_stlpce (rok a mesiac validovaného výsledku, Int16/Int8) k typovanému datasetu.
+
+    Args:
+        data (pd.DataFrame): Dataset s časovým stĺpcom "validovany vysledok" (datetime64).
+
+    Returns:
+        pd.DataFrame: Ten istý DataFrame s doplnenými stĺpcami.
+    """
+    datum = data["validovany vysledok"].dt
+    data["rok"] = datum.year.astype("Int16")
+    data["mesiac"] = datum.month.astype("Int8")
+    return data
+
+@merana("utils")
+def typuj_dataset(data):
+    """
+    Prevedie stĺpce datasetu pacientov na kompaktné typy: genotypy, pohlavie a kód diagnózy
+    na category, vek na float32 a časové stĺpce na datetime64. Z dátumu validovaného výsledku
+    sa raz odvodí rok a mesiac (odvodene_stlpce), analýzy podľa obdobia ich iba zoskupujú.
+
+    Args:
+        data (pd.DataFrame): Dataset načítaný z CSV (stĺpce ako text).
+
+    Returns:
+        pd.DataFrame: Ten istý DataFrame s prevedenými stĺpcami.
+    """
+    for stlpec in stlpce_genotypov:
+        if stlpec in data.columns:
+            # neočakávané hodnoty sa nestratia, pridajú sa ako ďalšie kategórie
+            ine = sorted(set(data[stlpec].dropna().unique()) - set(genotypy))
+            data[stlpec] = pd.Categorical(data[stlpec], categories=genotypy + ine)
+    if "pohlavie" in data.columns:
+        data["pohlavie"] = data["pohlavie"].astype("category")
+    if "vek" in data.columns:
+        data["vek"] = pd.to_numeric(data["vek"], errors="coerce").astype("float32")
+    for stlpec in stlpce_datumov:
+        if stlpec in data.columns and not pd.api.types.is_datetime64_any_dtype(data[stlpec]):
+            data[stlpec] = pd.to_datetime(data[stlpec], format=format_datumu, errors="coerce")
+    if "diagnoza MKCH-10" in data.columns:
+        data["diagnoza MKCH-10"] = normalizuj_kody(data["diagnoza MKCH-10"]).astype("category")
+    if "validovany vysledok" in data.columns:
+        odvod_obdobia(data)
+    return data
+
+@merana("utils")
+def spoj_datasety(data, nove):
+    """
+    Pripojí nové typované riadky k datasetu. Kategoriálne stĺpce sa spoja zjednotením kategórií,
+    takže výsledok zostane kategoriálny (pd.concat by ich pri rôznych kategóriách zmenil na object).
+
+    Args:
+        data (pd.DataFrame): Typovaný dataset.
+        nove (pd.DataFrame): Typované nové riadky s rovnakými stĺpcami.
+
+    Returns:
+        pd.DataFrame: Nový DataFrame s indexom 0..n-1.
+    """
+    spojene = pd.concat([data, nove], ignore_index=True)
+    for stlpec in data.columns:
+        if isinstance(data[stlpec].dtype, pd.CategoricalDtype) and stlpec in nove.columns:
+            nove_hodnoty = nove[stlpec]
+            if not isinstance(nove_hodnoty.dtype, pd.CategoricalDtype):
+                nove_hodnoty = nove_hodnoty.astype("category")
+            spojene[stlpec] = pd.api.types.union_categoricals([data[stlpec], nove_hodnoty], ignore_order=True)
+    return spojene
+
+@merana("utils")
+def vytvor_index_mkch10(mkch10_data):
+    """
+    Vytvorí index kód → názov zo všetkých hárkov číselníka MKCH-10.
+    Index sa vytvára raz pri načítaní číselníka, kľúče sú normalizované kódy
+    (funguje pre stĺpce 'Kód' aj 'Kód diagnózy').
+
+    Args:
+        mkch10_data (dict):  Slovník, kde kľúče sú názvy hárkov Excelu
+                             a hodnoty sú DataFrame s dátami MKCH-10.
+
+    Returns:
+        dict: Normalizovaný kód → názov. Kódy z hárkov bez stĺpca s názvom majú hodnotu None.
+    """
+    index = {}
+    if not mkch10_data:
+        return index
+
+    for sheet_name, sheet_df in mkch10_data.items():
+        kod_col, nazov_col = najdi_stlpce_mkch10(sheet_df)
+        if not kod_col:
+            continue
+        kody = normalizuj_kody(sheet_df[kod_col]).dropna()
+        nazvy = sheet_df.loc[kody.index, nazov_col] if nazov_col else [None] * len(kody)
+        for kod, nazov in zip(kody, nazvy):
+            # pri duplicitách platí prvý hárok, v ktorom má kód názov
+            if index.get(kod) is None:
+                index[kod] = nazov
+    return index
+
+def prirad_kapitolu_mkch10(kod, mkch10_data, mkch10_index=None):
     """
     Priradí ku kódu MKCH-10 názov kategórie/podkategórie na základe dát z Excelu.
 
@@ -213,24 +728,81 @@ def prirad_kapitolu_mkch10(kod, mkch10_data):
         kod (str): Kód diagnózy MKCH-10.
         mkch10_data (dict):  Slovník, kde kľúče sú názvy hárkov Excelu
                              a hodnoty sú DataFrame s dátami MKCH-10.
+        mkch10_index (dict, voliteľné): Index z vytvor_index_mkch10, ak už je vytvorený.
 
     Returns:
         str: Názov kategórie/podkategórie alebo "Neznáma" ak sa kód nenájde v žiadnom hárku.
     """
     if pd.isna(kod):
         return "Neznáma"
-    kod = kod.strip().upper()
+    if mkch10_index is None:
+        mkch10_index = vytvor_index_mkch10(mkch10_data)
+
+    nazov = mkch10_index.get(str(kod).strip().upper())
+    return "Neznáma" if nazov is None else nazov
+
+@merana("utils")
+def pocty_diagnoz_podla_roka(df, stlpec_mkch, stlpec_datum):
+    """
+    Spočíta záznamy pre každý rok vyšetrenia a MKCH-10 kód. Počty z viacerých častí datasetu
+    sa dajú sčítať (pozri agregaty.AgregatyDatasetu).
+
+    Args:
+        df (pd.DataFrame): DataFrame s dátami pacientov.
+        stlpec_mkch (str): Názov stĺpca s MKCH-10 kódom.
+        stlpec_datum (str): Názov stĺpca s dátumom vyšetrenia.
 
-    for sheet_name, df in mkch10_data.items():
-        kod_col = 'Kód diagnózy' if 'Kód diagnózy' in df.columns else 'Kód' if 'Kód' in df.columns else None
-        nazov_col = 'Nazov' if 'Nazov' in df.columns else 'Názov' if 'Názov' in df.columns else None
+    Returns:
+        pd.Series: Počty s indexom (Rok_vyšetrenia, kód), záznamy bez roka alebo kódu sa vynechajú.
+    """
+    roky = rok_datumu(df, stlpec_datum)
+    kody = df[stlpec_mkch]
+    if isinstance(kody.dtype, pd.CategoricalDtype):
+        kody = kody.astype(object)
+    platne = roky.notna() & kody.notna()
+    return pd.DataFrame({'Rok_vyšetrenia': roky[platne].astype(np.int64), stlpec_mkch: kody[platne]}) \
+        .groupby(['Rok_vyšetrenia', stlpec_mkch]).size()
+
+@merana("utils")
+def vyskyt_diagnoz_z_poctov(pocty, celkovy_pocet, mkch10_data, mkch10_index=None):
+    """
+    Z počtov diagnóz podľa roka pripraví výsledok analyzuj_diagnozy.
 
-        if kod_col and nazov_col:
-            if kod in df[kod_col].values:
-                return df.loc[df[kod_col] == kod, nazov_col].iloc[0]
-    return "Neznáma"
+    Args:
+        pocty (pd.Series): Výsledok pocty_diagnoz_podla_roka (prípadne súčet viacerých).
+        celkovy_pocet (int): Počet všetkých záznamov (základ pre percentá).
+        mkch10_data (dict): Hárky číselníka MKCH-10.
+        mkch10_index (dict, voliteľné): Index z vytvor_index_mkch10, ak už je vytvorený.
 
-def analyzuj_diagnozy(df, stlpec_mkch, stlpec_datum, mkch10_data):
+    Returns:
+        dict: Pozri analyzuj_diagnozy.
+    """
+    if mkch10_index is None:
+        mkch10_index = vytvor_index_mkch10(mkch10_data)
+    stlpec_mkch = pocty.index.names[1]
+
+    vyskyt_diagnoz = pocty.sort_index().rename('Pocet').reset_index()
+    # názvy sa hľadajú iba raz pre každý unikátny kód
+    unikatne_kody = pd.Series(vyskyt_diagnoz[stlpec_mkch].unique())
+    nazvy = normalizuj_kody(unikatne_kody).map(mkch10_index).fillna("Neznáma")
+    vyskyt_diagnoz.insert(2, 'Nazov_MKCH10', vyskyt_diagnoz[stlpec_mkch].map(dict(zip(unikatne_kody, nazvy))))
+
+    # percenta
+    vyskyt_diagnoz['Percento'] = ((vyskyt_diagnoz['Pocet'] / celkovy_pocet) * 100).round(2)
+
+    # hladanie chybnych kodov
+    vyskyt_diagnoz['Je_chybny'] = ~normalizuj_kody(vyskyt_diagnoz[stlpec_mkch]).isin(list(mkch10_index))
+    chybne_kody = vyskyt_diagnoz[vyskyt_diagnoz['Je_chybny'] == True][[stlpec_mkch]].drop_duplicates()
+
+    return {
+        'vyskyt_diagnoz': vyskyt_diagnoz,
+        'celkovy_pocet': celkovy_pocet,
+        'chybne_kody': chybne_kody
+    }
+
+@merana("utils")
+@memoizuj()
+def analyzuj_diagnozy(df, stlpec_mkch, stlpec_datum, mkch10_data, mkch10_index=None):
     """
     Analyzuje výskyt diagnóz podľa MKCH-10 kódu a roka vyšetrenia,
     vracia aj percentuálne zastúpenie a informácie pre zvýraznenie chybných kódov.
@@ -241,43 +813,111 @@ def analyzuj_diagnozy(df, stlpec_mkch, stlpec_datum, mkch10_data):
         stlpec_datum (str): Názov stĺpca s dátumom vyšetrenia.
         mkch10_data (dict):  Slovník, kde kľúče sú názvy hárkov Excelu
                              a hodnoty sú DataFrame s dátami MKCH-10.
+        mkch10_index (dict, voliteľné): Index z vytvor_index_mkch10, ak už je vytvorený.
 
     Returns:
         pd.DataFrame: DataFrame s počtom a percentuálnym zastúpením
                       jednotlivých MKCH-10 kódov pre každý rok vyšetrenia,
                       a zoznam chybných kódov.
     """
+    pocty = pocty_diagnoz_podla_roka(df, stlpec_mkch, stlpec_datum)
+    return vyskyt_diagnoz_z_poctov(pocty, len(df), mkch10_data, mkch10_index)
 
-    df_analyza = df.copy()
-    df_analyza['Rok_vyšetrenia'] = pd.to_datetime(df_analyza[stlpec_datum], format='%d.%m.%Y %H:%M', errors='coerce').dt.year
-    df_analyza['Nazov_MKCH10'] = df_analyza[stlpec_mkch].apply(lambda x: prirad_kapitolu_mkch10(x, mkch10_data))
+def cesta_k_cache(cesta_k_suboru, pripona):
+    """
+    Vráti cestu k súboru cache pre zdrojový súbor. Názov obsahuje čas poslednej zmeny
+    a veľkosť zdroja, takže po zmene zdrojového súboru sa cache automaticky nepoužije.
 
-    vyskyt_diagnoz = df_analyza.groupby(['Rok_vyšetrenia', stlpec_mkch, 'Nazov_MKCH10']).size().reset_index(name='Pocet')
+    Args:
+        cesta_k_suboru (str | Path): Cesta k zdrojovému súboru.
+        pripona (str): Prípona súboru cache (napr. ".arrow").
 
-    # percenta
-    total_vyskytov = len(df_analyza)
-    vyskyt_diagnoz['Percento'] = ((vyskyt_diagnoz['Pocet'] / total_vyskytov) * 100).round(2)
+    Returns:
+        Path: Cesta k súboru cache v adresári .cache vedľa zdrojového súboru.
+    """
+    cesta = Path(cesta_k_suboru)
+    stat = cesta.stat()
+    return cesta.parent / ".cache" / f"{cesta.stem}-{stat.st_mtime_ns}-{stat.st_size}{pripona}"
 
-    # hladanie chybnych kodov
-    platne_kody = set()
-    for sheet_name, sheet_df in mkch10_data.items():
-        kod_col = 'Kód diagnózy' if 'Kód diagnózy' in sheet_df.columns else 'Kód' if 'Kód' in sheet_df.columns else None
-        if kod_col:
-            platne_kody.update(sheet_df[kod_col].astype(str).str.upper().tolist())
+def uloz_do_cache(cesta_cache, zapis):
+    """
+    Atomicky zapíše súbor cache a odstráni zastarané verzie pre ten istý zdroj.
 
-    vyskyt_diagnoz['Je_chybny'] = vyskyt_diagnoz[stlpec_mkch].astype(str).str.upper().apply(lambda x: x not in platne_kody)
-    chybne_kody = vyskyt_diagnoz[vyskyt_diagnoz['Je_chybny'] == True][[stlpec_mkch]].drop_duplicates()
+    Args:
+        cesta_cache (Path): Cesta z cesta_k_cache.
+        zapis (callable): Funkcia, ktorá zapíše obsah do zadanej (dočasnej) cesty.
+    """
+    try:
+        cesta_cache.parent.mkdir(exist_ok=True)
+        docasna_cesta = cesta_cache.with_name(f"{cesta_cache.name}.{os.getpid()}.tmp")
+        zapis(docasna_cesta)
+        os.replace(docasna_cesta, cesta_cache)
+
+        stem = cesta_cache.name.rsplit("-", 2)[0]
+        for stara in cesta_cache.parent.glob(f"{stem}-*{cesta_cache.suffix}"):
+            if stara != cesta_cache and stara.name.rsplit("-", 2)[0] == stem:
+                stara.unlink(missing_ok=True)
+    except Exception as e:
+        # chyba pri zápise cache nesmie zastaviť načítanie dát
+        logging.warning(f"Nepodarilo sa zapísať cache '{cesta_cache}': {e}")
 
-    return {
-        'vyskyt_diagnoz': vyskyt_diagnoz,
-        'celkovy_pocet': total_vyskytov,
-        'chybne_kody': chybne_kody
-    }
+def _nacitaj_harky(cesta_k_suboru, nazvy_harkov):
+    # on_demand: xlrd načíta iba požadované hárky, nie celý zošit
+    return pd.read_excel(cesta_k_suboru, sheet_name=list(nazvy_harkov), engine_kwargs={"on_demand": True})
 
-def nacitaj_mkch10_ciselnik(cesta_k_suboru, nazvy_harkov):
+def _nacitaj_harky_paralelne(cesta_k_suboru):
+    with pd.ExcelFile(cesta_k_suboru, engine_kwargs={"on_demand": True}) as excel:
+        vsetky_harky = excel.sheet_names
+
+    pocet_procesov = min(os.cpu_count() or 1, len(vsetky_harky))
+    if pocet_procesov < 2:
+        return pd.read_excel(cesta_k_suboru, sheet_name=None)
+
+    skupiny = [vsetky_harky[i::pocet_procesov] for i in range(pocet_procesov)]
+    try:
+        with ProcessPoolExecutor(max_workers=pocet_procesov) as executor:
+            casti = list(executor.map(_nacitaj_harky, [cesta_k_suboru] * len(skupiny), skupiny))
+    except (OSError, RuntimeError) as e:
+        logging.warning(f"Paralelné načítanie číselníka zlyhalo ({e}), načítava sa sekvenčne.")
+        return pd.read_excel(cesta_k_suboru, sheet_name=None)
+
+    nacitane = {}
+    for cast in casti:
+        nacitane.update(cast)
+    # zachovanie poradia hárkov ako v súbore
+    return {nazov: nacitane[nazov] for nazov in vsetky_harky}
+
+@merana("utils")
+def nacitaj_mkch10_ciselnik(cesta_k_suboru, nazvy_harkov, pouzit_cache=True):
+    """
+    Načíta všetky hárky číselníka MKCH-10. Načítané hárky sa ukladajú do Arrow IPC snímky
+    v adresári .cache, ktorá sa pamäťovo mapuje (zdieľa ju viac procesov) a zneplatní sa
+    pri zmene zdrojového súboru.
+    Ak cache chýba, hárky sa z Excelu načítajú paralelne vo viacerých procesoch.
+
+    Args:
+        cesta_k_suboru (str): Cesta k .xls súboru s číselníkom.
+        nazvy_harkov (list): Očakávané názvy hárkov.
+        pouzit_cache (bool): Či sa má čítať a zapisovať cache.
+
+    Returns:
+        dict | None: Názov hárku → DataFrame, alebo None pri chybe.
+    """
     try:
-        all_sheets_dict = pd.read_excel(cesta_k_suboru, sheet_name=None)
+        cesta_cache = cesta_k_cache(cesta_k_suboru, ".arrow") if pouzit_cache else None
+        if cesta_cache is not None and cesta_cache.exists():
+            try:
+                all_sheets_dict = mapuj_harky(cesta_cache)
+                logging.info(f"Číselník MKCH-10 načítaný z cache ({len(all_sheets_dict)} hárkov).")
+                return all_sheets_dict
+            except Exception as e:
+                logging.warning(f"Cache číselníka MKCH-10 sa nepodarilo načítať: {e}")
+
+        all_sheets_dict = _nacitaj_harky_paralelne(cesta_k_suboru)
         logging.info(f"Úspešne načítaných {len(all_sheets_dict)} hárkov z číselníka MKCH-10.")
+
+        if cesta_cache is not None:
+            uloz_do_cache(cesta_cache, lambda cesta: uloz_harky(all_sheets_dict, cesta))
         return all_sheets_dict
     except FileNotFoundError:
         logging.error(f"Súbor '{cesta_k_suboru}' nebol nájdený.")
@@ -285,5 +925,3 @@ def nacitaj_mkch10_ciselnik(cesta_k_suboru, nazvy_harkov):
     except Exception as e:
         logging.error(f"Chyba pri načítaní číselníka MKCH-10: {e}")
         return None
-    
-
@@ -0,0 +1,165 @@
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+
+from utils import najdi_stlpce_mkch10
+
+_vzor_slova = re.compile(r"\w+")
+
+
+def bez_diakritiky(text):
+    """
+    Prevedie text na malé písmená bez diakritiky ("Pečeň" -> "pecen").
+
+    Args:
+        text (str): Vstupný text.
+
+    Returns:
+        str: Normalizovaný text.
+    """
+    rozlozeny = unicodedata.normalize("NFKD", str(text))
+    return "".join(znak for znak in rozlozeny if not unicodedata.combining(znak)).lower()
+
+
+def trigramy(slovo):
+    return {slovo[i:i + 3] for i in range(len(slovo) - 2)}
+
+
+class _UzolTrie:
+    __slots__ = ("deti", "zaznamy")
+
+    def __init__(self):
+        self.deti = {}
+        self.zaznamy = []
+
+
+class IndexMKCH10:
+    """
+    Vyhľadávací index nad číselníkom MKCH-10 vytvorený raz pri načítaní.
+
+    Kódy sú v prefixovom strome (dotaz "K7" nájde všetky kódy začínajúce na K7), názvy v indexe
+    slov bez ohľadu na veľkosť písmen a diakritiku. Každé slovo dotazu sa musí v názve nachádzať
+    ako podreťazec; zodpovedajúce slová slovníka sa nájdu prienikom ich trigramov.
+    """
+
+    def __init__(self, mkch10_data, vynechat=()):
+        self.mkch10_data = mkch10_data or {}
+        # záznam: (hárok, pozícia riadku v hárku, normalizovaný kód, normalizovaný názov)
+        self.zaznamy = []
+        self._koren = _UzolTrie()
+        self._slova = defaultdict(set)
+        self._trigramy = defaultdict(set)
+        self._poradie_harkov = {}
+
+        for harok, sheet_df in self.mkch10_data.items():
+            if harok in vynechat:
+                continue
+            kod_col, nazov_col = najdi_stlpce_mkch10(sheet_df)
+            if not (kod_col and nazov_col):
+                logging.warning(f"V hárku '{harok}' sa nenašli stĺpce pre kód alebo názov.")
+                continue
+            self._poradie_harkov[harok] = len(self._poradie_harkov)
+            kody = sheet_df[kod_col].astype(object).where(sheet_df[kod_col].notna(), "")
+            nazvy = sheet_df[nazov_col].astype(object).where(sheet_df[nazov_col].notna(), "")
+            for pozicia, (kod, nazov) in enumerate(zip(kody, nazvy)):
+                self._pridaj(harok, pozicia, str(kod).strip().upper(), bez_diakritiky(nazov))
+
+    def _pridaj(self, harok, pozicia, kod, nazov):
+        id_zaznamu = len(self.zaznamy)
+        self.zaznamy.append((harok, pozicia, kod, nazov))
+
+        uzol = self._koren
+        for znak in kod:
+            uzol = uzol.deti.setdefault(znak, _UzolTrie())
+            uzol.zaznamy.append(id_zaznamu)
+
+        for slovo in set(_vzor_slova.findall(nazov)):
+            if slovo not in self._slova:
+                # trigramy sa indexujú nad slovníkom slov, nie nad jednotlivými názvami
+                for trigram in trigramy(slovo):
+                    self._trigramy[trigram].add(slovo)
+            self._slova[slovo].add(id_zaznamu)
+
+    def _podla_kodu(self, dotaz):
+        uzol = self._koren
+        for znak in dotaz.strip().upper():
+            uzol = uzol.deti.get(znak)
+            if uzol is None:
+                return []
+        return uzol.zaznamy
+
+    def _obsahujuce_slovo(self, slovo):
+        """
+        Nájde záznamy, ktorých názov obsahuje slovo ako podreťazec.
+
+        Returns:
+            dict: Id záznamu -> skóre zhody (20 celé slovo, 15 začiatok slova, 10 podreťazec).
+        """
+        if len(slovo) >= 3:
+            kandidati = None
+            for zaznamy in sorted((self._trigramy.get(t, set()) for t in trigramy(slovo)), key=len):
+                kandidati = set(zaznamy) if kandidati is None else kandidati & zaznamy
+                if not kandidati:
+                    return {}
+            slova_nazvov = (s for s in kandidati if slovo in s)
+        else:
+            # krátke slová nemajú trigramy – prejde sa slovník slov (nie všetky názvy)
+            slova_nazvov = (s for s in self._slova if slovo in s)
+
+        vysledok = {}
+        for slovo_nazvu in slova_nazvov:
+            skore = 20 if slovo_nazvu == slovo else 15 if slovo_nazvu.startswith(slovo) else 10
+            for i in self._slova[slovo_nazvu]:
+                if vysledok.get(i, 0) < skore:
+                    vysledok[i] = skore
+        return vysledok
+
+    def hladaj(self, dotaz):
+        """
+        Vyhľadá dotaz v kódoch (prefix) a názvoch (slová bez diakritiky).
+
+        Args:
+            dotaz (str): Hľadaný výraz.
+
+        Returns:
+            list: Zoznam (hárok, pozície riadkov) zoradený podľa najlepšieho skóre v hárku,
+                  pozície v hárku sú zoradené podľa skóre. Prázdny dotaz vráti všetky riadky.
+        """
+        if not dotaz or not dotaz.strip():
+            skore = {i: 0 for i in range(len(self.zaznamy))}
+        else:
+            skore = {}
+            kod_dotazu = dotaz.strip().upper()
+            for i in self._podla_kodu(kod_dotazu):
+                # presná zhoda kódu pred dlhšími kódmi s rovnakým prefixom
+                skore[i] = 100 if self.zaznamy[i][2] == kod_dotazu else 80 - (len(self.zaznamy[i][2]) - len(kod_dotazu))
+
+            fraza = bez_diakritiky(dotaz).strip()
+            slova_dotazu = _vzor_slova.findall(fraza)
+            zhody = None
+            for slovo in sorted(slova_dotazu, key=len, reverse=True):
+                najdene = self._obsahujuce_slovo(slovo)
+                if zhody is None:
+                    zhody = najdene
+                else:
+                    zhody = {i: s + najdene[i] for i, s in zhody.items() if i in najdene}
+                if not zhody:
+                    break
+            for i, s in (zhody or {}).items():
+                if self.zaznamy[i][3].startswith(fraza):
+                    s += 10
+                if skore.get(i, 0) < s:
+                    skore[i] = s
+
+        podla_harkov = defaultdict(list)
+        for i, s in skore.items():
+            harok, pozicia = self.zaznamy[i][:2]
+            podla_harkov[harok].append((-s, pozicia))
+
+        vysledky = []
+        for harok, zasahy in podla_harkov.items():
+            zasahy.sort()
+            vysledky.append((zasahy[0][0], self._poradie_harkov[harok], harok, [p for _, p in zasahy]))
+        vysledky.sort()
+        return [(harok, pozicie) for _, _, harok, pozicie in vysledky]
@@ -0,0 +1,81 @@
+import html
+import threading
+
+import numpy as np
+
+from utils import najdi_stlpce_mkch10
+
+# Počet riadkov číselníka na jednej strane zobrazenia
+velkost_strany_mkch10 = 200
+
+
+class ZobrazenieMKCH10:
+    """
+    HTML zobrazenie hárkov číselníka MKCH-10.
+
+    Riadky hárku sa vykreslia raz (vektorovo, po stĺpcoch) do poľa HTML reťazcov a uložia
+    do cache. Strana hárku aj výsledky vyhľadávania sa potom iba vyberú z poľa podľa pozícií
+    a spoja – bez opätovného prechodu cez bunky.
+    """
+
+    def __init__(self, mkch10_data):
+        self.mkch10_data = mkch10_data or {}
+        self._cache = {}
+        self._zamok = threading.Lock()
+
+    def _vykresli(self, harok):
+        sheet_df = self.mkch10_data[harok]
+        hodnoty = sheet_df.astype(object).where(sheet_df.notna(), "")
+
+        hlavicka = "<thead><tr>" + "".join(
+            f'<th style="background-color: #F0F8FF;">{html.escape(str(stlpec))}</th>' for stlpec in sheet_df.columns
+        ) + "</tr></thead>"
+
+        telo = np.full(len(sheet_df), "", dtype=object)
+        for j in range(hodnoty.shape[1]):
+            telo = telo + ("<td>" + hodnoty.iloc[:, j].astype(str).map(html.escape) + "</td>").to_numpy(dtype=object)
+
+        # riadky s rozsahom kódov (napr. "K70-K77") sú nadpisy skupín, zvýraznia sa
+        kod_col, _ = najdi_stlpce_mkch10(sheet_df)
+        if kod_col:
+            nadpis = hodnoty[kod_col].astype(str).str.contains("-", regex=False).to_numpy(dtype=bool)
+        else:
+            nadpis = np.zeros(len(sheet_df), dtype=bool)
+        zaciatky = np.where(nadpis, '<tr style="background-color: #F0F0F0;">', "<tr>").astype(object)
+        return hlavicka, zaciatky + telo + "</tr>"
+
+    def riadky(self, harok):
+        """
+        Vráti vykreslenú hlavičku a riadky hárku (z cache).
+
+        Returns:
+            tuple: (HTML hlavičky, np.ndarray HTML riadkov)
+        """
+        with self._zamok:
+            vykreslene = self._cache.get(harok)
+        if vykreslene is None:
+            vykreslene = self._vykresli(harok)
+            with self._zamok:
+                self._cache[harok] = vykreslene
+        return vykreslene
+
+    def tabulka(self, harok, pozicie=None, strana=0, velkost_strany=velkost_strany_mkch10):
+        """
+        Zloží HTML tabuľku jednej strany hárku.
+
+        Args:
+            harok (str): Názov hárku.
+            pozicie (list, voliteľné): Pozície riadkov (napr. výsledky vyhľadávania), None pre celý hárok.
+            strana (int): Číslo strany od 0.
+            velkost_strany (int): Počet riadkov na strane.
+
+        Returns:
+            str: HTML tabuľky.
+        """
+        hlavicka, riadky = self.riadky(harok)
+        zaciatok = strana * velkost_strany
+        if pozicie is None:
+            vyber = riadky[zaciatok:zaciatok + velkost_strany]
+        else:
+            vyber = riadky[np.asarray(pozicie[zaciatok:zaciatok + velkost_strany], dtype=np.int64)]
+        return f'<table class="dataframe">{hlavicka}<tbody>{"".join(vyber)}</tbody></table>'